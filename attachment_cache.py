@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger('gemini-discord-bot.attachments')
+
+FRAMES_MAGIC = b"GDF1"
+# Cache reads between updates of the files' modification times
+TOUCH_BATCH_SIZE = 64
+
+def pack_frames(frames: List[bytes]) -> bytes:
+    """Serialize a list of frames as a count, the frame lengths, then the frames"""
+    header = struct.pack(f"!4sI{len(frames)}I", FRAMES_MAGIC, len(frames), *(len(frame) for frame in frames))
+    return header + b"".join(frames)
+
+def unpack_frames(data: bytes) -> Optional[List[bytes]]:
+    """Reverse pack_frames, or None if data isn't a frame list"""
+    if len(data) < 8 or data[:4] != FRAMES_MAGIC:
+        return None
+
+    count = struct.unpack_from("!I", data, 4)[0]
+    offset = 8 + 4 * count
+    if len(data) < offset:
+        return None
+
+    frames = []
+    for length in struct.unpack_from(f"!{count}I", data, 8):
+        frames.append(data[offset:offset + length])
+        offset += length
+
+    return frames if offset == len(data) else None
+
+class DiskBlobStore:
+    """Size-bounded directory of content-addressed files.
+
+    Files are named by their digest and evicted least recently used first.
+    Recency is kept in memory; file modification times, which carry it across
+    restarts, are updated in batches rather than on every read.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # digest -> size, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        # Files read since their modification times were last updated, least recent first
+        self._touched: "OrderedDict[str, None]" = OrderedDict()
+        # A single thread owns the index and the files
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="attachment-cache")
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _load(self) -> None:
+        """Index the files left by a previous run, oldest first"""
+        if self._loaded:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, digest, size in sorted(entries):
+            self._index[digest] = size
+            self._bytes += size
+
+        self._loaded = True
+        self._evict()
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        self._load()
+        if digest not in self._index:
+            return None
+
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._bytes -= self._index.pop(digest)
+            self._touched.pop(digest, None)
+            return None
+
+        self._index.move_to_end(digest)
+        self._touched[digest] = None
+        self._touched.move_to_end(digest)
+        if len(self._touched) >= TOUCH_BATCH_SIZE:
+            self._flush_touched()
+        return data
+
+    def _flush_touched(self) -> None:
+        """Touch recently read files, in order, so eviction order survives restarts"""
+        while self._touched:
+            digest, _ = self._touched.popitem(last=False)
+            try:
+                os.utime(self._path(digest))
+            except OSError:
+                pass
+
+    def _write(self, digest: str, data: bytes) -> None:
+        self._load()
+        if digest in self._index or len(data) > self.max_bytes:
+            return
+
+        # Shard workers share the directory, so each write gets its own temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{digest}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(digest))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._index[digest] = len(data)
+        self._bytes += len(data)
+        self._evict()
+        self._flush_touched()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            digest, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self._touched.pop(digest, None)
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        """Get a stored file's contents, or None"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read, digest)
+
+    async def set(self, digest: str, data: bytes) -> None:
+        """Store data under its digest"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write, digest, data)
+
+class AttachmentCache:
+    """Content-addressed cache of preprocessed attachments.
+
+    Entries are the JPEG frames of an image, keyed by the SHA-256 of the
+    original file, so the same image posted again in any channel skips
+    decoding and resizing. Aliases map other keys (attachment IDs,
+    perceptual hashes) to a content digest.
+    """
+
+    def __init__(self, max_memory_bytes: int = None, disk_dir: str = None,
+                 max_disk_bytes: int = None, max_aliases: int = 100000):
+        self.max_memory_bytes = max_memory_bytes or config.ATTACHMENT_CACHE_MEMORY_BYTES
+        self.max_aliases = max_aliases
+
+        if disk_dir is None:
+            disk_dir = config.ATTACHMENT_CACHE_DIR
+        self.disk: Optional[DiskBlobStore] = DiskBlobStore(
+            disk_dir, max_disk_bytes or config.ATTACHMENT_CACHE_DISK_BYTES
+        ) if disk_dir else None
+
+        self._entries: "OrderedDict[str, Tuple[bytes, ...]]" = OrderedDict()
+        self._bytes = 0
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, alias: str) -> Optional[str]:
+        """Get the digest an alias points to"""
+        digest = self._aliases.get(alias)
+        if digest is not None:
+            self._aliases.move_to_end(alias)
+
+        return digest
+
+    def link(self, alias: str, digest: str) -> None:
+        """Point an alias at a digest"""
+        self._aliases[alias] = digest
+        self._aliases.move_to_end(alias)
+
+        while len(self._aliases) > self.max_aliases:
+            self._aliases.popitem(last=False)
+
+    async def get(self, digest: str) -> Optional[List[bytes]]:
+        """Get cached frames, checking memory first and then disk"""
+        frames = self._entries.get(digest)
+
+        if frames is None and self.disk is not None:
+            try:
+                data = await self.disk.get(digest)
+            except Exception as e:
+                logger.error(f"Error reading attachment cache: {str(e)}")
+                data = None
+
+            if data is not None:
+                frames = unpack_frames(data)
+                if frames is not None:
+                    frames = tuple(frames)
+                    self._store(digest, frames)
+
+        if frames is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="attachment", result="miss")
+            return None
+
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+        self.hits += 1
+        CACHE_LOOKUPS.inc(cache="attachment", result="hit")
+        return list(frames)
+
+    async def set(self, digest: str, frames: List[bytes]) -> None:
+        """Cache frames in memory and on disk"""
+        self._store(digest, tuple(frames))
+
+        if self.disk is not None:
+            try:
+                await self.disk.set(digest, pack_frames(frames))
+            except Exception as e:
+                logger.error(f"Error writing attachment cache: {str(e)}")
+
+    def _store(self, digest: str, frames: Tuple[bytes, ...]) -> None:
+        size = sum(len(frame) for frame in frames)
+        if size > self.max_memory_bytes:
+            return
+
+        previous = self._entries.pop(digest, None)
+        if previous is not None:
+            self._bytes -= sum(len(frame) for frame in previous)
+
+        self._entries[digest] = frames
+        self._bytes += size
+
+        while self._bytes > self.max_memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sum(len(frame) for frame in evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory usage"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,241 @@
+"""In-process stand-ins for Discord and Gemini used by the benchmarks.
+
+Nothing here touches the network: the stub model sleeps in the Gemini
+worker threads like the blocking SDK would, and the fake context records
+what the commands send instead of calling the Discord API.
+"""
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import math
+import random
+import time
+import types
+from typing import Dict, Iterator, List, Optional
+
+from google.api_core import exceptions as google_exceptions
+from PIL import Image
+
+import http_client
+from scheduler import estimate_tokens
+
+# z-score of the 99th percentile of a normal distribution
+Z_P99 = 2.326
+
+ERROR_KINDS = {
+    "transient": lambda: google_exceptions.ServiceUnavailable("Injected 503"),
+    "quota": lambda: google_exceptions.ResourceExhausted("Injected 429"),
+    "timeout": lambda: google_exceptions.DeadlineExceeded("Injected deadline"),
+    "invalid": lambda: google_exceptions.InvalidArgument("Injected 400"),
+}
+
+class LatencyModel:
+    """Log-normal latency distribution described by its median and p99"""
+
+    def __init__(self, median: float, p99: float = None, rng: random.Random = None):
+        self.median = median
+        p99 = median if p99 is None else max(p99, median)
+        self.sigma = math.log(p99 / median) / Z_P99 if median > 0 else 0.0
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.rng.gauss(0, self.sigma))
+
+class StubResponse:
+    """Response shaped like the SDK's: text, usage and, when streamed, chunks"""
+
+    def __init__(self, text: str, prompt_tokens: int, chunk_chars: int = 0, chunk_delay: float = 0.0):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=max(1, len(text) // 4)
+        )
+        self._chunk_chars = chunk_chars
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self) -> Iterator["StubResponse"]:
+        for start in range(0, len(self.text), self._chunk_chars):
+            if start:
+                time.sleep(self._chunk_delay)
+            yield StubResponse(self.text[start:start + self._chunk_chars], 0)
+
+class StubChat:
+    def __init__(self, model: "StubModel", history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, prompt, generation_config=None, stream=False, request_options=None):
+        return self.model.generate_content([self.history, prompt], generation_config, stream, request_options)
+
+class StubModel:
+    """Blocking stand-in for genai.GenerativeModel with injected latency and errors"""
+
+    def __init__(self, model_name: str, latency: LatencyModel, error_rate: float = 0.0,
+                 error_kinds: List[str] = None, response_chars: int = 600, chunk_chars: int = 40,
+                 rng: random.Random = None):
+        self.model_name = model_name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_kinds = error_kinds or ["transient"]
+        self.response_chars = response_chars
+        self.chunk_chars = chunk_chars
+        self.rng = rng or random.Random()
+        self.calls = 0
+
+    def _answer(self, contents, generation_config) -> str:
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            # Multi-language translation asks for a JSON object keyed by language
+            prompt = contents if isinstance(contents, str) else str(contents)
+            marker = "keys are exactly "
+            start = prompt.find(marker)
+            if start != -1:
+                keys, _ = json.JSONDecoder().raw_decode(prompt, start + len(marker))
+                return json.dumps({key: f"translated to {key}" for key in keys})
+
+        words = itertools.cycle("lorem ipsum dolor sit amet consectetur adipiscing elit".split())
+        text = ""
+        while len(text) < self.response_chars:
+            text += next(words) + (". " if self.rng.random() < 0.1 else " ")
+        return text.strip()
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None):
+        self.calls += 1
+        delay = self.latency.sample()
+
+        if self.rng.random() < self.error_rate:
+            time.sleep(delay / 2)
+            raise ERROR_KINDS[self.rng.choice(self.error_kinds)]()
+
+        text = self._answer(contents, generation_config)
+        prompt_tokens = estimate_tokens(contents)
+
+        if not stream:
+            time.sleep(delay)
+            return StubResponse(text, prompt_tokens)
+
+        # Spend half the latency before the first chunk and spread the rest over the others
+        chunks = max(1, math.ceil(len(text) / self.chunk_chars))
+        time.sleep(delay / 2)
+        return StubResponse(text, prompt_tokens, self.chunk_chars, delay / 2 / chunks)
+
+    def start_chat(self, history=None) -> StubChat:
+        return StubChat(self, history)
+
+class FakeHttpClient:
+    """Serves attachment bodies from memory with the HttpClient interface"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.files: Dict[str, bytes] = {}
+
+    def add(self, url: str, data: bytes) -> None:
+        self.files[url] = data
+
+    async def download(self, url: str, max_bytes: int, chunk_size: int = 64 * 1024) -> bytes:
+        await asyncio.sleep(self.latency)
+        data = self.files.get(url)
+        if data is None:
+            raise http_client.DownloadError(f"HTTP 404 for {url}")
+        if len(data) > max_bytes:
+            raise http_client.DownloadTooLarge(f"{url} is larger than {max_bytes} bytes")
+        return data
+
+    async def stream(self, url: str, max_bytes: int, chunk_size: int = 64 * 1024):
+        data = await self.download(url, max_bytes)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def close(self) -> None:
+        pass
+
+class FakeAttachment:
+    _ids = itertools.count(1)
+
+    def __init__(self, filename: str, data: bytes):
+        self.id = next(self._ids)
+        self.filename = filename
+        self.size = len(data)
+        self.url = f"https://cdn.invalid/attachments/{self.id}/{filename}"
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, channel: "FakeContext", content: Optional[str] = None, embed=None):
+        self.id = next(self._ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.edits = 0
+
+    async def edit(self, content: Optional[str] = None, embed=None, **kwargs) -> "FakeMessage":
+        await self.channel.discord_delay()
+        self.edits += 1
+        self.content = content
+        return self
+
+class FakeMember:
+    def __init__(self, user_id: int, guild, admin: bool = False):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.display_avatar = types.SimpleNamespace(url=f"https://cdn.invalid/avatars/{user_id}.png")
+        self.roles = []
+        self.guild = guild
+        self.guild_permissions = types.SimpleNamespace(administrator=admin)
+
+    def get_role(self, role_id: int):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    def __str__(self) -> str:
+        return self.name
+
+class FakeContext:
+    """Just enough of commands.Context for the bot's commands"""
+
+    def __init__(self, bot, user_id: int, guild_id: int, attachments: List[FakeAttachment] = None,
+                 send_latency: float = 0.0):
+        self.bot = bot
+        self.guild = types.SimpleNamespace(id=guild_id, roles=[])
+        self.author = FakeMember(user_id, self.guild)
+        self.message = types.SimpleNamespace(attachments=attachments or [], content="")
+        self.channel = self
+        self.command = None
+        self.send_latency = send_latency
+        self.messages: List[FakeMessage] = []
+
+    async def discord_delay(self) -> None:
+        await asyncio.sleep(self.send_latency)
+
+    async def send(self, content: Optional[str] = None, embed=None, **kwargs) -> FakeMessage:
+        await self.discord_delay()
+        message = FakeMessage(self, content, embed)
+        self.messages.append(message)
+        return message
+
+    @contextlib.asynccontextmanager
+    async def typing(self):
+        yield
+
+    @property
+    def failed(self) -> bool:
+        """Whether the command replied with an error message"""
+        return any(
+            message.content and (message.content.startswith("❌") or message.content.startswith("An error occurred"))
+            for message in self.messages
+        )
+
+def make_image(width: int, height: int, seed: int, fmt: str = "PNG") -> bytes:
+    """Make a noisy test image that doesn't compress to nothing"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height))
+    image.putdata([
+        (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for _ in range(width * height // 64)
+    ] * 64)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
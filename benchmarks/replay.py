@@ -0,0 +1,217 @@
+"""Replay captured command traffic against the stub Gemini model.
+
+Reads a capture written with TRAFFIC_CAPTURE_PATH set (see traffic.py),
+rebuilds each command with synthetic text and attachments of the recorded
+sizes, and runs it through the bot at the recorded pace (or faster). The
+stub model's latency is fitted to the Gemini latencies in the capture
+unless given explicitly. Results can be stored as a baseline and later
+runs diffed against it.
+
+Usage (from the repository root):
+    python -m benchmarks.replay traffic.jsonl --speed 10 --save-baseline baseline.json
+    python -m benchmarks.replay traffic.jsonl --speed 10 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import inspect
+import io
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import add_stub_arguments, format_seconds, open_harness, percentile, print_report
+from traffic import read_capture
+
+LANGUAGES = ["Spanish", "French", "German", "Japanese", "Korean", "Portuguese", "Italian", "Chinese"]
+# Short arguments that name a language rather than carry text
+LANGUAGE_ARGUMENTS = {"target_language": LANGUAGES, "language": ["python", "javascript", "go", "rust"]}
+IMAGE_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".gif": "GIF", ".webp": "WEBP"}
+FILLER = "The quick brown fox jumps over the lazy dog. "
+
+def fit_latency(events: List[Dict[str, Any]]) -> Tuple[Optional[float], Optional[float]]:
+    """Get the median and p99 of the per-call Gemini latency in a capture"""
+    per_call = [event["model_latency"] / event["model_calls"] for event in events if event.get("model_calls")]
+    return percentile(per_call, 0.5), percentile(per_call, 0.99)
+
+def synthesize_text(chars: int, serial: int) -> str:
+    # A serial number keeps replayed prompts distinct, as real ones are
+    prefix = f"{serial} "
+    return (prefix + FILLER * (chars // len(FILLER) + 1))[:max(chars, len(prefix))]
+
+class Replayer:
+    """Turns capture events back into command invocations"""
+
+    def __init__(self, harness):
+        self.harness = harness
+        self.serial = itertools.count(1)
+        self._ids: Dict[Tuple[str, Optional[str]], int] = {}
+        self._images: Dict[Tuple[str, int], bytes] = {}
+
+    def _id(self, kind: str, anonymous: Optional[str]) -> int:
+        key = (kind, anonymous)
+        if key not in self._ids:
+            self._ids[key] = (10000 if kind == "user" else 1000) + len(self._ids)
+        return self._ids[key]
+
+    def _argument(self, name: str, description):
+        if not isinstance(description, list):
+            return description
+
+        chars, commas = description
+        if name in LANGUAGE_ARGUMENTS:
+            choices = LANGUAGE_ARGUMENTS[name]
+            return ",".join(choices[index % len(choices)] for index in range(commas + 1))
+        return synthesize_text(chars, next(self.serial))
+
+    def _image(self, extension: str, size: int) -> bytes:
+        # Noise compresses poorly, so about 3 bytes per pixel
+        side = max(8, int(math.sqrt(size / 3)) // 8 * 8)
+        key = (extension, side)
+        if key not in self._images:
+            data = self.harness.fakes.make_image(side, side, side)
+            if IMAGE_FORMATS[extension] != "PNG":
+                from PIL import Image
+
+                buffer = io.BytesIO()
+                Image.open(io.BytesIO(data)).save(buffer, format=IMAGE_FORMATS[extension])
+                data = buffer.getvalue()
+            self._images[key] = data
+        return self._images[key]
+
+    def _attachment(self, extension: str, size: int):
+        if extension in IMAGE_FORMATS:
+            data = self._image(extension, size)
+        else:
+            data = synthesize_text(size, next(self.serial)).encode("utf-8")
+        return self.harness.attach(f"replay{extension}", data)
+
+    def build(self, event: Dict[str, Any]) -> Optional[Tuple[str, Tuple, Dict, list, int, int]]:
+        """Get the command call of an event, or None if the command no longer exists"""
+        command = self.harness.bot.get_command(event["command"])
+        if command is None:
+            return None
+
+        args, kwargs = [], {}
+        for name, param in command.clean_params.items():
+            default = None if param.default is inspect.Parameter.empty else param.default
+            value = self._argument(name, event["args"].get(name, default))
+            if param.kind == inspect.Parameter.KEYWORD_ONLY:
+                kwargs[name] = value
+            else:
+                args.append(value)
+
+        attachments = [self._attachment(extension, size) for extension, size in event["attachments"]]
+        return (event["command"], tuple(args), kwargs, attachments,
+                self._id("user", event["user"]), self._id("guild", event["guild"]))
+
+    async def replay(self, events: List[Dict[str, Any]], speed: float) -> Dict[str, Any]:
+        """Start each event at its recorded offset divided by speed (0 = all at once)"""
+        calls = [(event["t"], self.build(event)) for event in events]
+        calls = [(offset, call) for offset, call in calls if call is not None]
+        origin = calls[0][0] if calls else 0.0
+
+        async def work(record) -> None:
+            async def run(call) -> None:
+                latency, failed = await self.harness.run_command(*call)
+                record(call[0], latency, failed)
+
+            tasks = []
+            started = time.perf_counter()
+            for offset, call in calls:
+                if speed > 0:
+                    delay = (offset - origin) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(run(call)))
+            await asyncio.gather(*tasks)
+
+        return await self.harness.measure(work)
+
+def compare(baseline: Dict[str, Any], result: Dict[str, Any], threshold: float) -> List[str]:
+    """Print the change of each metric against the baseline and return the regressions"""
+    rows = [("throughput", baseline["throughput"], result["throughput"], True),
+            ("p50", baseline["p50"], result["p50"], False),
+            ("p99", baseline["p99"], result["p99"], False)]
+    for name in sorted(set(baseline["per_command"]) & set(result["per_command"])):
+        for key in ("p50", "p99"):
+            rows.append((f"{name} {key}", baseline["per_command"][name][key],
+                         result["per_command"][name][key], False))
+
+    regressions = []
+    print(f"{'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, before, after, higher_is_better in rows:
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+
+        show = (lambda value: f"{value:.1f}/s") if name == "throughput" else format_seconds
+        print(f"{name:<20} {show(before):>10} {show(after):>10} {change:>+8.0%}{flag}")
+
+    return regressions
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a stub Gemini model")
+    parser.add_argument("capture", help="capture file written with TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed; 0 starts every command at once")
+    parser.add_argument("--include-rejected", action="store_true",
+                        help="also replay commands refused by cooldowns, permissions or rate limits")
+    parser.add_argument("--baseline", help="diff the results against this baseline file")
+    parser.add_argument("--save-baseline", help="write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    add_stub_arguments(parser)
+    # Fitted to the capture unless given
+    parser.set_defaults(latency_median=None, latency_p99=None)
+    return parser.parse_args(argv)
+
+async def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+
+    events = list(read_capture(args.capture))
+    if not args.include_rejected:
+        # They were answered without running; replay can't reproduce that
+        events = [event for event in events if not event.get("outcome", "").startswith("rejected")]
+    if not events:
+        print("The capture has no commands to replay")
+        return 1
+
+    median, p99 = fit_latency(events)
+    if args.latency_median is None:
+        args.latency_median = median if median is not None else 0.5
+    if args.latency_p99 is None:
+        args.latency_p99 = p99 if p99 is not None else args.latency_median
+    print(f"Replaying {len(events)} commands at {args.speed or 'max'}x, "
+          f"Gemini latency median {format_seconds(args.latency_median)} / p99 {format_seconds(args.latency_p99)}")
+
+    async with open_harness(args) as harness:
+        result = await Replayer(harness).replay(events, args.speed)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report([result])
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if compare(baseline, result, args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,379 @@
+"""Offline load test of the bot's commands.
+
+Drives the real command callbacks (with their permission, cooldown and
+invoke hooks) against fake Discord contexts and a stub Gemini model, for
+one or more numbers of concurrent simulated users, and reports throughput,
+latency percentiles, event-loop lag and memory.
+
+Usage (from the repository root):
+    python -m benchmarks.run --users 1,10,50 --requests 20 --scenario mixed
+    python -m benchmarks.run --scenario gemini --latency-median 0.8 --latency-p99 4 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+SCENARIOS = ("gemini", "vision", "translate", "summarize", "code", "imagine")
+MIXED_WEIGHTS = {"gemini": 6, "vision": 1, "translate": 1, "summarize": 1, "code": 1, "imagine": 1}
+
+def configure(state_dir: str, real_quotas: bool, state_store_port: Optional[int] = None) -> None:
+    """Point every on-disk store at a scratch directory before bot.py is imported.
+
+    With state_store_port, cooldowns, rate limits and conversations go to a
+    stand-in state store on that port, as in a sharded deployment.
+    """
+    config.SHARD_COUNT = 0
+    config.SHARD_PROCESSES = 1
+    config.STATE_BACKEND = "memory" if state_store_port is None else "resp"
+    config.CONVERSATION_STORAGE_BACKEND = "sqlite" if state_store_port is None else "resp"
+    config.STATE_STORE_HOST = "127.0.0.1"
+    config.STATE_STORE_PORT = state_store_port or config.STATE_STORE_PORT
+    config.CONVERSATION_DB_PATH = os.path.join(state_dir, "conversations.db")
+    config.CONVERSATION_JSON_DIR = os.path.join(state_dir, "conversations")
+    config.RESPONSE_CACHE_DISK_PATH = os.path.join(state_dir, "responses.db")
+    config.ATTACHMENT_CACHE_DIR = os.path.join(state_dir, "attachments")
+    config.ENABLE_METRICS_SERVER = False
+
+    if not real_quotas:
+        # Measure the bot, not the quota: admit every request immediately
+        config.GEMINI_MODEL_QUOTAS = {"default": {"requests_per_minute": 10 ** 9, "tokens_per_minute": 10 ** 12}}
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a periodic timer"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+class Harness:
+    """Loads bot.py and the cogs with their Gemini models and downloads replaced by fakes"""
+
+    def __init__(self, args: argparse.Namespace):
+        from benchmarks import fakes
+
+        self.args = args
+        self.fakes = fakes
+        self.rng = random.Random(args.seed)
+
+        import bot as bot_module
+        from utils import create_rate_limiter
+
+        self.bot_module = bot_module
+        self.bot = bot_module.bot
+
+        latency = fakes.LatencyModel(args.latency_median, args.latency_p99, random.Random(args.seed + 1))
+        self.models: Dict[str, Any] = {}
+
+        def model_factory(model_name: str):
+            model = fakes.StubModel(
+                model_name, latency, args.error_rate, args.error_kinds.split(","),
+                args.response_chars, rng=random.Random(args.seed + 2)
+            )
+            self.models[model_name] = model
+            return model
+
+        gemini_client = bot_module.gemini_client
+        gemini_client._model_factory = model_factory
+        gemini_client._models.clear()
+
+        self.http = fakes.FakeHttpClient(args.download_latency)
+        bot_module.http_client = self.http
+        self.bot.http_client = self.http
+
+        # Each simulated user sends far more than a person would
+        bot_module.rate_limiter = create_rate_limiter(max_requests=10 ** 9)
+
+        self.images = [
+            fakes.make_image(width, height, seed)
+            for seed, (width, height) in enumerate([(640, 480), (1920, 1080), (2048, 2048)])
+        ]
+        self.document = (
+            "Meeting notes. The team reviewed the release plan and agreed on the dates.\n\n" * 1200
+        ).encode("utf-8")
+        self.counter = 0
+
+    async def setup(self) -> None:
+        from cogs.advanced_commands import AdvancedCommands
+
+        if self.bot.get_cog("AdvancedCommands") is None:
+            await self.bot.add_cog(AdvancedCommands(self.bot))
+
+    async def close(self) -> None:
+        module = self.bot_module
+        await module.conversation_manager.close()
+        await module.close_client()
+        module.gemini_client.close()
+        module.image_preprocessor.close()
+
+    def attach(self, filename: str, data: bytes):
+        attachment = self.fakes.FakeAttachment(filename, data)
+        self.http.add(attachment.url, data)
+        return attachment
+
+    def build(self, scenario: str, user_id: int) -> Tuple[str, Tuple, Dict, list]:
+        """Get the command name, arguments and attachments of one request"""
+        self.counter += 1
+        # Unique text per request, so the response cache doesn't hide the model
+        tag = f"#{self.counter}" if not self.args.repeat else ""
+
+        if scenario == "gemini":
+            return "gemini", (), {"prompt": f"Explain how event loops schedule callbacks {tag}"}, []
+        if scenario == "vision":
+            count = self.rng.randint(1, len(self.images))
+            attachments = [self.attach(f"image{index}.png", self.images[index]) for index in range(count)]
+            return "vision", (), {"prompt": f"What is in these images? {tag}"}, attachments
+        if scenario == "translate":
+            return "translate", ("es,fr,de",), {"text": f"The build is green again {tag}"}, []
+        if scenario == "summarize":
+            attachment = self.attach("notes.txt", self.document + tag.encode())
+            return "summarize", (), {"text": None}, [attachment]
+        if scenario == "code":
+            return "code", ("python",), {"prompt": f"function that merges two sorted lists {tag}"}, []
+        return "imagine", (), {"prompt": f"a lighthouse in a storm {tag}"}, []
+
+    async def invoke(self, scenario: str, user_id: int, guild_id: int) -> Tuple[float, bool]:
+        name, args, kwargs, attachments = self.build(scenario, user_id)
+        return await self.run_command(name, args, kwargs, attachments, user_id, guild_id)
+
+    async def run_command(self, name: str, args: Tuple, kwargs: Dict, attachments: list,
+                          user_id: int, guild_id: int) -> Tuple[float, bool]:
+        """Run one command the way discord.py does once it has parsed the arguments.
+
+        Returns the latency and whether the command replied with an error.
+        """
+        command = self.bot.get_command(name)
+        ctx = self.fakes.FakeContext(self.bot, user_id, guild_id, attachments, self.args.send_latency)
+        ctx.command = command
+        ctx.args = ([command.cog] if command.cog is not None else []) + [ctx, *args]
+        ctx.kwargs = kwargs
+
+        # Cooldowns are per user and command; clear them so users aren't throttled
+        await self.bot_module.cooldown_manager.clear_cooldown(command.name, user_id)
+
+        started = time.perf_counter()
+        await command.call_before_hooks(ctx)
+        try:
+            if command.cog is not None:
+                await command.callback(command.cog, ctx, *args, **kwargs)
+            else:
+                await command.callback(ctx, *args, **kwargs)
+        except Exception:
+            ctx.messages.append(self.fakes.FakeMessage(ctx, "❌ unhandled"))
+        finally:
+            await command.call_after_hooks(ctx)
+
+        return time.perf_counter() - started, ctx.failed
+
+    def pick(self) -> str:
+        if self.args.scenario != "mixed":
+            return self.args.scenario
+        names = list(MIXED_WEIGHTS)
+        return self.rng.choices(names, weights=[MIXED_WEIGHTS[name] for name in names])[0]
+
+    async def measure(self, work: Callable[[Callable[[str, float, bool], None]], Awaitable[None]]) -> Dict[str, Any]:
+        """Run work(record) and summarize the latencies it records along with loop lag and memory"""
+        latencies: Dict[str, List[float]] = {}
+        failures = 0
+        calls_before = sum(model.calls for model in self.models.values())
+
+        def record(name: str, latency: float, failed: bool) -> None:
+            nonlocal failures
+            latencies.setdefault(name, []).append(latency)
+            failures += failed
+
+        gc.collect()
+        if self.args.trace_memory:
+            tracemalloc.start()
+
+        monitor = LoopLagMonitor()
+        monitor.start()
+        started = time.perf_counter()
+        await work(record)
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+
+        traced_peak = None
+        if self.args.trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+
+        everything = [value for values in latencies.values() for value in values]
+        return {
+            "requests": len(everything),
+            "failed": failures,
+            "elapsed": elapsed,
+            "throughput": len(everything) / elapsed if elapsed else 0.0,
+            "p50": percentile(everything, 0.5),
+            "p99": percentile(everything, 0.99),
+            "per_command": {
+                name: {"requests": len(values), "p50": percentile(values, 0.5), "p99": percentile(values, 0.99)}
+                for name, values in sorted(latencies.items())
+            },
+            "model_calls": sum(model.calls for model in self.models.values()) - calls_before,
+            "loop_lag_p99": percentile(monitor.samples, 0.99),
+            "loop_lag_max": max(monitor.samples, default=None),
+            "peak_rss_mb": peak_rss_mb(),
+            "traced_peak_mb": traced_peak,
+        }
+
+    async def run_level(self, users: int) -> Dict[str, Any]:
+        """Run `requests` back-to-back requests for each of `users` concurrent users"""
+        async def user(user_id: int, record) -> None:
+            for _ in range(self.args.requests):
+                scenario = self.pick()
+                latency, failed = await self.invoke(scenario, user_id, 1000 + user_id % self.args.guilds)
+                record(scenario, latency, failed)
+                if self.args.think:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * self.args.think))
+
+        async def work(record) -> None:
+            await asyncio.gather(*(user(10000 + index, record) for index in range(users)))
+
+        return {"users": users, **await self.measure(work)}
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    """Print one row per result; results without a user count show "-" there"""
+    header = f"{'users':>6} {'reqs':>6} {'failed':>6} {'req/s':>8} {'p50':>8} {'p99':>8} " \
+             f"{'calls':>6} {'lag p99':>8} {'lag max':>8} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+        print(
+            f"{result.get('users', '-'):>6} {result['requests']:>6} {result['failed']:>6} "
+            f"{result['throughput']:>8.1f} {format_seconds(result['p50']):>8} {format_seconds(result['p99']):>8} "
+            f"{result['model_calls']:>6} {format_seconds(result['loop_lag_p99']):>8} "
+            f"{format_seconds(result['loop_lag_max']):>8} {rss:>8}"
+        )
+        if result["traced_peak_mb"] is not None:
+            print(f"{'':>6} Python heap peak: {result['traced_peak_mb']:.1f} MB")
+        if len(result["per_command"]) > 1:
+            for name, stats in result["per_command"].items():
+                print(f"{'':>6} {name:<10} {stats['requests']:>5} reqs  "
+                      f"p50 {format_seconds(stats['p50'])}  p99 {format_seconds(stats['p99'])}")
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options of the fake Gemini model and Discord, shared with the replayer"""
+    parser.add_argument("--latency-median", type=float, default=0.5, help="median Gemini latency (s)")
+    parser.add_argument("--latency-p99", type=float, default=2.0, help="p99 Gemini latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Gemini calls that fail")
+    parser.add_argument("--error-kinds", default="transient",
+                        help="comma-separated injected errors: transient, quota, timeout, invalid")
+    parser.add_argument("--response-chars", type=int, default=600, help="length of stub answers")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="Discord send/edit latency (s)")
+    parser.add_argument("--download-latency", type=float, default=0.05, help="attachment download latency (s)")
+    parser.add_argument("--real-quotas", action="store_true", help="keep GEMINI_MODEL_QUOTAS instead of lifting them")
+    parser.add_argument("--shared-state", action="store_true",
+                        help="keep cooldowns, rate limits and conversations in a local stand-in state store")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's logging")
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test with fake Discord and a stub Gemini model")
+    parser.add_argument("--users", default="1,10,50", help="comma-separated concurrent user counts to run")
+    parser.add_argument("--requests", type=int, default=10, help="requests per user at each level")
+    parser.add_argument("--scenario", default="mixed", choices=SCENARIOS + ("mixed",))
+    parser.add_argument("--guilds", type=int, default=5, help="servers the users are spread over")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's requests (s)")
+    parser.add_argument("--repeat", action="store_true", help="repeat identical requests so caches can answer")
+    add_stub_arguments(parser)
+    return parser.parse_args(argv)
+
+@contextlib.asynccontextmanager
+async def open_harness(args: argparse.Namespace) -> AsyncIterator[Harness]:
+    """Load the bot against fakes, with its state in a temporary directory"""
+    with tempfile.TemporaryDirectory(prefix="bot-bench-") as state_dir:
+        state_store = None
+        if args.shared_state:
+            from resp_store import RespServer
+
+            with socket.socket() as probe:
+                probe.bind(("127.0.0.1", 0))
+                port = probe.getsockname()[1]
+            state_store = RespServer("127.0.0.1", port)
+            await state_store.start()
+
+        configure(state_dir, args.real_quotas, state_store.port if state_store else None)
+        harness = Harness(args)
+        if not args.verbose:
+            # Injected errors would otherwise flood the report
+            logging.getLogger().setLevel(logging.CRITICAL)
+
+        await harness.setup()
+        try:
+            yield harness
+        finally:
+            await harness.close()
+            if state_store is not None:
+                await state_store.close()
+
+async def main(argv: List[str] = None) -> List[Dict[str, Any]]:
+    args = parse_args(argv)
+
+    async with open_harness(args) as harness:
+        results = [await harness.run_level(int(users)) for users in args.users.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    return results
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,32 @@
 import os
+import functools
+import hashlib
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import google.generativeai as genai
-import io
-import aiohttp
-from PIL import Image
 import config
+from gemini_client import GeminiClient
+from cache import ResponseCache
+from scheduler import GeminiScheduler, set_request_origin, split_quotas, PRIORITY_ADMIN, PRIORITY_NORMAL
+from router import ModelRouter
+from streaming import StreamingResponder
+from context_builder import ContextBuilder
+from image_pipeline import ImagePreprocessor, IMAGE_MIME_TYPE
+from http_client import HttpClient, DownloadError, DownloadTooLarge
+from attachment_cache import AttachmentCache
+from traffic import TrafficRecorder
+from resp_store import close_client
+from metrics import (
+    MetricsServer, start_command, finish_command,
+    COMMANDS, COMMAND_DURATION, COMMAND_ERRORS, COMMAND_REJECTIONS,
+    DISCORD_SEND_DURATION, GEMINI_DURATION, GEMINI_TOKENS
+)
 import logging
 import asyncio
 from typing import Dict, List, Optional, Union
 from utils import (
-    CooldownManager, PermissionManager, RateLimiter,
-    InputValidator, ErrorHandler, split_long_message
+    PermissionManager, ConversationManager, InputValidator, ErrorHandler,
+    create_cooldown_manager, create_rate_limiter, split_long_message
 )
 
 logging.basicConfig(
@@ -23,44 +38,112 @@ logger = logging.getLogger('gemini-discord-bot')
 genai.configure(api_key=config.GEMINI_API_KEY)
 
 intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-
-bot = commands.Bot(command_prefix=config.COMMAND_PREFIX, intents=intents)
-
-conversation_history: Dict[int, List[Dict[str, str]]] = {}
+if config.ENABLE_PRIVILEGED_INTENTS:
+    intents.message_content = True
+    intents.members = True
+    command_prefix = config.COMMAND_PREFIX
+    cache_options = {}
+else:
+    # Discord still sends the text of messages that mention the bot (and of DMs)
+    command_prefix = commands.when_mentioned_or(config.COMMAND_PREFIX)
+    cache_options = {"member_cache_flags": discord.MemberCacheFlags.none(), "chunk_guilds_at_startup": False}
+
+# With SHARD_COUNT set, this process runs the shards in SHARD_IDS (all of them if unset)
+BotBase = commands.AutoShardedBot if config.SHARD_COUNT else commands.Bot
+
+class GeminiBot(BotBase):
+    """Bot that releases shared resources on shutdown"""
+
+    async def close(self):
+        await conversation_manager.close()
+        await close_client()
+        gemini_client.close()
+        image_preprocessor.close()
+        await http_client.close()
+        await metrics_server.close()
+        if traffic_recorder is not None:
+            traffic_recorder.close()
+        await super().close()
+
+shard_options = {"shard_count": config.SHARD_COUNT, "shard_ids": config.SHARD_IDS} if config.SHARD_COUNT else {}
+bot = GeminiBot(command_prefix=command_prefix, intents=intents, help_command=None, **shard_options, **cache_options)
+
+metrics_server = MetricsServer()
+traffic_recorder = TrafficRecorder(config.TRAFFIC_CAPTURE_PATH) if config.TRAFFIC_CAPTURE_PATH else None
+
+@bot.before_invoke
+async def before_command(ctx):
+    """Count and time every command, including the cogs', and capture it if enabled"""
+    await start_command(ctx)
+    if traffic_recorder is not None:
+        traffic_recorder.start(ctx)
+
+@bot.after_invoke
+async def after_command(ctx):
+    await finish_command(ctx)
+    if traffic_recorder is not None:
+        traffic_recorder.finish(ctx)
+
+# Conversation memory shared by !gemini and the cogs
+conversation_manager = ConversationManager(max_history=config.CONVERSATION_MEMORY_LIMIT)
+bot.conversation_manager = conversation_manager
+
+# Shared Gemini client used by the core commands and the cogs
+response_cache = ResponseCache() if config.ENABLE_RESPONSE_CACHE else None
+gemini_client = GeminiClient(
+    cache=response_cache,
+    # Each worker process gets an equal share of the project-wide quota
+    scheduler=GeminiScheduler(split_quotas(config.GEMINI_MODEL_QUOTAS, config.SHARD_PROCESSES)),
+    router=ModelRouter() if config.ENABLE_MODEL_ROUTER else None
+)
+bot.gemini_client = gemini_client
 
-text_model = genai.GenerativeModel(config.GEMINI_TEXT_MODEL)
-pro_model = genai.GenerativeModel(config.GEMINI_PRO_MODEL)
+# Initialize managers (the cooldown manager is shared with the cogs)
+# (kept in the shared state store when STATE_BACKEND is "resp")
+cooldown_manager = create_cooldown_manager()
+bot.cooldown_manager = cooldown_manager
+rate_limiter = create_rate_limiter()
+context_builder = ContextBuilder(conversation_manager, gemini_client)
+image_preprocessor = ImagePreprocessor()
 
-# Initialize managers
-cooldown_manager = CooldownManager()
-rate_limiter = RateLimiter()
+# Pooled HTTP session for attachment downloads
+http_client = HttpClient()
+bot.http_client = http_client
+attachment_cache = AttachmentCache()
 
 def check_permissions_and_cooldown(cooldown_time: float):
     """Decorator to check permissions, cooldowns, and rate limits"""
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(ctx, *args, **kwargs):
-            # Check if user is rate limited
-            if rate_limiter.is_rate_limited(ctx.author.id):
-                await ErrorHandler.handle_rate_limit_error(ctx)
-                return
+            command_name = ctx.command.name
 
             # Check permissions
-            if not PermissionManager.can_use_command(ctx.author, func.__name__):
-                await ErrorHandler.handle_permission_error(ctx, func.__name__)
+            if not PermissionManager.can_use_command(ctx.author, command_name):
+                await ErrorHandler.handle_permission_error(ctx, command_name)
                 return
 
             # Check cooldown (skip for admins)
-            if not PermissionManager.is_admin(ctx.author):
-                if cooldown_manager.is_on_cooldown(func.__name__, ctx.author.id, cooldown_time):
-                    remaining = cooldown_manager.get_remaining_cooldown(func.__name__, ctx.author.id, cooldown_time)
+            is_admin = PermissionManager.is_admin(ctx.author)
+            if not is_admin:
+                remaining = await cooldown_manager.get_remaining_cooldown(command_name, ctx.author.id)
+                if remaining > 0:
                     await ErrorHandler.handle_cooldown_error(ctx, remaining)
                     return
 
-            # Set cooldown and add request
-            cooldown_manager.set_cooldown(func.__name__, ctx.author.id)
-            rate_limiter.add_request(ctx.author.id)
+            # Check the rate limit and record the request in one step
+            if not await rate_limiter.acquire(ctx.author.id):
+                await ErrorHandler.handle_rate_limit_error(ctx)
+                return
+
+            # Set cooldown
+            await cooldown_manager.set_cooldown(command_name, ctx.author.id, cooldown_time)
+
+            # Let the scheduler queue this command's Gemini calls fairly
+            set_request_origin(
+                ctx.guild.id if ctx.guild else None,
+                PRIORITY_ADMIN if is_admin else PRIORITY_NORMAL
+            )
 
             # Execute command
             try:
@@ -81,12 +164,64 @@ async def on_ready():
         name=f"{config.COMMAND_PREFIX}help"
     ))
 
+    if not sweep_state.is_running():
+        sweep_state.start()
+
+    if config.ENABLE_METRICS_SERVER:
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error(f"Could not start metrics server: {str(e)}")
+
     try:
         await load_cogs()
         logger.info("All cogs loaded successfully.")
     except Exception as e:
         logger.error(f"Error loading cogs: {str(e)}")
 
+# Keep PermissionManager's cached admin roles and verdicts in step with Discord
+@bot.event
+async def on_guild_role_create(role):
+    PermissionManager.invalidate_guild(role.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    PermissionManager.invalidate_guild(role.guild.id)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    PermissionManager.invalidate_guild(after.guild.id)
+
+@bot.event
+async def on_guild_update(before, after):
+    # The owner is always an admin
+    if before.owner_id != after.owner_id:
+        PermissionManager.invalidate_guild(after.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    PermissionManager.invalidate_guild(guild.id)
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        PermissionManager.invalidate_member(after.guild.id, after.id)
+
+@bot.event
+async def on_member_remove(member):
+    PermissionManager.invalidate_member(member.guild.id, member.id)
+
+@tasks.loop(seconds=config.STATE_SWEEP_INTERVAL)
+async def sweep_state():
+    """Periodically drop state kept for idle users"""
+    removed = rate_limiter.sweep()
+    if removed:
+        logger.debug(f"Rate limiter: dropped {removed} idle users")
+
+    expired = cooldown_manager.sweep()
+    if expired:
+        logger.debug(f"Cooldowns: expired {expired} entries")
+
 async def load_cogs():
     """Load all cogs from the cogs directory"""
     for filename in os.listdir("./cogs"):
@@ -119,46 +254,75 @@ async def gemini_command(ctx, *, prompt: str = None):
     async with ctx.typing():
         user_id = ctx.author.id
 
-        if config.ENABLE_CONVERSATION_MEMORY:
-            if user_id not in conversation_history:
-                conversation_history[user_id] = []
-
-            conversation_history[user_id].append({"role": "user", "parts": [prompt]})
-
-            if len(conversation_history[user_id]) > config.CONVERSATION_MEMORY_LIMIT * 2:
-                conversation_history[user_id] = conversation_history[user_id][-config.CONVERSATION_MEMORY_LIMIT * 2:]
-
-            chat = text_model.start_chat(history=conversation_history[user_id])
-            response = chat.send_message(
-                prompt,
-                generation_config={
-                    "temperature": config.DEFAULT_TEMPERATURE,
-                    "top_p": config.DEFAULT_TOP_P,
-                    "top_k": config.DEFAULT_TOP_K,
-                    "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-                }
-            )
+        generation_config = {
+            "temperature": config.DEFAULT_TEMPERATURE,
+            "top_p": config.DEFAULT_TOP_P,
+            "top_k": config.DEFAULT_TOP_K,
+            "max_output_tokens": config.MAX_OUTPUT_TOKENS,
+        }
 
-            conversation_history[user_id].append({"role": "model", "parts": [response.text]})
-        else:
-            response = text_model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": config.DEFAULT_TEMPERATURE,
-                    "top_p": config.DEFAULT_TOP_P,
-                    "top_k": config.DEFAULT_TOP_K,
-                    "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-                }
-            )
+        history = None
+        if config.ENABLE_CONVERSATION_MEMORY:
+            history = await context_builder.build(user_id, prompt)
 
-        response_text = response.text
+        if config.ENABLE_STREAMING:
+            if history is not None:
+                chunks = gemini_client.stream_chat(history, prompt, generation_config=generation_config, task="chat")
+            else:
+                chunks = gemini_client.stream(prompt, generation_config=generation_config, task="chat")
 
-        if len(response_text) > config.MAX_RESPONSE_LENGTH:
-            chunks = split_long_message(response_text, config.MAX_RESPONSE_LENGTH)
-            for chunk in chunks:
-                await ctx.send(chunk)
+            response_text = await StreamingResponder(ctx).consume(chunks)
         else:
-            await ctx.send(response_text)
+            if history is not None:
+                response_text = await gemini_client.chat(history, prompt, generation_config=generation_config, task="chat")
+            else:
+                response_text = await gemini_client.generate(prompt, generation_config=generation_config, task="chat")
+
+            if len(response_text) > config.MAX_RESPONSE_LENGTH:
+                chunks = split_long_message(response_text, config.MAX_RESPONSE_LENGTH)
+                for chunk in chunks:
+                    await ctx.send(chunk)
+            else:
+                await ctx.send(response_text)
+
+        if history is not None:
+            await conversation_manager.add_message(user_id, "user", prompt)
+            await conversation_manager.add_message(user_id, "model", response_text)
+            context_builder.maintain(user_id)
+
+async def load_image(attachment: discord.Attachment) -> List[bytes]:
+    """Get the preprocessed JPEG frames of an image attachment, using the attachment cache"""
+    alias = f"attachment:{attachment.id}"
+    digest = attachment_cache.resolve(alias)
+    if digest is not None:
+        frames = await attachment_cache.get(digest)
+        if frames is not None:
+            return frames
+
+    # The declared size can't be trusted; the download aborts past the limit
+    raw = await http_client.download(attachment.url, config.MAX_IMAGE_SIZE_MB * 1024 * 1024)
+    digest = await asyncio.to_thread(lambda: hashlib.sha256(raw).hexdigest())
+    attachment_cache.link(alias, digest)
+
+    frames = await attachment_cache.get(digest)
+    if frames is not None:
+        return frames
+
+    # Decoding and resizing are CPU-bound; keep them off the event loop
+    frames = await image_preprocessor.preprocess(raw)
+
+    if config.ENABLE_PERCEPTUAL_HASH and len(frames) == 1:
+        # Reuse the bytes of a visually identical image so its answers are cached too
+        fingerprint = f"dhash:{await image_preprocessor.fingerprint(frames[0])}"
+        similar = attachment_cache.resolve(fingerprint)
+        previous = await attachment_cache.get(similar) if similar is not None else None
+        if previous is not None:
+            frames = previous
+        else:
+            attachment_cache.link(fingerprint, digest)
+
+    await attachment_cache.set(digest, frames)
+    return frames
 
 @bot.command(name="vision", aliases=["image", "analyze", "see"])
 @check_permissions_and_cooldown(config.COOLDOWN_VISION)
@@ -168,6 +332,9 @@ async def vision_command(ctx, *, prompt: Optional[str] = None):
     Usage:
     - With image: !vision [description or question]
     - Image only: !vision
+
+    Every image attached to the message is sent in one request; animated
+    GIF/WEBP images are sent as a few sampled frames.
     """
     if not config.ENABLE_IMAGE_ANALYSIS:
         await ctx.send("❌ Image analysis feature is disabled.")
@@ -177,15 +344,18 @@ async def vision_command(ctx, *, prompt: Optional[str] = None):
         await ctx.send(f"❌ Please attach an image. Usage: {config.COMMAND_PREFIX}vision [description or question]")
         return
 
-    attachment = ctx.message.attachments[0]
+    # Only the images are analyzed; other files sent alongside them are ignored
+    attachments = [
+        attachment for attachment in ctx.message.attachments
+        if attachment.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))
+    ][:config.VISION_MAX_ATTACHMENTS]
 
-    # Validate file type
-    if not any(attachment.filename.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
+    if not attachments:
         await ctx.send("❌ Supported image formats: PNG, JPG, JPEG, GIF, WEBP")
         return
 
-    # Validate file size
-    if not InputValidator.validate_image_size(attachment.size):
+    # Validate file sizes
+    if not all(InputValidator.validate_image_size(attachment.size) for attachment in attachments):
         await ctx.send(f"❌ Image too large. Maximum size: {config.MAX_IMAGE_SIZE_MB}MB")
         return
 
@@ -198,30 +368,53 @@ async def vision_command(ctx, *, prompt: Optional[str] = None):
         prompt = InputValidator.sanitize_input(prompt)
     
     async with ctx.typing():
-        async with aiohttp.ClientSession() as session:
-            async with session.get(attachment.url) as resp:
-                if resp.status != 200:
-                    await ctx.send("❌ Could not download the image.")
-                    return
+        # Fetch and preprocess every attachment concurrently
+        results = await asyncio.gather(
+            *(load_image(attachment) for attachment in attachments),
+            return_exceptions=True
+        )
 
-                image_data = await resp.read()
-                image = Image.open(io.BytesIO(image_data))
+        for attachment, result in zip(attachments, results):
+            if isinstance(result, DownloadTooLarge):
+                await ctx.send(f"❌ {attachment.filename} is too large. Maximum size: {config.MAX_IMAGE_SIZE_MB}MB")
+                return
+            if isinstance(result, DownloadError):
+                logger.warning(f"Could not download image from {ctx.author}: {str(result)}")
+                await ctx.send(f"❌ Could not download {attachment.filename}.")
+                return
+            if isinstance(result, (OSError, ValueError)):
+                logger.warning(f"Could not process image from {ctx.author}: {str(result)}")
+                await ctx.send(f"❌ Could not read {attachment.filename}.")
+                return
+            if isinstance(result, BaseException):
+                raise result
 
         if not prompt:
-            prompt = "Please describe this image in detail."
-
-        response = text_model.generate_content(
-            [prompt, image],
+            prompt = ("Please describe this image in detail." if len(attachments) == 1
+                      else "Please describe these images in detail.")
+
+        # Everything goes out as one multimodal request
+        contents = [prompt]
+        for index, (attachment, frames) in enumerate(zip(attachments, results), start=1):
+            if len(attachments) > 1 or len(frames) > 1:
+                label = f"Image {index} ({attachment.filename})"
+                if len(frames) > 1:
+                    label += f", {len(frames)} evenly spaced frames of an animation"
+                contents.append(label + ":")
+            contents.extend({"mime_type": IMAGE_MIME_TYPE, "data": frame} for frame in frames)
+
+        response_text = await gemini_client.generate(
+            contents,
             generation_config={
                 "temperature": config.DEFAULT_TEMPERATURE,
                 "top_p": config.DEFAULT_TOP_P,
                 "top_k": config.DEFAULT_TOP_K,
                 "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-            }
+            },
+            cache=True,
+            task="vision"
         )
 
-        response_text = response.text
-
         if len(response_text) > config.MAX_RESPONSE_LENGTH:
             chunks = split_long_message(response_text, config.MAX_RESPONSE_LENGTH)
             for chunk in chunks:
@@ -235,8 +428,8 @@ async def reset_command(ctx):
     """Reset user's conversation history."""
     user_id = ctx.author.id
 
-    if user_id in conversation_history:
-        conversation_history[user_id] = []
+    if await conversation_manager.get_conversation(user_id):
+        await conversation_manager.reset_conversation(user_id)
         await ctx.send("✅ Conversation history has been reset.")
     else:
         await ctx.send("ℹ️ No conversation history to reset.")
@@ -266,17 +459,90 @@ async def stats_command(ctx):
         await ErrorHandler.handle_permission_error(ctx, "stats")
         return
 
-    total_users = len(conversation_history)
-    total_conversations = sum(len(history) for history in conversation_history.values())
+    conversation_stats = conversation_manager.stats()
 
     embed = discord.Embed(
         title="📊 Bot Statistics",
         color=discord.Color.blue()
     )
 
-    embed.add_field(name="Users with conversation history", value=total_users, inline=True)
-    embed.add_field(name="Total conversation messages", value=total_conversations, inline=True)
+    embed.add_field(name="Conversations in memory", value=conversation_stats["resident_users"], inline=True)
+    embed.add_field(name="Messages in memory", value=conversation_stats["resident_messages"], inline=True)
     embed.add_field(name="Servers", value=len(bot.guilds), inline=True)
+    if config.SHARD_COUNT:
+        embed.add_field(
+            name="Shards",
+            value=f"{len(bot.shards)} of {config.SHARD_COUNT} in this worker",
+            inline=True
+        )
+    embed.add_field(
+        name="Conversation memory",
+        value=(
+            f"{conversation_stats['resident_bytes'] / 1024:.0f} KB resident, "
+            f"{conversation_stats['evictions']} evictions"
+        ),
+        inline=False
+    )
+
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.2f}s" if value is not None and value != float("inf") else "-"
+
+    embed.add_field(
+        name="Commands",
+        value=(
+            f"{COMMANDS.value():.0f} handled, {COMMAND_ERRORS.value():.0f} failed, "
+            f"{COMMAND_REJECTIONS.value():.0f} refused\n"
+            f"Latency p50 {seconds(COMMAND_DURATION.quantile(0.5))} / "
+            f"p95 {seconds(COMMAND_DURATION.quantile(0.95))}\n"
+            f"Gemini p95 {seconds(GEMINI_DURATION.quantile(0.95))}, "
+            f"Discord send p95 {seconds(DISCORD_SEND_DURATION.quantile(0.95))}\n"
+            f"Tokens: {GEMINI_TOKENS.value(direction='in'):.0f} in / "
+            f"{GEMINI_TOKENS.value(direction='out'):.0f} out"
+        ),
+        inline=False
+    )
+
+    if gemini_client.scheduler is not None:
+        queued = gemini_client.scheduler.stats()
+        embed.add_field(name="Queued Gemini requests", value=sum(queued.values()), inline=True)
+
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        embed.add_field(
+            name="Response cache",
+            value=(
+                f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%})\n"
+                f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1024:.0f} KB\n"
+                f"{gemini_client.inflight.coalesced} requests coalesced"
+            ),
+            inline=False
+        )
+
+    attachment_stats = attachment_cache.stats()
+    embed.add_field(
+        name="Attachment cache",
+        value=(
+            f"{attachment_stats['hits']} hits / {attachment_stats['misses']} misses\n"
+            f"{attachment_stats['entries']} images, {attachment_stats['bytes'] / 1024:.0f} KB in memory"
+        ),
+        inline=False
+    )
+
+    if gemini_client.router is not None:
+        model_lines = []
+        for model_name, model_stats in gemini_client.router.stats()["models"].items():
+            p50 = f"{model_stats['p50']:.1f}s" if model_stats['p50'] is not None else "-"
+            p95 = f"{model_stats['p95']:.1f}s" if model_stats['p95'] is not None else "-"
+            first_chunk = model_stats['first_chunk_p50']
+            first_chunk = f" (streams: first chunk p50 {first_chunk:.1f}s)" if first_chunk is not None else ""
+            model_lines.append(
+                f"{model_name}: {model_stats['requests']} calls, p50 {p50} / p95 {p95}{first_chunk}, "
+                f"{model_stats['error_rate']:.0%} errors, {model_stats['hedges']} hedged"
+            )
+
+        if model_lines:
+            embed.add_field(name="Models", value="\n".join(model_lines), inline=False)
 
     await ctx.send(embed=embed)
 
@@ -287,7 +553,7 @@ async def reset_all_command(ctx):
         await ErrorHandler.handle_permission_error(ctx, "reset_all")
         return
 
-    conversation_history.clear()
+    await conversation_manager.reset_all()
     await ctx.send("✅ All conversation histories have been reset.")
 
 @bot.command(name="cooldown_status", aliases=["cd_status"])
@@ -300,17 +566,11 @@ async def cooldown_status_command(ctx):
         color=discord.Color.blue()
     )
 
-    commands_cooldowns = {
-        "gemini": config.COOLDOWN_GEMINI,
-        "vision": config.COOLDOWN_VISION,
-        "translate": config.COOLDOWN_TRANSLATE,
-        "summarize": config.COOLDOWN_SUMMARIZE,
-        "code": config.COOLDOWN_CODE,
-        "imagine": config.COOLDOWN_IMAGINE,
-    }
-
-    for cmd_name, cooldown_time in commands_cooldowns.items():
-        remaining = cooldown_manager.get_remaining_cooldown(cmd_name, user_id, cooldown_time)
+    cooldown_commands = ["gemini", "vision", "translate", "summarize", "code", "imagine"]
+    active_cooldowns = await cooldown_manager.get_user_cooldowns(user_id)
+
+    for cmd_name in cooldown_commands:
+        remaining = active_cooldowns.get(cmd_name, 0.0)
         if remaining > 0:
             status = f"⏳ {remaining:.1f}s remaining"
         else:
@@ -370,7 +630,8 @@ async def help_command(ctx):
         value=(
             "• Commands have cooldowns to prevent spam\n"
             "• Admins bypass cooldowns and rate limits\n"
-            "• Use `!cooldown_status` to check your cooldowns"
+            "• Use `!cooldown_status` to check your cooldowns\n"
+            "• Gemini, vision, translate, summarize, code and imagine are also slash commands (`/gemini`, ...)"
         ),
         inline=False
     )
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import config
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger('gemini-discord-bot.cache')
+
+class SQLiteCacheBackend:
+    """On-disk cache tier stored in a single SQLite file"""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        # A single thread owns the connection and serializes every query
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-db")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+        return self._conn
+
+    def _get(self, key: str) -> Optional[Tuple[str, float]]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or row[1] < time.time():
+            return None
+
+        return row[0], row[1]
+
+    def _set(self, key: str, value: str, expires_at: float) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at)
+        )
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+        conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Drop expired rows and keep the table within max_entries"""
+        conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def _clear(self) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Get (value, expires_at) for a key, or None"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get, key)
+
+    async def set(self, key: str, value: str, expires_at: float) -> None:
+        """Store a value until expires_at (wall-clock time)"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._set, key, value, expires_at)
+
+    async def clear(self) -> None:
+        """Remove every stored response"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._clear)
+
+class ResponseCache:
+    """LRU + TTL cache for deterministic Gemini responses.
+
+    The in-memory tier is bounded by both entry count and total size. An
+    optional SQLite tier keeps responses across restarts.
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None, max_bytes: int = None,
+                 disk_path: str = None):
+        self.ttl = config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or config.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or config.RESPONSE_CACHE_MAX_BYTES
+
+        if disk_path is None:
+            disk_path = config.RESPONSE_CACHE_DISK_PATH
+        self.disk: Optional[SQLiteCacheBackend] = SQLiteCacheBackend(disk_path) if disk_path else None
+
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially different prompts share an entry"""
+        return " ".join(text.split())
+
+    @classmethod
+    def _key_part(cls, part) -> Optional[str]:
+        """Get the cache key form of one content part, or None if it can't be keyed"""
+        if isinstance(part, str):
+            return cls.normalize(part)
+
+        # Inline images are keyed by content, so reposts of the same file share answers
+        if isinstance(part, dict) and isinstance(part.get("data"), bytes) and "mime_type" in part:
+            return f"{part['mime_type']}:{hashlib.sha256(part['data']).hexdigest()}"
+
+        return None
+
+    @classmethod
+    def make_key(cls, model_name: str, contents, generation_config: Dict[str, Any] = None) -> Optional[str]:
+        """Build a cache key, or None if the contents are not text or inline images"""
+        if not isinstance(contents, (list, tuple)):
+            contents = [contents]
+
+        parts = [cls._key_part(part) for part in contents]
+        if None in parts:
+            return None
+
+        payload = json.dumps(
+            [model_name, parts, generation_config or {}],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached response, checking memory first and then disk"""
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache="response", result="hit")
+                return value
+
+            self._remove(key)
+
+        if self.disk is not None:
+            try:
+                stored = await self.disk.get(key)
+            except Exception as e:
+                logger.error(f"Error reading response cache: {str(e)}")
+                stored = None
+
+            if stored is not None:
+                value, expires_at = stored
+                self._store(key, value, expires_at)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache="response", result="hit")
+                return value
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache="response", result="miss")
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """Cache a response for the configured TTL"""
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+
+        if self.disk is not None:
+            try:
+                await self.disk.set(key, value, expires_at)
+            except Exception as e:
+                logger.error(f"Error writing response cache: {str(e)}")
+
+    async def clear(self) -> None:
+        """Drop every cached response"""
+        self._entries.clear()
+        self._bytes = 0
+
+        if self.disk is not None:
+            await self.disk.clear()
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        """Insert into the memory tier and evict least recently used entries"""
+        size = len(key) + len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory usage"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+class SingleFlight:
+    """Coalesces concurrent identical requests into a single pending call.
+
+    The first caller for a key becomes the leader; callers arriving while it
+    is in flight wait on the same future and receive the same result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """Get the in-flight call for a key, if there is one"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+
+        return future
+
+    def lead(self, key: str) -> asyncio.Future:
+        """Register a new in-flight call for a key"""
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        return future
+
+    def finish(self, key: str, future: asyncio.Future, result: Any = None,
+               error: BaseException = None) -> None:
+        """Resolve an in-flight call and release its key"""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+        if future.done():
+            return
+
+        if error is not None:
+            future.set_exception(error)
+            # Nobody may be waiting; don't warn about an unretrieved exception
+            future.exception()
+        else:
+            future.set_result(result)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func once for all concurrent callers with the same key"""
+        pending = self.join(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = self.lead(key)
+        # Run as a task so a cancelled leader doesn't cancel the followers
+        task = asyncio.ensure_future(func())
+
+        def on_done(task: asyncio.Task) -> None:
+            if task.cancelled():
+                self.finish(key, future, error=asyncio.CancelledError())
+            elif task.exception() is not None:
+                self.finish(key, future, error=task.exception())
+            else:
+                self.finish(key, future, result=task.result())
+
+        task.add_done_callback(on_done)
+        return await asyncio.shield(future)
@@ -1,23 +1,34 @@
 import discord
 from discord.ext import commands
-import google.generativeai as genai
 import config
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 import sys
 import os
 
 try:
     from utils import (
-        ConversationManager, EmbedBuilder, split_long_message,
-        CooldownManager, PermissionManager, InputValidator, ErrorHandler
+        EmbedBuilder, split_long_message,
+        PermissionManager, InputValidator, ErrorHandler
     )
+    from streaming import StreamingResponder, fence_code_stream
+    from scheduler import set_request_origin, PRIORITY_ADMIN, PRIORITY_NORMAL
+    from summarizer import MapReduceSummarizer, decode_text
+    from http_client import DownloadError, DownloadTooLarge
+    from translator import Translator
+    from metrics import record_command_error
 except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from utils import (
-        ConversationManager, EmbedBuilder, split_long_message,
-        CooldownManager, PermissionManager, InputValidator, ErrorHandler
+        EmbedBuilder, split_long_message,
+        PermissionManager, InputValidator, ErrorHandler
     )
+    from streaming import StreamingResponder, fence_code_stream
+    from scheduler import set_request_origin, PRIORITY_ADMIN, PRIORITY_NORMAL
+    from summarizer import MapReduceSummarizer, decode_text
+    from http_client import DownloadError, DownloadTooLarge
+    from translator import Translator
+    from metrics import record_command_error
 
 logger = logging.getLogger('gemini-discord-bot.advanced')
 
@@ -26,58 +37,48 @@ class AdvancedCommands(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.conversation_manager = ConversationManager(
-            max_history=config.CONVERSATION_MEMORY_LIMIT
+        # Shared with bot.py, which owns and closes it
+        self.conversation_manager = bot.conversation_manager
+        # Shared with bot.py so !cooldown_status sees the cog commands
+        self.cooldown_manager = bot.cooldown_manager
+        self.gemini_client = bot.gemini_client
+        self.http_client = bot.http_client
+        self.summarizer = MapReduceSummarizer(self.gemini_client)
+        self.translator = Translator(self.gemini_client)
+
+    async def cog_before_invoke(self, ctx):
+        """Let the scheduler queue this command's Gemini calls fairly"""
+        set_request_origin(
+            ctx.guild.id if ctx.guild else None,
+            PRIORITY_ADMIN if PermissionManager.is_admin(ctx.author) else PRIORITY_NORMAL
         )
-        self.cooldown_manager = CooldownManager()
-
-        self.text_model = genai.GenerativeModel(config.GEMINI_TEXT_MODEL)
-        self.pro_model = genai.GenerativeModel(config.GEMINI_PRO_MODEL)
-
-    def check_permissions_and_cooldown(self, cooldown_time: float):
-        """Decorator to check permissions and cooldowns for cog commands"""
-        def decorator(func):
-            async def wrapper(ctx, *args, **kwargs):
-                # Check permissions
-                if not PermissionManager.can_use_command(ctx.author, func.__name__):
-                    await ErrorHandler.handle_permission_error(ctx, func.__name__)
-                    return
 
-                # Check cooldown (skip for admins)
-                if not PermissionManager.is_admin(ctx.author):
-                    if self.cooldown_manager.is_on_cooldown(func.__name__, ctx.author.id, cooldown_time):
-                        remaining = self.cooldown_manager.get_remaining_cooldown(func.__name__, ctx.author.id, cooldown_time)
-                        await ErrorHandler.handle_cooldown_error(ctx, remaining)
-                        return
+    async def _check_cooldown(self, ctx) -> bool:
+        """Check the shared cooldown for this command, replying if it is still running"""
+        if PermissionManager.is_admin(ctx.author):
+            return True
 
-                # Set cooldown
-                self.cooldown_manager.set_cooldown(func.__name__, ctx.author.id)
+        remaining = await self.cooldown_manager.get_remaining_cooldown(ctx.command.name, ctx.author.id)
+        if remaining > 0:
+            await ErrorHandler.handle_cooldown_error(ctx, remaining)
+            return False
 
-                # Execute command
-                try:
-                    await func(self, ctx, *args, **kwargs)
-                except Exception as e:
-                    await ErrorHandler.handle_api_error(ctx, e, "Gemini")
+        return True
 
-            return wrapper
-        return decorator
-    
     @commands.command(name="translate", aliases=["trans"])
     async def translate_command(self, ctx, target_language: str = None, *, text: str = None):
-        """Translate text to specified language.
+        """Translate text to one or more languages.
 
-        Usage: !translate [target language] [text]
+        Usage: !translate [target language(s)] [text]
         Example: !translate Spanish Hello world
+        Example: !translate es,fr,de,ja Hello world
         """
         # Check cooldown
-        if not PermissionManager.is_admin(ctx.author):
-            if self.cooldown_manager.is_on_cooldown("translate_command", ctx.author.id, config.COOLDOWN_TRANSLATE):
-                remaining = self.cooldown_manager.get_remaining_cooldown("translate_command", ctx.author.id, config.COOLDOWN_TRANSLATE)
-                await ErrorHandler.handle_cooldown_error(ctx, remaining)
-                return
+        if not await self._check_cooldown(ctx):
+            return
 
         if not target_language or not text:
-            await ctx.send(f"Usage: {config.COMMAND_PREFIX}translate [target language] [text]")
+            await ctx.send(f"Usage: {config.COMMAND_PREFIX}translate [target language(s), comma-separated] [text]")
             return
 
         # Validate input
@@ -85,98 +86,143 @@ class AdvancedCommands(commands.Cog):
             await ctx.send(f"❌ Text is too long. Maximum length: {config.MAX_MESSAGE_LENGTH} characters.")
             return
 
+        targets = Translator.parse_targets(InputValidator.sanitize_input(target_language))
+        if not targets:
+            await ctx.send(f"Usage: {config.COMMAND_PREFIX}translate [target language(s), comma-separated] [text]")
+            return
+
+        if len(targets) > config.TRANSLATE_MAX_TARGETS:
+            await ctx.send(f"❌ Too many languages. Maximum: {config.TRANSLATE_MAX_TARGETS}")
+            return
+
         # Sanitize input
         text = InputValidator.sanitize_input(text)
-        target_language = InputValidator.sanitize_input(target_language)
 
         # Set cooldown
-        self.cooldown_manager.set_cooldown("translate_command", ctx.author.id)
+        await self.cooldown_manager.set_cooldown(ctx.command.name, ctx.author.id, config.COOLDOWN_TRANSLATE)
 
         async with ctx.typing():
             try:
-                prompt = f"Translate the following text to {target_language}. Only output the translation without any explanation: {text}"
+                translations = await self.translator.translate(text, targets)
+                original = text if len(text) <= 1024 else text[:1021] + "..."
+
+                if len(targets) == 1:
+                    embed = EmbedBuilder.create_info_embed(
+                        title=f"🌐 Translation to {targets[0]}",
+                        description=translations[targets[0]][:4096]
+                    )
+                    embed.add_field(name="Original Text", value=original, inline=False)
+                    await ctx.send(embed=embed)
+                    return
 
-                response = self.text_model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                        "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-                    }
-                )
+                for embed in self._translation_embeds(original, translations):
+                    await ctx.send(embed=embed)
 
-                response_text = response.text
+            except Exception as e:
+                await ErrorHandler.handle_api_error(ctx, e, "Translation")
 
+    @staticmethod
+    def _translation_embeds(original: str, translations: Dict[str, str]) -> List[discord.Embed]:
+        """Lay translations out as one field per language, across as many embeds as needed"""
+        fields = [("Original Text", original)]
+        for language, translation in translations.items():
+            for index, part in enumerate(split_long_message(translation, 1024)):
+                fields.append((language if index == 0 else f"{language} (cont.)", part))
+
+        embeds = []
+        embed = None
+        size = 0
+        for name, value in fields:
+            # Discord caps an embed at 25 fields and 6000 characters
+            if embed is None or len(embed.fields) == 25 or size + len(name) + len(value) > 5500:
                 embed = EmbedBuilder.create_info_embed(
-                    title=f"🌐 Translation to {target_language}",
-                    description=response_text
+                    title="🌐 Translations" if not embeds else "🌐 Translations (continued)",
+                    description=None
                 )
-                embed.add_field(name="Original Text", value=text, inline=False)
+                embeds.append(embed)
+                size = len(embed.title)
 
-                await ctx.send(embed=embed)
+            embed.add_field(name=name, value=value, inline=False)
+            size += len(name) + len(value)
 
-            except Exception as e:
-                await ErrorHandler.handle_api_error(ctx, e, "Translation")
+        return embeds
     
     @commands.command(name="summarize", aliases=["summary"])
     async def summarize_command(self, ctx, *, text: str = None):
-        """Summarize text content.
+        """Summarize text content or an attached text file.
 
         Usage: !summarize [text]
+        Long texts and attached files are split into parts, summarized in
+        parallel and then combined.
         """
         # Check cooldown
-        if not PermissionManager.is_admin(ctx.author):
-            if self.cooldown_manager.is_on_cooldown("summarize_command", ctx.author.id, config.COOLDOWN_SUMMARIZE):
-                remaining = self.cooldown_manager.get_remaining_cooldown("summarize_command", ctx.author.id, config.COOLDOWN_SUMMARIZE)
-                await ErrorHandler.handle_cooldown_error(ctx, remaining)
-                return
+        if not await self._check_cooldown(ctx):
+            return
+
+        attachment = next(
+            (a for a in ctx.message.attachments
+             if a.filename.lower().endswith(tuple(config.SUMMARY_FILE_EXTENSIONS))),
+            None
+        )
 
-        if not text:
-            await ctx.send(f"Usage: {config.COMMAND_PREFIX}summarize [text]")
+        if not text and attachment is None:
+            await ctx.send(f"Usage: {config.COMMAND_PREFIX}summarize [text] (or attach a text file)")
             return
 
-        if len(text) < 100:
+        max_bytes = config.SUMMARY_MAX_DOCUMENT_MB * 1024 * 1024
+
+        if attachment is not None:
+            if attachment.size > max_bytes:
+                await ctx.send(f"❌ File is too large. Maximum size: {config.SUMMARY_MAX_DOCUMENT_MB}MB")
+                return
+        elif len(text) < 100:
             await ctx.send("❌ Text is too short to summarize. Please provide at least 100 characters.")
             return
+        else:
+            text = InputValidator.sanitize_input(text)
 
-        if not InputValidator.validate_text_length(text):
-            await ctx.send(f"❌ Text is too long. Maximum length: {config.MAX_MESSAGE_LENGTH} characters.")
-            return
+        await self.cooldown_manager.set_cooldown(ctx.command.name, ctx.author.id, config.COOLDOWN_SUMMARIZE)
 
-        text = InputValidator.sanitize_input(text)
-        self.cooldown_manager.set_cooldown("summarize_command", ctx.author.id)
+        async def inline_text():
+            yield text
 
         async with ctx.typing():
             try:
-                prompt = f"Summarize the following text concisely. Include only key points and important information: {text}"
+                if attachment is not None:
+                    # Stream the file so chunks are summarized while the rest downloads
+                    pieces = decode_text(self.http_client.stream(attachment.url, max_bytes))
+                else:
+                    pieces = inline_text()
 
-                response = self.text_model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.3,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                        "max_output_tokens": 1024,
-                    }
-                )
-
-                response_text = response.text
+                response_text, parts = await self.summarizer.summarize(pieces)
 
                 embed = EmbedBuilder.create_info_embed(
-                    title="Text Summary",
-                    description=response_text
+                    title="Document Summary" if attachment is not None else "Text Summary",
+                    description=response_text[:4096]
                 )
 
-                if len(text) > 1024:
-                    text = text[:1021] + "..."
+                if attachment is not None:
+                    embed.add_field(
+                        name="Document",
+                        value=f"{attachment.filename} ({attachment.size / 1024:.0f} KB, {parts} part{'s' if parts != 1 else ''})",
+                        inline=False
+                    )
+                else:
+                    if len(text) > 1024:
+                        text = text[:1021] + "..."
 
-                embed.add_field(name="Original Text", value=text, inline=False)
+                    embed.add_field(name="Original Text", value=text, inline=False)
 
                 await ctx.send(embed=embed)
 
+            except DownloadTooLarge:
+                await ctx.send(f"❌ File is too large. Maximum size: {config.SUMMARY_MAX_DOCUMENT_MB}MB")
+            except DownloadError as e:
+                logger.warning(f"Could not download {attachment.filename}: {str(e)}")
+                await ctx.send("❌ Could not download the file.")
             except Exception as e:
                 logger.error(f"Summarization error: {str(e)}")
+                record_command_error(ctx, e)
                 await ctx.send(f"An error occurred during summarization: {str(e)}")
     
     @commands.command(name="code", aliases=["generate"])
@@ -186,26 +232,41 @@ class AdvancedCommands(commands.Cog):
         Usage: !code [language] [description]
         Example: !code python function to calculate fibonacci sequence
         """
+        # Check cooldown
+        if not await self._check_cooldown(ctx):
+            return
+
         if not language or not prompt:
             await ctx.send(f"Usage: {config.COMMAND_PREFIX}code [language] [description]")
             return
 
+        await self.cooldown_manager.set_cooldown(ctx.command.name, ctx.author.id, config.COOLDOWN_CODE)
+
         async with ctx.typing():
             try:
                 code_prompt = f"Write {language} code for the following description. Only output code with comments for explanation: {prompt}"
 
-                response = self.text_model.generate_content(
+                generation_config = {
+                    "temperature": 0.2,
+                    "top_p": 0.95,
+                    "top_k": 40,
+                    "max_output_tokens": config.MAX_OUTPUT_TOKENS,
+                }
+
+                if config.ENABLE_STREAMING:
+                    chunks = self.gemini_client.stream(
+                        code_prompt, generation_config=generation_config, cache=True, task="code"
+                    )
+                    await StreamingResponder(ctx).consume(fence_code_stream(chunks, language))
+                    return
+
+                response_text = await self.gemini_client.generate(
                     code_prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                        "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-                    }
+                    generation_config=generation_config,
+                    cache=True,
+                    task="code"
                 )
 
-                response_text = response.text
-
                 if not response_text.startswith("```"):
                     response_text = f"```{language}\n{response_text}\n```"
 
@@ -215,6 +276,7 @@ class AdvancedCommands(commands.Cog):
 
             except Exception as e:
                 logger.error(f"Code generation error: {str(e)}")
+                record_command_error(ctx, e)
                 await ctx.send(f"An error occurred during code generation: {str(e)}")
     
     @commands.command(name="imagine", aliases=["prompt"])
@@ -223,10 +285,16 @@ class AdvancedCommands(commands.Cog):
 
         Usage: !imagine [description]
         """
+        # Check cooldown
+        if not await self._check_cooldown(ctx):
+            return
+
         if not prompt:
             await ctx.send(f"Usage: {config.COMMAND_PREFIX}imagine [description]")
             return
 
+        await self.cooldown_manager.set_cooldown(ctx.command.name, ctx.author.id, config.COOLDOWN_IMAGINE)
+
         async with ctx.typing():
             try:
                 system_prompt = """
@@ -252,18 +320,18 @@ class AdvancedCommands(commands.Cog):
 
                 user_prompt = f"Optimize the following description into a detailed prompt for image generation AI: {prompt}"
 
-                response = self.text_model.generate_content(
+                response_text = await self.gemini_client.generate(
                     [system_prompt, user_prompt],
                     generation_config={
                         "temperature": 0.7,
                         "top_p": 0.95,
                         "top_k": 40,
                         "max_output_tokens": config.MAX_OUTPUT_TOKENS,
-                    }
+                    },
+                    cache=True,
+                    task="imagine"
                 )
 
-                response_text = response.text
-
                 embed = EmbedBuilder.create_info_embed(
                     title="Image Generation Prompt",
                     description=response_text
@@ -273,6 +341,7 @@ class AdvancedCommands(commands.Cog):
 
             except Exception as e:
                 logger.error(f"Prompt optimization error: {str(e)}")
+                record_command_error(ctx, e)
                 await ctx.send(f"An error occurred during prompt optimization: {str(e)}")
 
 async def setup(bot):
@@ -0,0 +1,101 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import config
+import logging
+from typing import Any, Dict, Optional, Sequence
+import sys
+import os
+
+try:
+    from interactions import InteractionQueue
+    from metrics import record_command_rejection
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from interactions import InteractionQueue
+    from metrics import record_command_rejection
+
+logger = logging.getLogger('gemini-discord-bot.slash')
+
+class SlashCommands(commands.Cog):
+    """Slash command versions of the Gemini commands.
+
+    Each interaction is deferred immediately (Discord allows 3 seconds for
+    the first response) and the matching prefix command is queued for a
+    worker; its replies arrive as followups. Checks, cooldowns and replies
+    are the prefix commands' own, so both entry points behave alike.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queue = InteractionQueue()
+
+    async def cog_load(self):
+        self.queue.start()
+
+        # In a sharded deployment, only the worker with shard 0 registers the commands
+        if config.SYNC_SLASH_COMMANDS and (config.SHARD_IDS is None or 0 in config.SHARD_IDS):
+            try:
+                synced = await self.bot.tree.sync()
+                logger.info(f"Synced {len(synced)} slash commands")
+            except discord.HTTPException as e:
+                logger.error(f"Could not sync slash commands: {str(e)}")
+
+    async def cog_unload(self):
+        await self.queue.close()
+
+    async def _dispatch(self, interaction: discord.Interaction, name: str,
+                        args: Sequence[Any] = (), kwargs: Dict[str, Any] = None):
+        """Acknowledge the interaction and queue the prefix command it stands for"""
+        await interaction.response.defer(thinking=True)
+
+        ctx = await commands.Context.from_interaction(interaction)
+        command = self.bot.get_command(name)
+
+        if not self.queue.submit(ctx, command, args, kwargs):
+            ctx.command = command
+            record_command_rejection(ctx, "busy")
+            await interaction.followup.send("⏳ The bot is busy right now. Please try again in a moment.")
+
+    @app_commands.command(name="gemini", description="Chat with Gemini")
+    @app_commands.describe(prompt="Your question or prompt")
+    async def gemini_slash(self, interaction: discord.Interaction, prompt: str):
+        await self._dispatch(interaction, "gemini", kwargs={"prompt": prompt})
+
+    @app_commands.command(name="vision", description="Ask Gemini about one or more images")
+    @app_commands.describe(
+        image="Image to analyze",
+        prompt="What you want to know (optional)",
+        image2="Another image (optional)",
+        image3="Another image (optional)"
+    )
+    async def vision_slash(self, interaction: discord.Interaction, image: discord.Attachment,
+                           prompt: Optional[str] = None, image2: Optional[discord.Attachment] = None,
+                           image3: Optional[discord.Attachment] = None):
+        # The images reach the command as the attachments of ctx.message
+        await self._dispatch(interaction, "vision", kwargs={"prompt": prompt})
+
+    @app_commands.command(name="translate", description="Translate text into one or more languages")
+    @app_commands.describe(languages="Target language(s), comma-separated, e.g. es,fr,de", text="Text to translate")
+    async def translate_slash(self, interaction: discord.Interaction, languages: str, text: str):
+        await self._dispatch(interaction, "translate", args=(languages,), kwargs={"text": text})
+
+    @app_commands.command(name="summarize", description="Summarize text or a text file")
+    @app_commands.describe(text="Text to summarize", file="Text file to summarize instead")
+    async def summarize_slash(self, interaction: discord.Interaction, text: Optional[str] = None,
+                              file: Optional[discord.Attachment] = None):
+        await self._dispatch(interaction, "summarize", kwargs={"text": text})
+
+    @app_commands.command(name="code", description="Generate code")
+    @app_commands.describe(language="Programming language", description="What the code should do")
+    async def code_slash(self, interaction: discord.Interaction, language: str, description: str):
+        await self._dispatch(interaction, "code", args=(language,), kwargs={"prompt": description})
+
+    @app_commands.command(name="imagine", description="Turn a description into a detailed image generation prompt")
+    @app_commands.describe(description="What the image should show")
+    async def imagine_slash(self, interaction: discord.Interaction, description: str):
+        await self._dispatch(interaction, "imagine", kwargs={"prompt": description})
+
+async def setup(bot):
+    if config.ENABLE_SLASH_COMMANDS:
+        await bot.add_cog(SlashCommands(bot))
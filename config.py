@@ -14,6 +14,55 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_TEXT_MODEL = "gemini-2.5-flash"
 GEMINI_PRO_MODEL = "gemini-2.5-pro"
 
+# Maximum number of Gemini calls running at the same time
+GEMINI_MAX_CONCURRENCY = 8
+
+# Project-wide Gemini quota per model, enforced by the request scheduler
+GEMINI_MODEL_QUOTAS = {
+    GEMINI_TEXT_MODEL: {"requests_per_minute": 1000, "tokens_per_minute": 1000000},
+    GEMINI_PRO_MODEL: {"requests_per_minute": 150, "tokens_per_minute": 2000000},
+}
+
+# Requests estimated at or below this many tokens are scheduled ahead of longer ones
+SCHEDULER_SHORT_REQUEST_TOKENS = 500
+
+# Model routing: preferred model per command (others use GEMINI_TEXT_MODEL)
+ENABLE_MODEL_ROUTER = True
+ROUTER_TASK_MODELS = {
+    "code": GEMINI_PRO_MODEL,
+}
+ROUTER_PRO_MAX_TOKENS = 32000  # longer prompts go to Flash
+ROUTER_LATENCY_BUDGET = 30.0  # p95 seconds before a model counts as slow
+ROUTER_P50_BUDGET = 10.0  # p50 seconds before a model counts as slow
+ROUTER_MAX_ERROR_RATE = 0.2
+ROUTER_WINDOW = 200  # recent calls tracked per model
+ROUTER_WINDOW_SECONDS = 300  # calls older than this are forgotten
+ROUTER_MIN_SAMPLES = 20
+ROUTER_PROBE_FRACTION = 0.05  # share of an unhealthy model's traffic still sent to it
+# Send a backup request when a call outlives the model's p95 latency.
+# Off by default: each hedge spends extra quota.
+ENABLE_HEDGING = False
+HEDGE_MIN_DELAY = 2.0
+
+# Resilience: retries, per-model circuit breakers and adaptive deadlines
+GEMINI_RETRY_ATTEMPTS = 3  # retries for 5xx, timeouts and 429s
+GEMINI_RETRY_BASE_DELAY = 0.5
+GEMINI_RETRY_MAX_DELAY = 8.0
+CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive failures before a model's circuit opens
+CIRCUIT_RECOVERY_TIME = 30  # seconds before a half-open probe is allowed
+GEMINI_TIMEOUT_MIN = 15  # call deadline is p99 latency x multiplier, within these bounds
+GEMINI_TIMEOUT_MAX = 120
+GEMINI_TIMEOUT_MULTIPLIER = 3
+
+# Minimum seconds between edits of a streamed message (Discord allows ~5 edits per 5s)
+STREAM_EDIT_INTERVAL = 1.0
+
+# Response cache for deterministic commands (translate, summarize, code, imagine)
+RESPONSE_CACHE_TTL = 3600  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = 5000
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+RESPONSE_CACHE_DISK_PATH = "cache/responses.db"  # None to keep the cache in memory only
+
 # Bot Configuration
 MAX_RESPONSE_LENGTH = 2000
 DEFAULT_TEMPERATURE = 0.7
@@ -24,8 +73,26 @@ MAX_OUTPUT_TOKENS = 2048
 # Feature Configuration
 ENABLE_IMAGE_ANALYSIS = True
 ENABLE_CONVERSATION_MEMORY = True
+ENABLE_STREAMING = True
+ENABLE_RESPONSE_CACHE = True
 CONVERSATION_MEMORY_LIMIT = 10
 
+# Conversation Storage Configuration
+CONVERSATION_STORAGE_BACKEND = os.getenv('CONVERSATION_STORAGE_BACKEND', 'sqlite')  # "sqlite", "json" or "resp" (shared state store; the default when sharded)
+CONVERSATION_DB_PATH = "conversations.db"
+CONVERSATION_JSON_DIR = "conversations"
+CONVERSATION_FLUSH_INTERVAL = 1.0  # seconds between batched commits
+CONVERSATION_FLUSH_BATCH_SIZE = 200  # commit early once this many writes are buffered
+
+# Per-request token budget for history; older turns are folded into a rolling summary
+CONTEXT_TOKEN_BUDGET = 8000
+ENABLE_CONTEXT_SUMMARY = True
+CONTEXT_SUMMARY_MAX_TOKENS = 512
+
+# Global budget for conversations kept in memory; least recently used users are evicted
+CONVERSATION_MEMORY_BUDGET_MESSAGES = 200000
+CONVERSATION_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+
 # Cooldown Configuration (in seconds)
 COOLDOWN_GEMINI = 3
 COOLDOWN_VISION = 5
@@ -35,16 +102,90 @@ COOLDOWN_CODE = 3
 COOLDOWN_IMAGINE = 3
 COOLDOWN_RESET = 1
 COOLDOWN_TEMPERATURE = 1
+COOLDOWN_MAX_USERS = 1000000  # users tracked before the earliest-expiring cooldowns are dropped
 
 # Permission Configuration
 ADMIN_ROLE_NAMES = ["Admin", "Administrator", "Moderator", "Bot Admin"]
 ADMIN_USER_IDS = []  # Add specific user IDs here
+PERMISSION_CACHE_MAX_MEMBERS = 200000  # cached admin verdicts before least recently used servers are dropped
 
 # Rate Limiting
 MAX_REQUESTS_PER_MINUTE = 20
+STATE_SWEEP_INTERVAL = 300  # seconds between sweeps of idle per-user state
 MAX_MESSAGE_LENGTH = 4000
 MAX_IMAGE_SIZE_MB = 20
 
+# Image preprocessing for !vision (runs in a process pool)
+VISION_MAX_DIMENSION = 1536  # longest side sent to Gemini, in pixels
+VISION_JPEG_QUALITY = 85
+VISION_MAX_ATTACHMENTS = 10  # images per !vision request
+VISION_MAX_FRAMES = 4  # keyframes sampled from animated GIF/WEBP
+IMAGE_PROCESS_WORKERS = 2
+
+# Multi-language !translate
+TRANSLATE_MAX_TARGETS = 8
+TRANSLATE_MAX_OUTPUT_TOKENS = 16384  # cap for one combined JSON-mode translation
+
+# Long-document !summarize (map-reduce over chunks)
+SUMMARY_CHUNK_CHARS = 24000  # characters per map request
+SUMMARY_MAP_CONCURRENCY = 4  # chunks summarized at once per command
+SUMMARY_PART_MAX_TOKENS = 512
+SUMMARY_MAX_TOKENS = 1024
+SUMMARY_MAX_DOCUMENT_MB = 5
+SUMMARY_FILE_EXTENSIONS = ['.txt', '.md', '.log', '.csv', '.json', '.srt', '.vtt']
+
+# Content-addressed cache of preprocessed attachments
+ATTACHMENT_CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+ATTACHMENT_CACHE_DIR = "cache/attachments"  # None for memory only
+ATTACHMENT_CACHE_DISK_BYTES = 512 * 1024 * 1024
+# Treat images with the same perceptual hash as identical. Off by default:
+# distinct screenshots with similar layouts can share a hash.
+ENABLE_PERCEPTUAL_HASH = False
+
+# Shared HTTP connection pool for attachment downloads
+HTTP_MAX_CONNECTIONS = 20
+HTTP_TIMEOUT = 30  # seconds for a whole download
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_RETRIES = 2
+
+# Prometheus metrics endpoint (http://METRICS_HOST:METRICS_PORT/metrics)
+ENABLE_METRICS_SERVER = True
+METRICS_HOST = "127.0.0.1"  # local only; put a proxy in front to expose it
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Slash commands (/gemini, /vision, ...): interactions are deferred at once and
+# run by a fixed pool of workers; when SLASH_QUEUE_SIZE are waiting, new ones are refused
+ENABLE_SLASH_COMMANDS = True
+SYNC_SLASH_COMMANDS = True  # register the commands with Discord when the cog loads
+SLASH_WORKERS = 16
+SLASH_QUEUE_SIZE = 200
+
+# The message_content and members intents are privileged and make Discord send
+# every message and member to the bot. With them off, slash commands work as
+# usual, prefix commands only when the bot is mentioned, and no member cache is kept.
+ENABLE_PRIVILEGED_INTENTS = os.getenv('ENABLE_PRIVILEGED_INTENTS', '1') == '1'
+
+# Sharding: SHARD_COUNT > 0 runs that many gateway shards, split over
+# SHARD_PROCESSES worker processes started by main.py. SHARD_IDS is set by
+# main.py for each worker (comma-separated); leave it unset otherwise.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+SHARD_PROCESSES = int(os.getenv('SHARD_PROCESSES', '1'))
+SHARD_IDS = [int(shard) for shard in os.getenv('SHARD_IDS', '').split(',') if shard.strip()] or None
+
+# Where cooldowns and rate limits live: "memory" (this process) or "resp"
+# (a Redis-protocol server shared by every worker). Sharded deployments
+# need "resp", and keep conversations there too unless told otherwise.
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'resp' if SHARD_COUNT else 'memory')
+if STATE_BACKEND == 'resp' and SHARD_COUNT and 'CONVERSATION_STORAGE_BACKEND' not in os.environ:
+    CONVERSATION_STORAGE_BACKEND = 'resp'
+STATE_STORE_HOST = os.getenv('STATE_STORE_HOST', '127.0.0.1')
+STATE_STORE_PORT = int(os.getenv('STATE_STORE_PORT', '6390'))
+# Have main.py run the bundled stand-in (resp_store.py) instead of using an external Redis
+STATE_STORE_EMBEDDED = os.getenv('STATE_STORE_EMBEDDED', '1') == '1'
+
+# Opt-in capture of anonymized command traffic for benchmarks/replay.py (None = off)
+TRAFFIC_CAPTURE_PATH = os.getenv('TRAFFIC_CAPTURE_PATH') or None
+
 # Logging Configuration
 LOG_LEVEL = "INFO"
 LOG_FILE = "bot.log"
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Set
+
+import config
+from scheduler import estimate_tokens
+
+logger = logging.getLogger('gemini-discord-bot.context')
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a chat between a user and an AI assistant. "
+    "Merge the existing summary and the new turns below into one concise summary. "
+    "Keep facts, names, decisions, preferences and open questions; drop small talk. "
+    "Only output the summary.\n\n"
+    "Existing summary:\n{summary}\n\n"
+    "New turns:\n{transcript}"
+)
+
+class ContextBuilder:
+    """Builds chat history that fits a per-request token budget.
+
+    The newest turns that fit the budget are sent as-is, preceded by a
+    rolling summary. Turns that no longer fit are folded into that summary
+    by a background Flash call, so request size stays constant however long
+    the conversation gets.
+    """
+
+    def __init__(self, conversation_manager, gemini_client, token_budget: int = None,
+                 summary_model: str = None):
+        self.conversation_manager = conversation_manager
+        self.gemini_client = gemini_client
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.summary_model = summary_model or config.GEMINI_TEXT_MODEL
+
+        self._folding: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def count_tokens(message: Dict[str, Any]) -> int:
+        """Get a message's estimated token count, cached on the message"""
+        tokens = message.get("token_count")
+        if tokens is None:
+            tokens = estimate_tokens(message["parts"])
+            message["token_count"] = tokens
+
+        return tokens
+
+    @staticmethod
+    def _summary_turns(summary: str) -> List[Dict[str, Any]]:
+        return [
+            {"role": "user", "parts": [f"Summary of our earlier conversation:\n{summary}"]},
+            {"role": "model", "parts": ["Understood, I'll keep that context in mind."]},
+        ]
+
+    def _fit(self, messages: List[Dict[str, Any]], budget: int) -> int:
+        """Get the index of the oldest message that still fits in budget"""
+        start = len(messages)
+        used = 0
+
+        while start > 0 and used + self.count_tokens(messages[start - 1]) <= budget:
+            start -= 1
+            used += self.count_tokens(messages[start])
+
+        # History must start with a user turn
+        while start < len(messages) and messages[start]["role"] != "user":
+            start += 1
+
+        return start
+
+    async def build(self, user_id: int, prompt: str) -> List[Dict[str, Any]]:
+        """Build the history to send with prompt"""
+        messages = await self.conversation_manager.get_conversation(user_id)
+        summary = self.conversation_manager.get_summary(user_id)
+
+        history = self._summary_turns(summary) if summary else []
+        budget = self.token_budget - estimate_tokens(prompt) - sum(
+            estimate_tokens(turn["parts"]) for turn in history
+        )
+
+        start = self._fit(messages, max(budget, 0))
+        history.extend({"role": message["role"], "parts": message["parts"]} for message in messages[start:])
+
+        return history
+
+    def maintain(self, user_id: int) -> None:
+        """Start folding old turns into the summary if the history has outgrown its window"""
+        if not config.ENABLE_CONTEXT_SUMMARY or user_id in self._folding:
+            return
+
+        messages = self.conversation_manager.conversations.get(user_id)
+        if not messages:
+            return
+
+        window = self.conversation_manager.max_history * 2
+        total = sum(self.count_tokens(message) for message in messages)
+
+        # Fold down to half the budget/window so summaries aren't needed on every turn
+        if total > self.token_budget:
+            start = self._fit(messages, self.token_budget // 2)
+        elif len(messages) >= window:
+            start = len(messages) - window // 2
+            while start < len(messages) and messages[start]["role"] != "user":
+                start += 1
+        else:
+            return
+
+        if start == 0:
+            return
+
+        self._folding.add(user_id)
+        task = asyncio.get_running_loop().create_task(self._fold(user_id, messages[:start]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, user_id: int, folded: List[Dict[str, Any]]) -> None:
+        """Summarize folded turns together with the existing summary"""
+        # A reset while the summary is generated makes it stale
+        reset_count = self.conversation_manager.reset_count(user_id)
+        try:
+            transcript = "\n".join(
+                f"{message['role']}: {''.join(str(part) for part in message['parts'])}"
+                for message in folded
+            )
+            prompt = SUMMARY_PROMPT.format(
+                summary=self.conversation_manager.get_summary(user_id) or "(none)",
+                transcript=transcript
+            )
+
+            summary = await self.gemini_client.generate(
+                prompt,
+                model_name=self.summary_model,
+                generation_config={
+                    "temperature": 0.2,
+                    "max_output_tokens": config.CONTEXT_SUMMARY_MAX_TOKENS,
+                }
+            )
+
+            await self.conversation_manager.fold_messages(user_id, folded, summary.strip(), reset_count)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation for user {user_id}: {str(e)}")
+        finally:
+            self._folding.discard(user_id)
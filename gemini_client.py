@@ -0,0 +1,516 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+
+import config
+from cache import ResponseCache, SingleFlight
+from scheduler import GeminiScheduler, estimate_tokens
+from router import ModelRouter
+from metrics import GEMINI_DURATION, GEMINI_QUEUE_WAIT, GEMINI_STREAM_FIRST_CHUNK, GEMINI_TOKENS
+from traffic import record_model_call
+from resilience import (
+    CircuitBreaker, RETRYABLE_ERRORS, ERROR_TIMEOUT, classify_error, decorrelated_jitter
+)
+
+logger = logging.getLogger('gemini-discord-bot.gemini')
+
+class GeminiClient:
+    """Runs Gemini model calls off the event loop with bounded concurrency.
+
+    The SDK's blocking calls are executed in a dedicated thread pool so a slow
+    generation never stalls the gateway heartbeat or other commands. When a
+    scheduler is given, every call first waits for the model's quota. When a
+    router is given, calls made with a task and no explicit model are routed
+    by it, and every call's latency and outcome is reported to it.
+
+    Each call gets a deadline adapted to the model's observed p99 latency,
+    transient failures are retried with decorrelated jitter, and a per-model
+    circuit breaker fails calls fast while the model keeps failing.
+    """
+
+    def __init__(self, max_concurrency: int = None, model_factory: Callable[[str], Any] = None,
+                 cache: Optional[ResponseCache] = None, scheduler: Optional[GeminiScheduler] = None,
+                 router: Optional[ModelRouter] = None):
+        if max_concurrency is None:
+            max_concurrency = config.GEMINI_MAX_CONCURRENCY
+
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.scheduler = scheduler
+        self.router = router
+        self.inflight = SingleFlight()
+        self._model_factory = model_factory or genai.GenerativeModel
+        self._models: Dict[str, Any] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="gemini"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get_model(self, model_name: str = None):
+        """Get (or create) the model instance for a model name"""
+        if model_name is None:
+            model_name = config.GEMINI_TEXT_MODEL
+
+        if model_name not in self._models:
+            self._models[model_name] = self._model_factory(model_name)
+
+        return self._models[model_name]
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the concurrency semaphore, created lazily so it binds to the running loop"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    async def _admit(self, model_name: str, contents) -> None:
+        """Wait for the scheduler to admit a call"""
+        if self.scheduler is not None:
+            waited = await self.scheduler.acquire(model_name, estimate_tokens(contents))
+            GEMINI_QUEUE_WAIT.observe(waited, model=model_name)
+
+    def _route(self, model_name: Optional[str], task: Optional[str], contents) -> str:
+        """Resolve the model for a call, asking the router when none was given"""
+        if model_name is not None:
+            return model_name
+
+        if self.router is not None and task is not None:
+            return self.router.choose(task, estimate_tokens(contents))
+
+        return config.GEMINI_TEXT_MODEL
+
+    def _record(self, model_name: str, latency: Optional[float], ok: bool,
+                first_chunk: Optional[float] = None) -> None:
+        if self.router is not None:
+            self.router.record(model_name, latency, ok, first_chunk)
+
+    @staticmethod
+    def _record_usage(model_name: str, response) -> None:
+        """Count the tokens a response reports; called from worker threads"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+
+        GEMINI_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, model=model_name, direction="in")
+        GEMINI_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, model=model_name, direction="out")
+
+    def _get_breaker(self, model_name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model_name)
+        if breaker is None:
+            breaker = self.breakers[model_name] = CircuitBreaker(model_name)
+
+        return breaker
+
+    def _timeout_for(self, model_name: str) -> float:
+        """Get a call deadline from the model's observed p99 latency"""
+        p99 = self.router.percentile(model_name, 0.99) if self.router is not None else None
+        if p99 is None:
+            return config.GEMINI_TIMEOUT_MAX
+
+        return min(config.GEMINI_TIMEOUT_MAX,
+                   max(config.GEMINI_TIMEOUT_MIN, p99 * config.GEMINI_TIMEOUT_MULTIPLIER))
+
+    @staticmethod
+    def _retry_delays() -> Iterator[float]:
+        return decorrelated_jitter(
+            config.GEMINI_RETRY_ATTEMPTS, config.GEMINI_RETRY_BASE_DELAY, config.GEMINI_RETRY_MAX_DELAY
+        )
+
+    @staticmethod
+    def _retry_delay(model_name: str, error: Exception, delays: Iterator[float]) -> Optional[float]:
+        """Get the pause before retrying a failed call, or None if it shouldn't be retried"""
+        error_class = classify_error(error)
+        if error_class not in RETRYABLE_ERRORS:
+            return None
+
+        delay = next(delays, None)
+        if delay is not None:
+            logger.warning(f"Retrying {model_name} in {delay:.1f}s after {error_class} error: {str(error)}")
+
+        return delay
+
+    async def _run(self, call: Callable, model_name: str, contents):
+        """Run a blocking call, retrying transient failures with backoff"""
+        delays = self._retry_delays()
+
+        while True:
+            try:
+                return await self._attempt(call, model_name, contents)
+            except Exception as e:
+                delay = self._retry_delay(model_name, e, delays)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, call: Callable, model_name: str, contents):
+        """Run a blocking call in the worker pool once the breaker, quota and a free slot allow"""
+        breaker = self._get_breaker(model_name)
+        # Checked before queueing, so an open circuit sheds load immediately
+        probe = breaker.acquire()
+        started = None
+
+        try:
+            await self._admit(model_name, contents)
+
+            async with self._get_semaphore():
+                timeout = self._timeout_for(model_name)
+                loop = asyncio.get_running_loop()
+                started = time.monotonic()
+                # The request deadline ends the HTTP call; wait_for is a backstop if it hangs anyway
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, call, {"timeout": timeout}),
+                    timeout + 5
+                )
+        except Exception as e:
+            error_class = classify_error(e)
+            breaker.release(probe, error_class)
+            if started is not None:
+                GEMINI_DURATION.observe(time.monotonic() - started, model=model_name, outcome=error_class)
+                record_model_call(time.monotonic() - started)
+            latency = time.monotonic() - started if started is not None and error_class == ERROR_TIMEOUT else None
+            self._record(model_name, latency, False)
+            raise
+        except BaseException:
+            breaker.cancel(probe)
+            raise
+
+        breaker.release(probe)
+        latency = time.monotonic() - started
+        GEMINI_DURATION.observe(latency, model=model_name, outcome="ok")
+        record_model_call(latency, len(result) if isinstance(result, str) else 0)
+        self._record(model_name, latency, True)
+        return result
+
+    async def _run_hedged(self, call: Callable, model_name: str, contents):
+        """Run a call, sending a backup if it outlives the model's p95 latency.
+
+        Whichever attempt succeeds first wins and the other is cancelled.
+        """
+        delay = self.router.hedge_delay(model_name) if self.router is not None and config.ENABLE_HEDGING else None
+        if delay is None:
+            return await self._run(call, model_name, contents)
+
+        pending = {asyncio.ensure_future(self._run(call, model_name, contents))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.router.record_hedge(model_name)
+                pending.add(asyncio.ensure_future(self._run(call, model_name, contents)))
+
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if not pending:
+                    raise error
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _request_key(self, cache: bool, model_name: str, contents,
+                     generation_config: Dict[str, Any] = None) -> Optional[str]:
+        """Get the key identifying a shareable request, or None if it is not shareable"""
+        if not cache:
+            return None
+
+        return ResponseCache.make_key(model_name, contents, generation_config)
+
+    async def generate(self, contents, model_name: str = None,
+                       generation_config: Dict[str, Any] = None, cache: bool = False,
+                       task: str = None) -> str:
+        """Generate content and return the response text.
+
+        With cache=True, identical requests are answered from the response cache
+        and concurrent identical requests share a single Gemini call. task names
+        the command type for model routing.
+        """
+        model_name = self._route(model_name, task, contents)
+        key = self._request_key(cache, model_name, contents, generation_config)
+        if key is None:
+            return await self._generate(contents, model_name, generation_config)
+
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async def call():
+            text = await self._generate(contents, model_name, generation_config)
+            if self.cache is not None:
+                await self.cache.set(key, text)
+            return text
+
+        return await self.inflight.do(key, call)
+
+    async def _generate(self, contents, model_name: str,
+                        generation_config: Dict[str, Any] = None) -> str:
+        """Make an uncached generate_content call"""
+        model = self.get_model(model_name)
+
+        def call(request_options):
+            response = model.generate_content(
+                contents, generation_config=generation_config, request_options=request_options
+            )
+            self._record_usage(model_name, response)
+            return response.text
+
+        return await self._run_hedged(call, model_name, contents)
+
+    async def chat(self, history: List[Dict[str, Any]], prompt: str, model_name: str = None,
+                   generation_config: Dict[str, Any] = None, task: str = None) -> str:
+        """Send a message on top of the given history and return the reply text"""
+        model_name = self._route(model_name, task, [history, prompt])
+        model = self.get_model(model_name)
+        # Snapshot the history on the loop thread; the caller may keep mutating it
+        history = list(history)
+
+        def call(request_options):
+            chat = model.start_chat(history=history)
+            response = chat.send_message(
+                prompt, generation_config=generation_config, request_options=request_options
+            )
+            self._record_usage(model_name, response)
+            return response.text
+
+        return await self._run_hedged(call, model_name, [history, prompt])
+
+    async def stream(self, contents, model_name: str = None,
+                     generation_config: Dict[str, Any] = None, cache: bool = False,
+                     task: str = None) -> AsyncIterator[str]:
+        """Generate content, yielding text chunks as they arrive.
+
+        With cache=True, a cached response, or the result of an identical
+        request already in flight, is yielded as a single chunk.
+        """
+        model_name = self._route(model_name, task, contents)
+        model = self.get_model(model_name)
+
+        def call(request_options):
+            return model.generate_content(
+                contents, generation_config=generation_config, stream=True, request_options=request_options
+            )
+
+        key = self._request_key(cache, model_name, contents, generation_config)
+        if key is None:
+            async for text in self._stream(call, model_name, contents):
+                yield text
+            return
+
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        pending = self.inflight.join(key)
+        if pending is not None:
+            yield await asyncio.shield(pending)
+            return
+
+        future = self.inflight.lead(key)
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def produce():
+            parts = []
+            async for text in self._stream(call, model_name, contents):
+                parts.append(text)
+                chunks.put_nowait(text)
+
+            text = "".join(parts)
+            if self.cache is not None:
+                await self.cache.set(key, text)
+            return text
+
+        # Run as a task so a leader whose consumer fails (e.g. a Discord edit
+        # raising) or is cancelled doesn't take the followers' answer with it
+        task = asyncio.ensure_future(produce())
+
+        def on_done(task: asyncio.Task) -> None:
+            if task.cancelled():
+                self.inflight.finish(key, future, error=asyncio.CancelledError())
+            elif task.exception() is not None:
+                self.inflight.finish(key, future, error=task.exception())
+            else:
+                self.inflight.finish(key, future, result=task.result())
+            chunks.put_nowait(done)
+
+        task.add_done_callback(on_done)
+
+        while True:
+            item = await chunks.get()
+            if item is done:
+                break
+            yield item
+
+        # Raises the upstream error, if any
+        await task
+
+    async def stream_chat(self, history: List[Dict[str, Any]], prompt: str, model_name: str = None,
+                          generation_config: Dict[str, Any] = None, task: str = None) -> AsyncIterator[str]:
+        """Send a message on top of the given history, yielding reply chunks"""
+        model_name = self._route(model_name, task, [history, prompt])
+        model = self.get_model(model_name)
+        history = list(history)
+
+        def call(request_options):
+            chat = model.start_chat(history=history)
+            return chat.send_message(
+                prompt, generation_config=generation_config, stream=True, request_options=request_options
+            )
+
+        async for text in self._stream(call, model_name, [history, prompt]):
+            yield text
+
+    async def _stream(self, call: Callable, model_name: str, contents) -> AsyncIterator[str]:
+        """Relay a streaming response, retrying transient failures until the first chunk arrives"""
+        delays = self._retry_delays()
+
+        while True:
+            produced = False
+            try:
+                async for text in self._stream_attempt(call, model_name, contents):
+                    produced = True
+                    yield text
+                return
+            except Exception as e:
+                # Text already shown can't be taken back, so only retry before the first chunk
+                delay = None if produced else self._retry_delay(model_name, e, delays)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _stream_attempt(self, call: Callable, model_name: str, contents) -> AsyncIterator[str]:
+        """Iterate a streaming response in the worker pool and relay its chunks.
+
+        The concurrency slot is held while the worker thread reads the
+        response, not while the consumer handles the chunks. The first chunk
+        and each following one must arrive within the model's adaptive
+        deadline, so a stalled stream fails like a timed-out call.
+        """
+        breaker = self._get_breaker(model_name)
+        probe = breaker.acquire()
+        error_class = None
+        finished = False
+        started = None
+        stalled = None
+        first_chunk = None
+        relayed = 0
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+        done = object()
+        semaphore = self._get_semaphore()
+
+        def release_slot():
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The loop is already closed
+                pass
+
+        def produce():
+            produced = False
+            last_chunk = None
+            try:
+                # Streams run as long as the answer is, so they get the longest deadline
+                for chunk in call({"timeout": config.GEMINI_TIMEOUT_MAX}):
+                    if stopped.is_set():
+                        return
+                    last_chunk = chunk
+
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. the final finish-reason chunk)
+                        continue
+
+                    if text:
+                        produced = True
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+                if not produced:
+                    raise ValueError("Gemini returned an empty response")
+
+                # The final chunk carries the usage of the whole response
+                self._record_usage(model_name, last_chunk)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                # The slot is held while the worker thread runs, not while
+                # the consumer is busy with the chunks (e.g. editing messages)
+                release_slot()
+
+        try:
+            await self._admit(model_name, contents)
+
+            await semaphore.acquire()
+            timeout = self._timeout_for(model_name)
+            started = time.monotonic()
+            try:
+                future = loop.run_in_executor(self._executor, produce)
+            except BaseException:
+                semaphore.release()
+                raise
+
+            try:
+                while True:
+                    waiting = time.monotonic()
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        stalled = time.monotonic() - waiting
+                        raise
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if not relayed:
+                        first_chunk = time.monotonic() - started
+                        GEMINI_STREAM_FIRST_CHUNK.observe(first_chunk, model=model_name)
+                    relayed += len(item)
+                    yield item
+            finally:
+                # Tell the worker to stop early if the consumer went away
+                stopped.set()
+
+            await future
+            finished = True
+        except Exception as e:
+            error_class = classify_error(e)
+            raise
+        finally:
+            if started is not None:
+                record_model_call(time.monotonic() - started, relayed)
+
+            if finished:
+                breaker.release(probe)
+                # Stream durations depend on the consumer; the time to first chunk doesn't
+                self._record(model_name, None, True, first_chunk)
+            elif error_class is not None:
+                breaker.release(probe, error_class)
+                # A stall is as comparable as a timed-out call; other stream failures aren't
+                self._record(model_name, stalled, False)
+            else:
+                breaker.cancel(probe)
+
+    def close(self) -> None:
+        """Shut down the worker pool and the scheduler"""
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+        self._executor.shutdown(wait=False)
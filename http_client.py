@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+import config
+
+logger = logging.getLogger('gemini-discord-bot.http')
+
+# Statuses worth retrying; other errors won't change on a second attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class DownloadError(Exception):
+    """Raised when a file could not be downloaded"""
+
+class DownloadTooLarge(DownloadError):
+    """Raised when a download exceeds its size limit"""
+
+class HttpClient:
+    """Bot-lifetime HTTP connection pool for attachment downloads.
+
+    Connections are kept alive between requests, so repeated downloads from
+    the Discord CDN skip DNS and TLS setup.
+    """
+
+    def __init__(self, max_connections: int = None, timeout: float = None,
+                 connect_timeout: float = None, retries: int = None):
+        self.max_connections = max_connections or config.HTTP_MAX_CONNECTIONS
+        self.timeout = timeout or config.HTTP_TIMEOUT
+        self.connect_timeout = connect_timeout or config.HTTP_CONNECT_TIMEOUT
+        self.retries = config.HTTP_RETRIES if retries is None else retries
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the session on first use, inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.connect_timeout
+                )
+            )
+
+        return self._session
+
+    async def download(self, url: str, max_bytes: int, chunk_size: int = 64 * 1024) -> bytes:
+        """Download url into memory, aborting once it grows past max_bytes"""
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._download(url, max_bytes, chunk_size)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", None)
+                if attempt == self.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise DownloadError(f"Download failed: {str(e) or type(e).__name__}") from e
+
+                logger.warning(f"Retrying download of {url} after error: {str(e) or type(e).__name__}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _download(self, url: str, max_bytes: int, chunk_size: int) -> bytes:
+        async with self._get_session().get(url) as resp:
+            resp.raise_for_status()
+
+            if resp.content_length is not None and resp.content_length > max_bytes:
+                raise DownloadTooLarge(f"File is {resp.content_length} bytes, limit is {max_bytes}")
+
+            data = bytearray()
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                data.extend(chunk)
+                if len(data) > max_bytes:
+                    raise DownloadTooLarge(f"File exceeds the {max_bytes} byte limit")
+
+            return bytes(data)
+
+    async def _open(self, url: str) -> aiohttp.ClientResponse:
+        """Send a GET request, retrying until the response headers arrive"""
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self._get_session().get(url)
+                resp.raise_for_status()
+                return resp
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", None)
+                if attempt == self.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise DownloadError(f"Download failed: {str(e) or type(e).__name__}") from e
+
+                logger.warning(f"Retrying download of {url} after error: {str(e) or type(e).__name__}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def stream(self, url: str, max_bytes: int, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Yield url's body chunk by chunk, aborting once it grows past max_bytes.
+
+        Only opening the connection is retried; an error mid-body is raised.
+        """
+        resp = await self._open(url)
+
+        async with resp:
+            if resp.content_length is not None and resp.content_length > max_bytes:
+                raise DownloadTooLarge(f"File is {resp.content_length} bytes, limit is {max_bytes}")
+
+            received = 0
+            try:
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise DownloadTooLarge(f"File exceeds the {max_bytes} byte limit")
+                    yield chunk
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise DownloadError(f"Download failed: {str(e) or type(e).__name__}") from e
+
+    async def close(self) -> None:
+        """Close pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
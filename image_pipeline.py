@@ -0,0 +1,117 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+import config
+
+IMAGE_MIME_TYPE = "image/jpeg"
+
+def _encode_jpeg(image: Image.Image, max_dimension: int, quality: int) -> bytes:
+    """Flatten, downscale and encode one frame as a metadata-free JPEG"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = io.BytesIO()
+    # Saving without exif=/icc_profile= strips the original metadata
+    image.save(output, "JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+def sample_frame_indices(frame_count: int, max_frames: int) -> List[int]:
+    """Pick up to max_frames evenly spaced frames, always including the first and last"""
+    if frame_count <= max_frames:
+        return list(range(frame_count))
+
+    if max_frames == 1:
+        return [0]
+
+    step = (frame_count - 1) / (max_frames - 1)
+    return sorted({round(i * step) for i in range(max_frames)})
+
+def preprocess_image(data: bytes, max_dimension: int, quality: int, max_frames: int = 1) -> List[bytes]:
+    """Decode, downscale and re-encode an image as compact JPEG frames without metadata.
+
+    Runs in a worker process. JPEGs are decoded in draft mode, which lets
+    libjpeg scale by 1/2, 1/4 or 1/8 while decoding instead of decoding the
+    full resolution first. Animated GIF/WEBP images are reduced to up to
+    max_frames evenly sampled keyframes; still images give one frame.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        frame_count = getattr(image, "n_frames", 1)
+
+        if frame_count > 1 and max_frames > 1:
+            frames = []
+            for index in sample_frame_indices(frame_count, max_frames):
+                image.seek(index)
+                frames.append(_encode_jpeg(image.convert("RGBA"), max_dimension, quality))
+            return frames
+
+        image.draft("RGB", (max_dimension, max_dimension))
+
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        return [_encode_jpeg(image, max_dimension, quality)]
+
+def perceptual_hash(data: bytes, hash_size: int = 8) -> str:
+    """Get the difference hash (dHash) of an image as a hex string.
+
+    Re-encoded or resized copies of the same picture usually share a dHash.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+class ImagePreprocessor:
+    """Runs image preprocessing in a process pool, off the event loop"""
+
+    def __init__(self, max_workers: int = None, max_dimension: int = None, quality: int = None,
+                 max_frames: int = None):
+        self.max_workers = max_workers or config.IMAGE_PROCESS_WORKERS
+        self.max_dimension = max_dimension or config.VISION_MAX_DIMENSION
+        self.quality = quality or config.VISION_JPEG_QUALITY
+        self.max_frames = max_frames or config.VISION_MAX_FRAMES
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        return self._executor
+
+    async def preprocess(self, data: bytes) -> List[bytes]:
+        """Get downscaled, metadata-free JPEG frames of an image"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), preprocess_image, data,
+            self.max_dimension, self.quality, self.max_frames
+        )
+
+    async def fingerprint(self, data: bytes) -> str:
+        """Get the perceptual hash of an image"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), perceptual_hash, data)
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
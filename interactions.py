@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import config
+from metrics import INTERACTION_QUEUE_WAIT
+from utils import ErrorHandler
+
+logger = logging.getLogger('gemini-discord-bot.interactions')
+
+class _Job(NamedTuple):
+    ctx: Any
+    command: Any
+    args: Sequence[Any]
+    kwargs: Dict[str, Any]
+    enqueued: float
+
+async def invoke_parsed(ctx, command, args: Sequence[Any] = (), kwargs: Dict[str, Any] = None) -> None:
+    """Run a prefix command with already-parsed arguments, as discord.py does after parsing.
+
+    The command's, cog's and bot's invoke hooks run as usual, so cooldowns,
+    metrics and traffic capture apply to slash invocations too.
+    """
+    kwargs = kwargs or {}
+    ctx.command = command
+    ctx.args = ([command.cog] if command.cog is not None else []) + [ctx, *args]
+    ctx.kwargs = kwargs
+
+    await command.call_before_hooks(ctx)
+    try:
+        if command.cog is not None:
+            await command.callback(command.cog, ctx, *args, **kwargs)
+        else:
+            await command.callback(ctx, *args, **kwargs)
+    except Exception as e:
+        await ErrorHandler.handle_api_error(ctx, e, "Gemini")
+    finally:
+        await command.call_after_hooks(ctx)
+
+class InteractionQueue:
+    """Bounded queue of deferred slash commands served by a fixed pool of workers.
+
+    Interactions are acknowledged (deferred) as soon as they arrive and the
+    work is queued here; at most `workers` commands run at once and at most
+    `max_size` wait, so a burst cannot pile up unbounded tasks. Results are
+    sent as interaction followups.
+    """
+
+    def __init__(self, workers: int = None, max_size: int = None):
+        self.workers = workers or config.SLASH_WORKERS
+        self.max_size = max_size or config.SLASH_QUEUE_SIZE
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.get_running_loop().create_task(self._work())
+            for _ in range(self.workers)
+        ]
+
+    def submit(self, ctx, command, args: Sequence[Any] = (), kwargs: Dict[str, Any] = None) -> bool:
+        """Queue a command; returns False (and queues nothing) if the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait(_Job(ctx, command, args, kwargs or {}, time.monotonic()))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            INTERACTION_QUEUE_WAIT.observe(time.monotonic() - job.enqueued)
+
+            # Run the job as its own task, so a command raising CancelledError
+            # ends that job only; cancelling the worker itself still stops it
+            task = asyncio.ensure_future(invoke_parsed(job.ctx, job.command, job.args, job.kwargs))
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._queue.task_done()
+
+            # Hooks failing must not take the worker down
+            if task.cancelled():
+                logger.warning(f"/{job.command.name} was cancelled")
+            elif task.exception() is not None:
+                logger.error(f"Error running /{job.command.name}: {str(task.exception())}")
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def close(self) -> None:
+        """Stop the workers; queued commands are dropped"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
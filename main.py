@@ -1,6 +1,10 @@
 import logging
-import config
+import os
+import socket
+import subprocess
 import sys
+import time
+import config
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,6 +16,134 @@ logging.basicConfig(
 )
 logger = logging.getLogger('gemini-discord-bot')
 
+# Discord allows one shard to identify every 5 seconds (for most bots)
+IDENTIFY_INTERVAL = 5.5
+RESTART_BACKOFF_MAX = 60
+
+def shard_ranges(shard_count: int, processes: int):
+    """Split shard IDs into contiguous, nearly equal ranges, one per process"""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+def wait_for_port(host: str, port: int, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+class Supervisor:
+    """Runs the shards as worker processes and restarts any that crash"""
+
+    def __init__(self):
+        self.ranges = shard_ranges(config.SHARD_COUNT, config.SHARD_PROCESSES)
+        self.workers = [None] * len(self.ranges)
+        self.backoff = [1.0] * len(self.ranges)
+        self.restart_at = [0.0] * len(self.ranges)
+        self.state_store = None
+
+    def _worker_env(self, index: int):
+        env = dict(os.environ)
+        env["SHARD_COUNT"] = str(config.SHARD_COUNT)
+        env["SHARD_PROCESSES"] = str(len(self.ranges))
+        env["SHARD_IDS"] = ",".join(str(shard) for shard in self.ranges[index])
+        env["STATE_BACKEND"] = config.STATE_BACKEND
+        # Conversations must be shared too, or each worker keeps its own history
+        env["CONVERSATION_STORAGE_BACKEND"] = config.CONVERSATION_STORAGE_BACKEND
+        # One metrics endpoint and one capture file per worker
+        env["METRICS_PORT"] = str(config.METRICS_PORT + index)
+        if config.TRAFFIC_CAPTURE_PATH:
+            root, extension = os.path.splitext(config.TRAFFIC_CAPTURE_PATH)
+            env["TRAFFIC_CAPTURE_PATH"] = f"{root}.worker{index}{extension}"
+        return env
+
+    def _start_worker(self, index: int) -> None:
+        logger.info(f"Starting worker {index} with shards {self.ranges[index]}")
+        self.workers[index] = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)], env=self._worker_env(index)
+        )
+
+    def _start_state_store(self) -> bool:
+        if config.STATE_BACKEND != "resp" or not config.STATE_STORE_EMBEDDED:
+            return True
+
+        store = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resp_store.py")
+        self.state_store = subprocess.Popen([sys.executable, store])
+        if not wait_for_port(config.STATE_STORE_HOST, config.STATE_STORE_PORT):
+            logger.error(f"State store did not start on {config.STATE_STORE_HOST}:{config.STATE_STORE_PORT}")
+            return False
+        return True
+
+    def run(self) -> None:
+        if not self._start_state_store():
+            self.stop()
+            sys.exit(1)
+
+        try:
+            for index in range(len(self.ranges)):
+                self._start_worker(index)
+                # Let this worker's shards identify before the next worker starts
+                if index < len(self.ranges) - 1:
+                    time.sleep(IDENTIFY_INTERVAL * len(self.ranges[index]))
+
+            while True:
+                time.sleep(1)
+                self._check_workers()
+        except KeyboardInterrupt:
+            logger.info("Shutting down workers...")
+        finally:
+            self.stop()
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for index, worker in enumerate(self.workers):
+            if worker is None:
+                if now >= self.restart_at[index]:
+                    self._start_worker(index)
+                continue
+
+            code = worker.poll()
+            if code is None:
+                continue
+            if code == 0:
+                # Clean exit (e.g. missing configuration): don't loop on it
+                logger.info(f"Worker {index} exited")
+                continue
+
+            logger.error(f"Worker {index} exited with code {code}, restarting in {self.backoff[index]:.0f}s")
+            self.workers[index] = None
+            self.restart_at[index] = now + self.backoff[index]
+            self.backoff[index] = min(self.backoff[index] * 2, RESTART_BACKOFF_MAX)
+
+        if self.state_store is not None and self.state_store.poll() is not None:
+            logger.error("State store exited, restarting it")
+            self._start_state_store()
+
+    def stop(self) -> None:
+        processes = [worker for worker in self.workers if worker is not None]
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        # Workers are gone; the state store can go last
+        if self.state_store is not None and self.state_store.poll() is None:
+            self.state_store.terminate()
+            self.state_store.wait()
+
 def main():
     """Main function to run the bot"""
     if not config.DISCORD_TOKEN:
@@ -22,6 +154,11 @@ def main():
         logger.error("GEMINI_API_KEY is not set. Please check your .env file.")
         return
 
+    if config.SHARD_COUNT and config.SHARD_IDS is None:
+        logger.info(f"Running {config.SHARD_COUNT} shards in {min(config.SHARD_PROCESSES, config.SHARD_COUNT)} processes")
+        Supervisor().run()
+        return
+
     try:
         import bot
         logger.info("Starting bot...")
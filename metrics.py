@@ -0,0 +1,239 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+import config
+from resilience import classify_error
+
+logger = logging.getLogger('gemini-discord-bot.metrics')
+
+# Latency buckets in seconds, from a fast Discord send up to a slow Pro answer
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Token usage is recorded from worker threads
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Get one series, or the sum over the labels that aren't given"""
+        total = 0.0
+        for key, value in list(self._values.items()):
+            if all(labels.get(name, key[i]) == key[i] for i, name in enumerate(self.labels)):
+                total += value
+        return total
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {value}"
+            for key, value in sorted(self._values.items())
+        ]
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        return sum(series[2] for key, series in list(self._series.items())
+                   if all(labels.get(name, key[i]) == key[i] for i, name in enumerate(self.labels)))
+
+    def quantile(self, fraction: float, **labels) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket that contains it"""
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0
+        for key, series in list(self._series.items()):
+            if all(labels.get(name, key[i]) == key[i] for i, name in enumerate(self.labels)):
+                counts = [a + b for a, b in zip(counts, series[0])]
+                total += series[2]
+
+        if total == 0:
+            return None
+
+        rank = fraction * total
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+COMMANDS = registry.counter(
+    "bot_commands_total", "Commands invoked", ["command"])
+COMMAND_DURATION = registry.histogram(
+    "bot_command_duration_seconds", "Time from command invocation to completion", ["command"])
+COMMAND_ERRORS = registry.counter(
+    "bot_command_errors_total", "Commands that failed, by error class", ["command", "error_class"])
+COMMAND_REJECTIONS = registry.counter(
+    "bot_command_rejections_total", "Commands refused by permissions, cooldowns or rate limits",
+    ["command", "reason"])
+DISCORD_SEND_DURATION = registry.histogram(
+    "discord_send_duration_seconds", "Latency of sending a message to Discord")
+GEMINI_QUEUE_WAIT = registry.histogram(
+    "gemini_queue_wait_seconds", "Time spent waiting for Gemini quota", ["model"])
+GEMINI_DURATION = registry.histogram(
+    "gemini_request_duration_seconds", "Latency of Gemini calls", ["model", "outcome"])
+GEMINI_STREAM_FIRST_CHUNK = registry.histogram(
+    "gemini_stream_first_chunk_seconds", "Time until a streamed Gemini answer starts", ["model"])
+GEMINI_TOKENS = registry.counter(
+    "gemini_tokens_total", "Tokens sent to and received from Gemini", ["model", "direction"])
+ROUTER_DECISIONS = registry.counter(
+    "gemini_router_decisions_total", "Model routing decisions", ["task", "model", "reason"])
+CACHE_LOOKUPS = registry.counter(
+    "cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+INTERACTION_QUEUE_WAIT = registry.histogram(
+    "interaction_queue_wait_seconds", "Time deferred slash commands wait for a worker")
+
+def command_name(ctx) -> str:
+    return ctx.command.qualified_name if ctx.command is not None else "unknown"
+
+def record_command_error(ctx, error: BaseException) -> None:
+    error_class = classify_error(error)
+    COMMAND_ERRORS.inc(command=command_name(ctx), error_class=error_class)
+    ctx.command_outcome = error_class
+
+def record_command_rejection(ctx, reason: str) -> None:
+    COMMAND_REJECTIONS.inc(command=command_name(ctx), reason=reason)
+    ctx.command_outcome = f"rejected:{reason}"
+
+async def start_command(ctx) -> None:
+    """Before-invoke hook: count the command and start timing it"""
+    COMMANDS.inc(command=command_name(ctx))
+    ctx.metrics_started = time.monotonic()
+    instrument_context(ctx)
+
+async def finish_command(ctx) -> None:
+    """After-invoke hook: record how long the command took"""
+    started = getattr(ctx, "metrics_started", None)
+    if started is not None:
+        COMMAND_DURATION.observe(time.monotonic() - started, command=command_name(ctx))
+
+def instrument_context(ctx) -> None:
+    """Time every ctx.send of a command invocation"""
+    send = ctx.send
+
+    async def timed_send(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await send(*args, **kwargs)
+        finally:
+            DISCORD_SEND_DURATION.observe(time.monotonic() - started)
+
+    ctx.send = timed_send
+
+class MetricsServer:
+    """Serves the registry on a local /metrics endpoint"""
+
+    def __init__(self, host: str = None, port: int = None, metrics: MetricsRegistry = None):
+        self.host = host or config.METRICS_HOST
+        self.port = port or config.METRICS_PORT
+        self.metrics = metrics or registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.metrics.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"}
+        )
+
+    async def start(self) -> None:
+        """Start listening, once"""
+        if self._runner is not None:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
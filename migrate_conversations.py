@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+import config
+from storage import SQLiteConversationStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('gemini-discord-bot.migrate')
+
+async def migrate(source: str, database: str) -> int:
+    """Import every <user_id>.json conversation file into the SQLite store"""
+    store = SQLiteConversationStore(path=database)
+    migrated = 0
+
+    try:
+        for filename in sorted(os.listdir(source)):
+            if not filename.endswith(".json"):
+                continue
+
+            try:
+                user_id = int(filename.split(".")[0])
+                with open(os.path.join(source, filename), 'r', encoding='utf-8') as f:
+                    messages = json.load(f)
+            except Exception as e:
+                logger.error(f"Skipping {filename}: {str(e)}")
+                continue
+
+            # Replace whatever an earlier run imported for this user
+            await store.reset(user_id)
+            for message in messages:
+                content = "".join(str(part) for part in message.get("parts", []))
+                await store.append(user_id, message.get("role", "user"), content)
+
+            migrated += 1
+            if migrated % 500 == 0:
+                await store.flush()
+                logger.info(f"Imported {migrated} conversations...")
+    finally:
+        await store.close()
+
+    return migrated
+
+def main():
+    """Import the legacy JSON conversation directory into SQLite"""
+    parser = argparse.ArgumentParser(description="Import JSON conversation files into the SQLite store.")
+    parser.add_argument("--source", default=config.CONVERSATION_JSON_DIR,
+                        help="directory containing <user_id>.json files")
+    parser.add_argument("--database", default=config.CONVERSATION_DB_PATH,
+                        help="SQLite database to write")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        logger.error(f"Conversation directory not found: {args.source}")
+        sys.exit(1)
+
+    migrated = asyncio.run(migrate(args.source, args.database))
+    logger.info(f"Imported {migrated} conversations into {args.database}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Iterator, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+import config
+
+logger = logging.getLogger('gemini-discord-bot.resilience')
+
+# Error classes
+ERROR_TRANSIENT = "transient"      # 5xx, dropped connections; worth retrying
+ERROR_TIMEOUT = "timeout"          # the call outlived its deadline; worth retrying
+ERROR_QUOTA = "quota"              # 429 / resource exhausted; retry after a pause
+ERROR_AUTH = "auth"                # bad or missing API key
+ERROR_INVALID = "invalid"          # bad request or blocked/empty response
+ERROR_UNAVAILABLE = "unavailable"  # the model's circuit breaker is open
+ERROR_UNKNOWN = "unknown"
+
+RETRYABLE_ERRORS = {ERROR_TRANSIENT, ERROR_TIMEOUT, ERROR_QUOTA}
+# Errors that say the endpoint itself is failing
+BREAKER_ERRORS = {ERROR_TRANSIENT, ERROR_TIMEOUT}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit breaker is open"""
+
+    def __init__(self, model_name: str, retry_after: float):
+        super().__init__(f"{model_name} is temporarily unavailable (retry in {retry_after:.0f}s)")
+        self.model_name = model_name
+        self.retry_after = retry_after
+
+def classify_error(error: BaseException) -> str:
+    """Sort an exception from a Gemini call into one of the error classes"""
+    if isinstance(error, CircuitOpenError):
+        return ERROR_UNAVAILABLE
+
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, google_exceptions.DeadlineExceeded)):
+        return ERROR_TIMEOUT
+
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return ERROR_QUOTA
+
+    if isinstance(error, (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)):
+        return ERROR_AUTH
+
+    if isinstance(error, (google_exceptions.ServerError, google_exceptions.ServiceUnavailable,
+                          google_exceptions.Aborted, ConnectionError)):
+        return ERROR_TRANSIENT
+
+    if isinstance(error, (google_exceptions.InvalidArgument, google_exceptions.FailedPrecondition,
+                          google_exceptions.NotFound, ValueError)):
+        # ValueError covers blocked prompts and responses without text
+        return ERROR_INVALID
+
+    # Fall back to the message for errors raised outside the API client
+    message = str(error).lower()
+    if "quota" in message or "rate limit" in message or "429" in message:
+        return ERROR_QUOTA
+    if "unauthorized" in message or "api key" in message or "permission" in message:
+        return ERROR_AUTH
+    if "timeout" in message or "timed out" in message or "deadline" in message:
+        return ERROR_TIMEOUT
+    if "network" in message or "connection" in message or "unavailable" in message:
+        return ERROR_TRANSIENT
+
+    return ERROR_UNKNOWN
+
+def decorrelated_jitter(attempts: int, base: float, cap: float) -> Iterator[float]:
+    """Yield up to attempts retry delays using decorrelated jitter backoff.
+
+    Each delay is drawn between base and three times the previous delay, so
+    retries from many callers spread out instead of arriving in waves.
+    """
+    delay = base
+    for _ in range(attempts):
+        delay = min(cap, random.uniform(base, delay * 3))
+        yield delay
+
+class CircuitBreaker:
+    """Per-model circuit breaker.
+
+    After `failure_threshold` consecutive endpoint failures the circuit opens
+    and calls fail immediately. Once `recovery_time` has passed it goes
+    half-open and lets a single probe through: success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, model_name: str, failure_threshold: int = None, recovery_time: float = None):
+        self.model_name = model_name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_time = recovery_time or config.CIRCUIT_RECOVERY_TIME
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def acquire(self) -> bool:
+        """Admit a call, or raise CircuitOpenError while the circuit is open.
+
+        Returns True if the call is the half-open probe.
+        """
+        if self.state == self.CLOSED:
+            return False
+
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.recovery_time - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.model_name, remaining)
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit for {self.model_name} is half-open, probing")
+
+        if self._probing:
+            raise CircuitOpenError(self.model_name, self.recovery_time)
+
+        self._probing = True
+        return True
+
+    def release(self, probe: bool, error_class: Optional[str] = None) -> None:
+        """Report how an admitted call ended; error_class is None on success"""
+        if probe:
+            self._probing = False
+
+        if error_class is None:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.model_name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            return
+
+        if error_class not in BREAKER_ERRORS:
+            # The endpoint answered; a rejected request says nothing about its health
+            return
+
+        self.failures += 1
+        if probe or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit for {self.model_name} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def cancel(self, probe: bool) -> None:
+        """Free the probe slot of a call that was cancelled before it finished"""
+        if probe:
+            self._probing = False
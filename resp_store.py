@@ -0,0 +1,469 @@
+"""Redis-protocol (RESP2) client and a small local stand-in server.
+
+The client speaks plain Redis commands, so the shared state backend works
+against a real Redis server as well as against `RespServer`, an in-memory
+stand-in that implements just the commands the bot uses. Run the stand-in
+with `python resp_store.py` or let `main.py` start it in sharded mode.
+"""
+import asyncio
+import fnmatch
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import config
+
+logger = logging.getLogger('gemini-discord-bot.resp')
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+# Failures callers treat as "state store unavailable"
+STORE_ERRORS = (OSError, asyncio.TimeoutError, RespError)
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, float):
+            data = repr(arg).encode()
+        else:
+            data = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP2 reply; bulk strings are returned as bytes"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the server")
+
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+
+    raise ConnectionError(f"Malformed reply: {line!r}")
+
+class RespClient:
+    """Pipelined RESP client over one connection.
+
+    Commands from concurrent tasks are written as they arrive and their
+    replies are matched in order, so callers never wait for each other's
+    round trips. The connection is reopened after a failure.
+    """
+
+    def __init__(self, host: str = None, port: int = None, timeout: float = 5.0):
+        self.host = host or config.STATE_STORE_HOST
+        self.port = port or config.STATE_STORE_PORT
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: "asyncio.Queue[Tuple[int, asyncio.Future]]" = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self) -> None:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+            self._pending = asyncio.Queue()
+            self._reader_task = asyncio.ensure_future(self._read_replies(self._reader, self._pending))
+
+    async def _read_replies(self, reader: asyncio.StreamReader, pending: asyncio.Queue) -> None:
+        future = None
+        try:
+            while True:
+                count, future = await pending.get()
+                replies = [await read_reply(reader) for _ in range(count)]
+                if not future.done():
+                    future.set_result(replies)
+        except Exception as e:
+            # Fail whatever is still waiting; the next command reconnects
+            if future is not None and not future.done():
+                future.set_exception(ConnectionError(f"State store connection lost: {e}"))
+            self._fail(pending, e)
+        finally:
+            if self._writer is not None and self._reader is reader:
+                self._writer.close()
+                self._writer = None
+
+    @staticmethod
+    def _fail(pending: asyncio.Queue, error: Exception) -> None:
+        while not pending.empty():
+            _, future = pending.get_nowait()
+            if not future.done():
+                future.set_exception(ConnectionError(f"State store connection lost: {error}"))
+
+    async def pipeline(self, *commands: Tuple) -> List[Any]:
+        """Send several commands in one write and return their replies in order"""
+        await self._connect()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((len(commands), future))
+        self._writer.write(b"".join(encode_command(*command) for command in commands))
+
+        replies = await asyncio.wait_for(future, self.timeout)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    async def execute(self, *args) -> Any:
+        return (await self.pipeline(args))[0]
+
+    async def transaction(self, *commands: Tuple) -> List[Any]:
+        """Run commands atomically (MULTI/EXEC) and return their replies"""
+        replies = await self.pipeline(("MULTI",), *commands, ("EXEC",))
+        result = replies[-1]
+        if result is None:
+            raise RespError("Transaction aborted")
+        for reply in result:
+            if isinstance(reply, RespError):
+                raise reply
+        return result
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+class RespServer:
+    """In-memory stand-in for the subset of Redis the bot uses.
+
+    Every command runs to completion on the event loop, so commands and
+    MULTI/EXEC blocks are atomic. Keys with a TTL expire lazily on access
+    and in a periodic sweep.
+    """
+
+    def __init__(self, host: str = None, port: int = None):
+        self.host = host or config.STATE_STORE_HOST
+        self.port = port or config.STATE_STORE_PORT
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self._connections: set = set()
+
+    # Key space
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._delete(key)
+        return key in self.data
+
+    def _get(self, key: bytes, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self.data[key] = kind()
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def _drop_if_empty(self, key: bytes) -> None:
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, bytes) and not value:
+            self._delete(key)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for key in [key for key, deadline in self.expires.items() if deadline <= now]:
+                self._delete(key)
+
+    # Commands
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_get(self, key):
+        return self._get(key, bytes)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b"NX" in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b"PX" in options:
+            self.expires[key] = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+        elif b"EX" in options:
+            self.expires[key] = time.monotonic() + int(options[options.index(b"EX") + 1])
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(self._delete(key) for key in keys if self._alive(key))
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._get(key, bytes) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_pttl(self, key):
+        if not self._alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else int((deadline - time.monotonic()) * 1000)
+
+    def cmd_hset(self, key, *pairs):
+        hash_ = self._get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        hash_ = self._get(key, dict) or {}
+        return [item for pair in hash_.items() for item in pair]
+
+    def cmd_hdel(self, key, *fields):
+        hash_ = self._get(key, dict) or {}
+        removed = sum(hash_.pop(field, None) is not None for field in fields)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_rpush(self, key, *values):
+        list_ = self._get(key, list, create=True)
+        list_.extend(values)
+        return len(list_)
+
+    @staticmethod
+    def _range(length: int, start, stop) -> slice:
+        start, stop = int(start), int(stop)
+        start = max(0, start + length if start < 0 else start)
+        stop = stop + length if stop < 0 else stop
+        return slice(start, max(start, stop + 1))
+
+    def cmd_lrange(self, key, start, stop):
+        list_ = self._get(key, list) or []
+        return list_[self._range(len(list_), start, stop)]
+
+    def cmd_ltrim(self, key, start, stop):
+        list_ = self._get(key, list)
+        if list_ is not None:
+            list_[:] = list_[self._range(len(list_), start, stop)]
+            self._drop_if_empty(key)
+        return "OK"
+
+    def cmd_llen(self, key):
+        return len(self._get(key, list) or [])
+
+    def cmd_sadd(self, key, *members):
+        set_ = self._get(key, set, create=True)
+        before = len(set_)
+        set_.update(members)
+        return len(set_) - before
+
+    def cmd_srem(self, key, *members):
+        set_ = self._get(key, set) or set()
+        removed = sum(member in set_ for member in members)
+        set_.difference_update(members)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_smembers(self, key):
+        return list(self._get(key, set) or ())
+
+    def cmd_zadd(self, key, *pairs):
+        zset = self._get(key, dict, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        zset = self._get(key, dict) or {}
+        removed = sum(zset.pop(member, None) is not None for member in members)
+        self._drop_if_empty(key)
+        return removed
+
+    def cmd_zcard(self, key):
+        return len(self._get(key, dict) or {})
+
+    @staticmethod
+    def _score_bound(value: bytes) -> Tuple[float, bool]:
+        text = value.decode()
+        exclusive = text.startswith("(")
+        text = text.lstrip("(")
+        bound = {"-inf": float("-inf"), "+inf": float("inf"), "inf": float("inf")}.get(text)
+        return (float(text) if bound is None else bound), exclusive
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        zset = self._get(key, dict) or {}
+        (low, low_open), (high, high_open) = self._score_bound(low), self._score_bound(high)
+        doomed = [
+            member for member, score in zset.items()
+            if (score > low if low_open else score >= low) and (score < high if high_open else score <= high)
+        ]
+        for member in doomed:
+            del zset[member]
+        self._drop_if_empty(key)
+        return len(doomed)
+
+    def cmd_keys(self, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def cmd_dbsize(self):
+        return len(self.data)
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+    def dispatch(self, args: List[bytes]):
+        handler = getattr(self, f"cmd_{args[0].decode().lower()}", None)
+        if handler is None:
+            return RespError(f"ERR unknown command '{args[0].decode()}'")
+        try:
+            return handler(*args[1:])
+        except RespError as e:
+            return e
+        except (TypeError, ValueError, IndexError):
+            return RespError(f"ERR wrong arguments for '{args[0].decode()}'")
+
+    # Connections
+
+    @classmethod
+    def encode_reply(cls, reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, RespError):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, str):
+            return b"+%s\r\n" % reply.encode()
+        if isinstance(reply, bool) or isinstance(reply, int):
+            return b":%d\r\n" % int(reply)
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(cls.encode_reply(item) for item in reply)
+        raise TypeError(f"Cannot encode {type(reply)}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queued: Optional[List[List[bytes]]] = None
+        self._connections.add(writer)
+
+        try:
+            while True:
+                request = await read_reply(reader)
+                if not isinstance(request, list) or not request:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    continue
+
+                name = request[0].upper()
+                if name == b"MULTI":
+                    queued = []
+                    reply: Union[str, list, RespError, None] = "OK"
+                elif name == b"EXEC" and queued is not None:
+                    reply = [self.dispatch(command) for command in queued]
+                    queued = None
+                elif name == b"DISCARD" and queued is not None:
+                    queued = None
+                    reply = "OK"
+                elif queued is not None:
+                    queued.append(request)
+                    reply = "QUEUED"
+                else:
+                    reply = self.dispatch(request)
+
+                writer.write(self.encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._sweeper = asyncio.ensure_future(self._sweep())
+        logger.info(f"State store listening on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        await self._server.serve_forever()
+
+_client: Optional[RespClient] = None
+
+def get_client() -> RespClient:
+    """Get the process-wide connection to the shared state store"""
+    global _client
+    if _client is None:
+        _client = RespClient()
+    return _client
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def run_server(host: str = None, port: int = None) -> None:
+    """Run the stand-in server until interrupted"""
+    try:
+        asyncio.run(RespServer(host, port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    run_server()
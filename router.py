@@ -0,0 +1,201 @@
+import logging
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import config
+from metrics import ROUTER_DECISIONS
+
+logger = logging.getLogger('gemini-discord-bot.router')
+
+class ModelStats:
+    """Rolling latency and error window of one model.
+
+    The window holds at most `window` calls and forgets calls older than
+    `max_age` seconds, so a model that stops getting traffic doesn't keep
+    its old verdict forever. Streamed calls are timed to their first chunk,
+    kept apart from whole-response latencies, which set call deadlines.
+    """
+
+    def __init__(self, window: int, max_age: float):
+        self.max_age = max_age
+        # (monotonic time, value)
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=window)
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self._first_chunks: Deque[Tuple[float, float]] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.max_age
+        for samples in (self._latencies, self._outcomes, self._first_chunks):
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+
+    def record(self, latency: Optional[float], ok: bool, first_chunk: Optional[float] = None) -> None:
+        now = time.monotonic()
+        self.requests += 1
+        self._outcomes.append((now, ok))
+        if latency is not None:
+            self._latencies.append((now, latency))
+        if first_chunk is not None:
+            self._first_chunks.append((now, first_chunk))
+        if not ok:
+            self.errors += 1
+
+    @property
+    def latencies(self) -> List[float]:
+        self._expire()
+        return [latency for _, latency in self._latencies]
+
+    @property
+    def first_chunks(self) -> List[float]:
+        self._expire()
+        return [latency for _, latency in self._first_chunks]
+
+    @property
+    def outcomes(self) -> List[bool]:
+        self._expire()
+        return [ok for _, ok in self._outcomes]
+
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> Optional[float]:
+        if not values:
+            return None
+
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Get a latency percentile (0-1) over the window, or None without samples"""
+        return self._percentile(self.latencies, fraction)
+
+    def first_chunk_percentile(self, fraction: float) -> Optional[float]:
+        """Get a time-to-first-chunk percentile (0-1) of streamed calls, or None without samples"""
+        return self._percentile(self.first_chunks, fraction)
+
+    @property
+    def error_rate(self) -> float:
+        outcomes = self.outcomes
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+class ModelRouter:
+    """Picks Flash or Pro per request and tracks live model health.
+
+    The command type decides the preferred model, prompts too long for Pro
+    go to Flash, and a model whose recent error rate or p50/p95 latency is
+    over budget hands its traffic to the other one while it recovers. A
+    small share of its traffic still goes to it as probes, so it can prove
+    itself healthy again.
+    """
+
+    def __init__(self, default_model: str = None, alternate_model: str = None, window: int = None,
+                 max_age: float = None):
+        self.default_model = default_model or config.GEMINI_TEXT_MODEL
+        self.alternate_model = alternate_model or config.GEMINI_PRO_MODEL
+        self.window = window or config.ROUTER_WINDOW
+        self.max_age = max_age or config.ROUTER_WINDOW_SECONDS
+        self._stats: Dict[str, ModelStats] = {}
+        # (task, model, reason) -> count
+        self.decisions: Counter = Counter()
+
+    def _get_stats(self, model_name: str) -> ModelStats:
+        stats = self._stats.get(model_name)
+        if stats is None:
+            stats = self._stats[model_name] = ModelStats(self.window, self.max_age)
+
+        return stats
+
+    def record(self, model_name: str, latency: Optional[float], ok: bool,
+               first_chunk: Optional[float] = None) -> None:
+        """Record the outcome of one call; latency is None when it isn't comparable.
+
+        Timed-out calls pass their latency so slow tails still count.
+        Streamed calls pass their time to first chunk instead.
+        """
+        self._get_stats(model_name).record(latency, ok, first_chunk)
+
+    def record_hedge(self, model_name: str) -> None:
+        """Count a backup request sent for a slow call"""
+        self._get_stats(model_name).hedges += 1
+
+    def is_healthy(self, model_name: str) -> bool:
+        """Check a model's recent error rate and p50/p95 latency against their budgets"""
+        stats = self._stats.get(model_name)
+        if stats is None or len(stats.outcomes) < config.ROUTER_MIN_SAMPLES:
+            return True
+
+        if stats.error_rate > config.ROUTER_MAX_ERROR_RATE:
+            return False
+
+        # Whole responses and streams' first chunks are held to the same budgets
+        for percentile in (stats.percentile, stats.first_chunk_percentile):
+            p50 = percentile(0.5)
+            if p50 is not None and p50 > config.ROUTER_P50_BUDGET:
+                return False
+
+            p95 = percentile(0.95)
+            if p95 is not None and p95 > config.ROUTER_LATENCY_BUDGET:
+                return False
+
+        return True
+
+    def choose(self, task: str, estimated_tokens: int = 0) -> str:
+        """Pick the model for a request of the given command type and prompt size"""
+        model_name = config.ROUTER_TASK_MODELS.get(task, self.default_model)
+        reason = "task"
+
+        if model_name != self.default_model and estimated_tokens > config.ROUTER_PRO_MAX_TOKENS:
+            model_name = self.default_model
+            reason = "size"
+        elif not self.is_healthy(model_name):
+            other = self.alternate_model if model_name == self.default_model else self.default_model
+            if random.random() < config.ROUTER_PROBE_FRACTION:
+                # Keep sampling the unhealthy model so it can recover
+                reason = "probe"
+            elif self.is_healthy(other):
+                logger.info(f"Routing {task} to {other}: {model_name} is over its error/latency budget")
+                model_name = other
+                reason = "health"
+
+        self.decisions[(task, model_name, reason)] += 1
+        ROUTER_DECISIONS.inc(task=task, model=model_name, reason=reason)
+        return model_name
+
+    def percentile(self, model_name: str, fraction: float) -> Optional[float]:
+        """Get a model's latency percentile, or None until there are enough samples"""
+        stats = self._stats.get(model_name)
+        if stats is None or len(stats.latencies) < config.ROUTER_MIN_SAMPLES:
+            return None
+
+        return stats.percentile(fraction)
+
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """Get how long to wait before sending a backup request, or None to not hedge"""
+        p95 = self.percentile(model_name, 0.95)
+        if p95 is None:
+            return None
+
+        return max(p95, config.HEDGE_MIN_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-model latency percentiles, error rates and routing decisions"""
+        models = {}
+        for model_name, stats in self._stats.items():
+            models[model_name] = {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "hedges": stats.hedges,
+                "error_rate": stats.error_rate,
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+                "first_chunk_p50": stats.first_chunk_percentile(0.5),
+                "first_chunk_p95": stats.first_chunk_percentile(0.95),
+            }
+
+        decisions: Dict[Tuple[str, str, str], int] = dict(self.decisions)
+        return {"models": models, "decisions": decisions}
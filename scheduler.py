@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger('gemini-discord-bot.scheduler')
+
+# Lower values are served first
+PRIORITY_ADMIN = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+
+# Gemini bills every image as a fixed number of tokens
+IMAGE_TOKEN_ESTIMATE = 258
+
+# (guild_id, priority) of the command currently being handled
+_request_origin: ContextVar[Tuple[Optional[int], int]] = ContextVar(
+    "request_origin", default=(None, PRIORITY_NORMAL)
+)
+
+def set_request_origin(guild_id: Optional[int], priority: int = PRIORITY_NORMAL) -> None:
+    """Record the guild and priority of the command running in this task"""
+    _request_origin.set((guild_id, priority))
+
+def get_request_origin() -> Tuple[Optional[int], int]:
+    """Get the guild and priority of the command running in this task"""
+    return _request_origin.get()
+
+def estimate_tokens(contents) -> int:
+    """Roughly estimate the prompt tokens of a request (about 4 characters per token)"""
+    if contents is None:
+        return 0
+
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+
+    if isinstance(contents, dict):
+        if "parts" in contents:
+            return estimate_tokens(contents["parts"])
+        return IMAGE_TOKEN_ESTIMATE
+
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents)
+
+    # Images and other binary parts
+    return IMAGE_TOKEN_ESTIMATE
+
+def split_quotas(quotas: Dict[str, Dict[str, int]], parts: int) -> Dict[str, Dict[str, int]]:
+    """Divide project-wide quotas evenly between worker processes"""
+    if parts <= 1:
+        return quotas
+
+    return {
+        model_name: {limit: max(1, value // parts) for limit, value in quota.items()}
+        for model_name, quota in quotas.items()
+    }
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount tokens are available"""
+        amount = min(amount, self.capacity)
+        self._refill(time.monotonic())
+
+        if self.tokens >= amount:
+            return 0.0
+
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Take amount tokens from the bucket"""
+        self._refill(time.monotonic())
+        self.tokens -= min(amount, self.capacity)
+
+class _Waiter:
+    """A queued request waiting for quota"""
+
+    __slots__ = ("future", "tokens", "enqueued")
+
+    def __init__(self, future: asyncio.Future, tokens: int):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+class _ModelQueue:
+    """Quota buckets and the fair waiting queue of one model"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # priority -> guild_id -> waiters, guilds in round-robin order
+        self.levels: Dict[int, "OrderedDict[Optional[int], Deque[_Waiter]]"] = {}
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.waiting = 0
+
+    def push(self, priority: int, guild_id: Optional[int], waiter: _Waiter) -> None:
+        guilds = self.levels.setdefault(priority, OrderedDict())
+        guilds.setdefault(guild_id, deque()).append(waiter)
+        self.waiting += 1
+        self.wakeup.set()
+
+    def peek(self) -> Optional[_Waiter]:
+        """Get the next waiter to serve, dropping cancelled ones"""
+        for priority in sorted(self.levels):
+            guilds = self.levels[priority]
+
+            while guilds:
+                guild_id, waiters = next(iter(guilds.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()
+                    self.waiting -= 1
+
+                if waiters:
+                    return waiters[0]
+
+                del guilds[guild_id]
+
+            del self.levels[priority]
+
+        return None
+
+    def pop(self) -> _Waiter:
+        """Remove the waiter returned by peek and rotate its guild to the back"""
+        priority = min(self.levels)
+        guilds = self.levels[priority]
+        guild_id, waiters = next(iter(guilds.items()))
+        waiter = waiters.popleft()
+        self.waiting -= 1
+
+        if waiters:
+            guilds.move_to_end(guild_id)
+        else:
+            del guilds[guild_id]
+
+        return waiter
+
+class GeminiScheduler:
+    """Central admission control for Gemini calls.
+
+    Every call waits here until the model's request-per-minute and
+    token-per-minute buckets allow it. Waiting calls are served by priority,
+    and round-robin across guilds within a priority so one busy server
+    cannot starve the others.
+    """
+
+    def __init__(self, quotas: Dict[str, Dict[str, int]] = None):
+        self.quotas = quotas if quotas is not None else config.GEMINI_MODEL_QUOTAS
+        self._queues: Dict[str, _ModelQueue] = {}
+
+    def _get_queue(self, model_name: str) -> _ModelQueue:
+        queue = self._queues.get(model_name)
+
+        if queue is None:
+            quota = self.quotas.get(model_name) or self.quotas.get("default") or {}
+            queue = _ModelQueue(
+                quota.get("requests_per_minute", 60),
+                quota.get("tokens_per_minute", 1000000)
+            )
+            self._queues[model_name] = queue
+
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.get_running_loop().create_task(self._dispatch(model_name, queue))
+
+        return queue
+
+    async def acquire(self, model_name: str, estimated_tokens: int = 0,
+                      priority: int = None, guild_id: Optional[int] = None) -> float:
+        """Wait until the model's quota admits this request.
+
+        Priority and guild default to the origin of the running command.
+        Returns the seconds spent waiting.
+        """
+        origin_guild, origin_priority = get_request_origin()
+        if guild_id is None:
+            guild_id = origin_guild
+        if priority is None:
+            priority = origin_priority
+            # Short requests jump ahead of long ones
+            if priority == PRIORITY_NORMAL and estimated_tokens <= config.SCHEDULER_SHORT_REQUEST_TOKENS:
+                priority = PRIORITY_HIGH
+
+        queue = self._get_queue(model_name)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), estimated_tokens)
+        queue.push(priority, guild_id, waiter)
+
+        await waiter.future
+        return time.monotonic() - waiter.enqueued
+
+    async def _dispatch(self, model_name: str, queue: _ModelQueue) -> None:
+        """Admit waiting requests as the model's buckets refill"""
+        while True:
+            waiter = queue.peek()
+
+            if waiter is None:
+                queue.wakeup.clear()
+                await queue.wakeup.wait()
+                continue
+
+            delay = max(queue.requests.delay_for(1), queue.tokens.delay_for(waiter.tokens))
+
+            if delay > 0:
+                # Sleep until quota refills, but wake early for higher-priority arrivals
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue.pop()
+            queue.requests.consume(1)
+            queue.tokens.consume(waiter.tokens)
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of waiting requests per model"""
+        return {model_name: queue.waiting for model_name, queue in self._queues.items()}
+
+    def close(self) -> None:
+        """Stop the dispatcher tasks"""
+        for queue in self._queues.values():
+            if queue.task is not None:
+                queue.task.cancel()
@@ -0,0 +1,207 @@
+"""Markdown-aware splitting of long responses into Discord messages.
+
+Text is cut at the best boundary available near the length limit:
+paragraph, then line, then sentence, then word, and only as a last resort
+mid-word (never inside a grapheme cluster such as an emoji sequence).
+A code block that spans a cut is closed at the end of one message and
+reopened with the same language tag at the start of the next, so every
+message renders on its own.
+"""
+import unicodedata
+from typing import List, Optional
+
+import config
+
+FENCE = "```"
+CLOSING_FENCE = "\n```"
+# Longest language tag carried over to a reopened code block
+MAX_LANGUAGE_LENGTH = 20
+
+PROSE_BREAKS = ("\n\n", "\n", ". ", "! ", "? ", "。", " ")
+CODE_BREAKS = ("\n\n", "\n", " ")
+
+ZERO_WIDTH_JOINER = "\u200d"
+
+def fence_opener(line: str) -> Optional[str]:
+    """Get the fence a line opens or closes ("```" plus language), or None if it isn't a fence"""
+    stripped = line.lstrip(" ")
+    if len(line) - len(stripped) > 3 or not stripped.startswith(FENCE):
+        return None
+
+    info = stripped.strip().lstrip("`").split()
+    return FENCE + (info[0][:MAX_LANGUAGE_LENGTH] if info else "")
+
+def _regional_indicator(char: str) -> bool:
+    return 0x1F1E6 <= ord(char) <= 0x1F1FF
+
+def _extends_cluster(char: str) -> bool:
+    """Whether a character attaches to the one before it"""
+    code = ord(char)
+    return (
+        unicodedata.category(char) in ("Mn", "Me", "Mc")
+        or char == ZERO_WIDTH_JOINER
+        or 0xFE00 <= code <= 0xFE0F  # variation selectors
+        or 0x1F3FB <= code <= 0x1F3FF  # skin tone modifiers
+        or 0xE0020 <= code <= 0xE007F  # emoji tag sequences
+    )
+
+def splits_cluster(text: str, index: int) -> bool:
+    """Whether cutting text before index would break a grapheme cluster"""
+    if index <= 0 or index >= len(text):
+        return False
+
+    before, after = text[index - 1], text[index]
+    if _extends_cluster(after) or before == ZERO_WIDTH_JOINER:
+        return True
+    if before == "\r" and after == "\n":
+        return True
+
+    if _regional_indicator(before) and _regional_indicator(after):
+        # Flags are pairs of regional indicators; cut between pairs only
+        run = 0
+        while index - run - 1 >= 0 and _regional_indicator(text[index - run - 1]):
+            run += 1
+        return run % 2 == 1
+
+    return False
+
+class MessageSplitter:
+    """Incrementally splits a stream of text into messages of at most max_length.
+
+    Feed text as it arrives; feed() returns the messages that are complete.
+    preview() shows the message being filled, with any open code block
+    closed so it renders. Every character is scanned a bounded number of
+    times, so splitting is linear in the length of the text.
+    """
+
+    def __init__(self, max_length: int = None):
+        self.max_length = max_length or config.MAX_RESPONSE_LENGTH
+        self._buffer = ""
+        self._start = 0
+        # Code block open at _start, carried over from the previous message
+        self._fence: Optional[str] = None
+        # Code block open after the last complete line scanned
+        self._scanned = 0
+        self._scanned_fence: Optional[str] = None
+
+    def _head(self) -> str:
+        return self._fence + "\n" if self._fence else ""
+
+    @staticmethod
+    def _advance(fence: Optional[str], text: str, start: int, end: int) -> Optional[str]:
+        """Apply the fence lines among the complete lines of text[start:end]"""
+        while True:
+            newline = text.find("\n", start, end)
+            if newline == -1:
+                return fence
+
+            opener = fence_opener(text[start:newline])
+            if opener is not None:
+                if fence is None:
+                    fence = opener
+                elif opener == FENCE:
+                    fence = None
+            start = newline + 1
+
+    def _scan(self) -> None:
+        """Track the code block state over newly completed lines"""
+        end = self._buffer.rfind("\n", self._scanned) + 1
+        if end > self._scanned:
+            self._scanned_fence = self._advance(self._scanned_fence, self._buffer, self._scanned, end)
+            self._scanned = end
+
+    def _tail_fence(self) -> Optional[str]:
+        """Code block state at the end of the buffer, counting an unfinished last line"""
+        fence = self._scanned_fence
+        opener = fence_opener(self._buffer[self._scanned:])
+        if opener is not None:
+            if fence is None:
+                return opener
+            if opener == FENCE:
+                return None
+        return fence
+
+    def _break_point(self, limit: int) -> int:
+        """Pick where to cut within the next limit characters of the buffer"""
+        start = self._start
+        floor = start + max(1, limit // 2)
+        end = start + limit
+
+        for separator in (CODE_BREAKS if self._fence else PROSE_BREAKS):
+            index = self._buffer.rfind(separator, floor, end)
+            if index != -1:
+                return index + len(separator) - start
+
+        cut = end
+        while cut > floor and splits_cluster(self._buffer, cut):
+            cut -= 1
+        return cut - start
+
+    def _cut(self) -> str:
+        head = self._head()
+        limit = max(1, self.max_length - len(head) - len(CLOSING_FENCE))
+        cut = self._break_point(limit)
+
+        end = self._start + cut
+        fence = self._advance(self._fence, self._buffer, self._start, end)
+        if fence is not None and fence != self._fence:
+            # Don't end a message right after opening a code block; start the block in the next one
+            line_start = self._buffer.rfind("\n", self._start, end - 1) + 1
+            if line_start > self._start and fence_opener(self._buffer[line_start:end]) == fence:
+                end = line_start
+                # The line opened a block, so none was open before it
+                fence = None
+
+        piece = self._buffer[self._start:end]
+        message = head + piece
+        if fence is not None:
+            message += FENCE if message.endswith("\n") else CLOSING_FENCE
+
+        self._fence = fence
+        self._start = end
+        if self._scanned < end:
+            self._scanned = end
+            self._scanned_fence = fence
+
+        return message
+
+    def _compact(self) -> None:
+        if self._start > len(self._buffer) // 2:
+            self._buffer = self._buffer[self._start:]
+            self._scanned -= self._start
+            self._start = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the messages it completes"""
+        self._buffer += text
+        self._scan()
+
+        messages = []
+        while len(self._head()) + len(self._buffer) - self._start + len(CLOSING_FENCE) > self.max_length:
+            message = self._cut()
+            if message.strip():
+                messages.append(message)
+
+        self._compact()
+        return messages
+
+    def preview(self) -> str:
+        """The message currently being filled, with an open code block closed"""
+        message = self._head() + self._buffer[self._start:]
+        if self._tail_fence() is not None:
+            message += FENCE if message.endswith("\n") else CLOSING_FENCE
+        return message
+
+    def finish(self) -> List[str]:
+        """Return the last message(s) once the text is complete"""
+        message = self.preview()
+        remaining = self._buffer[self._start:]
+        self._buffer = ""
+        self._start = self._scanned = 0
+        self._fence = self._scanned_fence = None
+        return [message] if remaining.strip() else []
+
+def split_message(text: str, max_length: int = None) -> List[str]:
+    """Split a complete text into Discord-sized messages"""
+    splitter = MessageSplitter(max_length)
+    return splitter.feed(text) + splitter.finish()
@@ -0,0 +1,468 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from resp_store import get_client
+
+logger = logging.getLogger('gemini-discord-bot.storage')
+
+class ConversationStore:
+    """Persistent storage backend for conversation history.
+
+    Messages are returned in Gemini's history format:
+    {"role": "user" | "model", "parts": [text]}.
+
+    A shared store is written by several processes at once; it keeps a
+    per-user version number so callers can tell when a copy they hold in
+    memory is stale.
+    """
+
+    shared = False
+
+    async def load(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Load the user's most recent messages, oldest first"""
+        raise NotImplementedError
+
+    async def append(self, user_id: int, role: str, content: str) -> Optional[int]:
+        """Append a message to the user's history; shared stores return the new version"""
+        raise NotImplementedError
+
+    async def version(self, user_id: int) -> Optional[int]:
+        """Get the version of the user's history (shared stores only)"""
+        return None
+
+    async def load_summary(self, user_id: int) -> Optional[str]:
+        """Load the rolling summary of the user's older turns"""
+        raise NotImplementedError
+
+    async def save_summary(self, user_id: int, summary: str, folded_count: int) -> None:
+        """Store a new rolling summary and delete the user's folded_count oldest messages"""
+        raise NotImplementedError
+
+    async def reset(self, user_id: int) -> None:
+        """Delete the user's history and summary"""
+        raise NotImplementedError
+
+    async def reset_all(self) -> None:
+        """Delete every user's history"""
+        raise NotImplementedError
+
+    async def flush(self) -> None:
+        """Write out any buffered changes"""
+
+    async def close(self) -> None:
+        """Flush and release resources"""
+        await self.flush()
+
+class SQLiteConversationStore(ConversationStore):
+    """Append-only conversation storage in an SQLite database (WAL mode).
+
+    Appends are buffered and committed in batches by a dedicated database
+    thread, so the event loop never waits on disk. Histories are loaded
+    lazily, one user at a time.
+    """
+
+    def __init__(self, path: str = None, keep_messages: int = None,
+                 flush_interval: float = None, batch_size: int = None):
+        self.path = path or config.CONVERSATION_DB_PATH
+        self.keep_messages = keep_messages or config.CONVERSATION_MEMORY_LIMIT * 2
+        self.flush_interval = config.CONVERSATION_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.batch_size = batch_size or config.CONVERSATION_FLUSH_BATCH_SIZE
+
+        self._conn: Optional[sqlite3.Connection] = None
+        # A single thread owns the connection, so batches and reads run in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self._pending: List[Tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER NOT NULL, "
+                "role TEXT NOT NULL, "
+                "content TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id, id)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "user_id INTEGER PRIMARY KEY, "
+                "summary TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+        return self._conn
+
+    async def _execute(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _write_batch(self, operations: List[Tuple]) -> None:
+        """Apply buffered operations in one transaction"""
+        conn = self._connect()
+        touched: Set[int] = set()
+        rows: List[Tuple] = []
+
+        def insert_rows():
+            if rows:
+                conn.executemany(
+                    "INSERT INTO messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                rows.clear()
+
+        try:
+            with conn:
+                for operation in operations:
+                    if operation[0] == "append":
+                        _, user_id, role, content, created_at = operation
+                        rows.append((user_id, role, content, created_at))
+                        touched.add(user_id)
+                    elif operation[0] == "summary":
+                        _, user_id, summary, folded_count, updated_at = operation
+                        insert_rows()
+                        conn.execute(
+                            "DELETE FROM messages WHERE id IN ("
+                            "SELECT id FROM messages WHERE user_id = ? ORDER BY id LIMIT ?)",
+                            (user_id, folded_count)
+                        )
+                        conn.execute(
+                            "INSERT OR REPLACE INTO summaries (user_id, summary, updated_at) VALUES (?, ?, ?)",
+                            (user_id, summary, updated_at)
+                        )
+                    elif operation[0] == "reset":
+                        insert_rows()
+                        conn.execute("DELETE FROM messages WHERE user_id = ?", (operation[1],))
+                        conn.execute("DELETE FROM summaries WHERE user_id = ?", (operation[1],))
+                        touched.discard(operation[1])
+                    elif operation[0] == "reset_all":
+                        rows.clear()
+                        conn.execute("DELETE FROM messages")
+                        conn.execute("DELETE FROM summaries")
+                        touched.clear()
+
+                insert_rows()
+
+                # Keep only the window the bot can use
+                for user_id in touched:
+                    conn.execute(
+                        "DELETE FROM messages WHERE user_id = ? AND id <= ("
+                        "SELECT id FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (user_id, user_id, self.keep_messages)
+                    )
+        except Exception as e:
+            logger.error(f"Error writing {len(operations)} conversation operations: {str(e)}")
+
+    def _load(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT role, content FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+
+        return [{"role": role, "parts": [content]} for role, content in reversed(rows)]
+
+    def _load_summary(self, user_id: int) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT summary FROM summaries WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def _queue(self, operation: Tuple) -> None:
+        """Buffer an operation and make sure a flush is coming"""
+        self._pending.append(operation)
+
+        if len(self._pending) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Commit buffered operations"""
+        if not self._pending:
+            return
+
+        operations, self._pending = self._pending, []
+        await self._execute(self._write_batch, operations)
+
+    async def load(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        # Make this user's buffered appends visible first
+        await self.flush()
+
+        try:
+            return await self._execute(self._load, user_id, limit)
+        except Exception as e:
+            logger.error(f"Error loading conversation for user {user_id}: {str(e)}")
+            return []
+
+    async def append(self, user_id: int, role: str, content: str) -> None:
+        self._queue(("append", user_id, role, content, time.time()))
+
+    async def load_summary(self, user_id: int) -> Optional[str]:
+        await self.flush()
+
+        try:
+            return await self._execute(self._load_summary, user_id)
+        except Exception as e:
+            logger.error(f"Error loading conversation summary for user {user_id}: {str(e)}")
+            return None
+
+    async def save_summary(self, user_id: int, summary: str, folded_count: int) -> None:
+        self._queue(("summary", user_id, summary, folded_count, time.time()))
+
+    async def reset(self, user_id: int) -> None:
+        self._queue(("reset", user_id))
+
+    async def reset_all(self) -> None:
+        self._queue(("reset_all",))
+        await self.flush()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+
+        await self.flush()
+
+        if self._conn is not None:
+            await self._execute(self._conn.close)
+            self._conn = None
+
+        self._executor.shutdown(wait=False)
+
+class JsonConversationStore(ConversationStore):
+    """Legacy storage with one JSON file per user.
+
+    Every append rewrites the user's file, so this suits small bots only;
+    file I/O still runs off the event loop.
+    """
+
+    def __init__(self, storage_path: str = None, keep_messages: int = None):
+        self.storage_path = storage_path or config.CONVERSATION_JSON_DIR
+        self.keep_messages = keep_messages or config.CONVERSATION_MEMORY_LIMIT * 2
+        self.summary_path = os.path.join(self.storage_path, "summaries")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-json")
+
+        os.makedirs(self.summary_path, exist_ok=True)
+
+    def _get_user_file_path(self, user_id: int) -> str:
+        """Get file path for user ID"""
+        return os.path.join(self.storage_path, f"{user_id}.json")
+
+    def _read(self, user_id: int) -> List[Dict[str, Any]]:
+        file_path = self._get_user_file_path(user_id)
+        if not os.path.exists(file_path):
+            return []
+
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading conversation for user {user_id}: {str(e)}")
+            return []
+
+    def _write(self, user_id: int, messages: List[Dict[str, Any]]) -> None:
+        try:
+            with open(self._get_user_file_path(user_id), 'w', encoding='utf-8') as f:
+                json.dump(messages, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error saving conversation for user {user_id}: {str(e)}")
+
+    def _append(self, user_id: int, role: str, content: str) -> None:
+        messages = self._read(user_id)
+        messages.append({"role": role, "parts": [content]})
+        self._write(user_id, messages[-self.keep_messages:])
+
+    def _get_summary_file_path(self, user_id: int) -> str:
+        return os.path.join(self.summary_path, f"{user_id}.txt")
+
+    def _read_summary(self, user_id: int) -> Optional[str]:
+        file_path = self._get_summary_file_path(user_id)
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _write_summary(self, user_id: int, summary: str, folded_count: int) -> None:
+        self._write(user_id, self._read(user_id)[folded_count:])
+
+        try:
+            with open(self._get_summary_file_path(user_id), 'w', encoding='utf-8') as f:
+                f.write(summary)
+        except Exception as e:
+            logger.error(f"Error saving conversation summary for user {user_id}: {str(e)}")
+
+    def _reset(self, user_id: int) -> None:
+        self._write(user_id, [])
+
+        summary_file = self._get_summary_file_path(user_id)
+        if os.path.exists(summary_file):
+            os.remove(summary_file)
+
+    def _reset_all(self) -> None:
+        for directory, extension in ((self.storage_path, ".json"), (self.summary_path, ".txt")):
+            for filename in os.listdir(directory):
+                if filename.endswith(extension):
+                    os.remove(os.path.join(directory, filename))
+
+    async def _execute(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def load(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        messages = await self._execute(self._read, user_id)
+        return messages[-limit:]
+
+    async def append(self, user_id: int, role: str, content: str) -> None:
+        await self._execute(self._append, user_id, role, content)
+
+    async def load_summary(self, user_id: int) -> Optional[str]:
+        return await self._execute(self._read_summary, user_id)
+
+    async def save_summary(self, user_id: int, summary: str, folded_count: int) -> None:
+        await self._execute(self._write_summary, user_id, summary, folded_count)
+
+    async def reset(self, user_id: int) -> None:
+        await self._execute(self._reset, user_id)
+
+    async def reset_all(self) -> None:
+        await self._execute(self._reset_all)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+class RespConversationStore(ConversationStore):
+    """Conversation storage in the shared Redis-protocol state store.
+
+    Used when the bot runs as several sharded processes: a user who talks
+    to the bot through different shards sees one history. Each history is
+    a capped list of JSON messages with a version counter bumped by every
+    write.
+    """
+
+    shared = True
+
+    def __init__(self, client=None, keep_messages: int = None):
+        self.client = client or get_client()
+        self.keep_messages = keep_messages or config.CONVERSATION_MEMORY_LIMIT * 2
+
+    @staticmethod
+    def _keys(user_id: int) -> Tuple[str, str, str]:
+        return f"conv:{user_id}", f"conv:{user_id}:summary", f"conv:{user_id}:version"
+
+    async def load(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        messages_key, _, _ = self._keys(user_id)
+        try:
+            rows = await self.client.execute("LRANGE", messages_key, -limit, -1)
+        except Exception as e:
+            logger.error(f"Error loading conversation for user {user_id}: {str(e)}")
+            return []
+
+        return [json.loads(row) for row in rows]
+
+    async def version(self, user_id: int) -> Optional[int]:
+        try:
+            value = await self.client.execute("GET", self._keys(user_id)[2])
+        except Exception as e:
+            logger.error(f"Error loading conversation version for user {user_id}: {str(e)}")
+            return None
+
+        return int(value) if value is not None else 0
+
+    async def append(self, user_id: int, role: str, content: str) -> Optional[int]:
+        messages_key, _, version_key = self._keys(user_id)
+        message = json.dumps({"role": role, "parts": [content]}, ensure_ascii=False)
+        try:
+            _, _, version, _ = await self.client.transaction(
+                ("RPUSH", messages_key, message),
+                ("LTRIM", messages_key, -self.keep_messages, -1),
+                ("INCR", version_key),
+                ("SADD", "conv:users", user_id)
+            )
+        except Exception as e:
+            logger.error(f"Error saving conversation for user {user_id}: {str(e)}")
+            return None
+
+        return version
+
+    async def load_summary(self, user_id: int) -> Optional[str]:
+        try:
+            summary = await self.client.execute("GET", self._keys(user_id)[1])
+        except Exception as e:
+            logger.error(f"Error loading conversation summary for user {user_id}: {str(e)}")
+            return None
+
+        return summary.decode("utf-8") if summary is not None else None
+
+    async def save_summary(self, user_id: int, summary: str, folded_count: int) -> None:
+        messages_key, summary_key, version_key = self._keys(user_id)
+        try:
+            await self.client.transaction(
+                ("LTRIM", messages_key, folded_count, -1),
+                ("SET", summary_key, summary),
+                ("INCR", version_key),
+                ("SADD", "conv:users", user_id)
+            )
+        except Exception as e:
+            logger.error(f"Error saving conversation summary for user {user_id}: {str(e)}")
+
+    async def reset(self, user_id: int) -> None:
+        messages_key, summary_key, version_key = self._keys(user_id)
+        try:
+            await self.client.transaction(
+                ("DEL", messages_key, summary_key),
+                ("INCR", version_key)
+            )
+        except Exception as e:
+            logger.error(f"Error resetting conversation for user {user_id}: {str(e)}")
+
+    async def reset_all(self) -> None:
+        try:
+            users = await self.client.execute("SMEMBERS", "conv:users")
+            commands = [("DEL", "conv:users")]
+            for user in users:
+                messages_key, summary_key, version_key = self._keys(int(user))
+                # Bump rather than delete the version, so other workers drop their copies
+                commands += [("DEL", messages_key, summary_key), ("INCR", version_key)]
+            await self.client.transaction(*commands)
+        except Exception as e:
+            logger.error(f"Error resetting all conversations: {str(e)}")
+
+def create_conversation_store() -> ConversationStore:
+    """Create the storage backend selected by CONVERSATION_STORAGE_BACKEND"""
+    backend = config.CONVERSATION_STORAGE_BACKEND
+
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    if backend == "json":
+        return JsonConversationStore()
+    if backend == "resp":
+        return RespConversationStore()
+
+    raise ValueError(f"Unknown conversation storage backend: {backend}")
@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+import discord
+
+import config
+from splitter import MessageSplitter
+
+logger = logging.getLogger('gemini-discord-bot.streaming')
+
+class StreamingResponder:
+    """Posts a streamed response and edits it in place as text arrives.
+
+    The first message is sent as soon as the first chunk is received. Further
+    text is applied with throttled edits. A MessageSplitter decides where a
+    full message ends (at a paragraph, line or sentence boundary, with code
+    blocks closed and reopened), and the rest rolls over into a new message.
+    """
+
+    def __init__(self, destination: discord.abc.Messageable, max_length: int = None,
+                 edit_interval: float = None):
+        self.destination = destination
+        self.max_length = max_length or config.MAX_RESPONSE_LENGTH
+        self.edit_interval = config.STREAM_EDIT_INTERVAL if edit_interval is None else edit_interval
+
+        self.messages: List[discord.Message] = []
+        self._splitter = MessageSplitter(self.max_length)
+        self._message: Optional[discord.Message] = None
+        self._current = ""
+        self._sent = ""
+        self._last_edit = 0.0
+
+    async def consume(self, chunks: AsyncIterator[str]) -> str:
+        """Relay every chunk to Discord and return the full response text"""
+        parts = []
+
+        async for chunk in chunks:
+            parts.append(chunk)
+            await self._append(chunk)
+
+        for message in self._splitter.finish():
+            await self._complete(message)
+        return "".join(parts)
+
+    async def _append(self, text: str) -> None:
+        """Add text to the current message, rolling over when it is full"""
+        for message in self._splitter.feed(text):
+            await self._complete(message)
+
+        self._current = self._splitter.preview()
+
+        if self._message is None:
+            await self._flush()
+        elif time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._flush()
+
+    async def _complete(self, text: str) -> None:
+        """Give the current message its final text and start a new one"""
+        self._current = text
+        await self._flush()
+        self._message = None
+        self._current = ""
+        self._sent = ""
+
+    async def _flush(self) -> None:
+        """Send or edit the current message if it has unsent text"""
+        if not self._current.strip() or self._current == self._sent:
+            return
+
+        if self._message is None:
+            self._message = await self.destination.send(self._current)
+            self.messages.append(self._message)
+        else:
+            await self._message.edit(content=self._current)
+
+        self._sent = self._current
+        self._last_edit = time.monotonic()
+
+async def fence_code_stream(chunks: AsyncIterator[str], language: str) -> AsyncIterator[str]:
+    """Wrap a streamed response in a code block unless it already starts with one"""
+    fenced = False
+    first = True
+
+    async for chunk in chunks:
+        if first:
+            first = False
+            if not chunk.startswith("```"):
+                fenced = True
+                yield f"```{language}\n"
+
+        yield chunk
+
+    if fenced:
+        yield "\n```"
@@ -0,0 +1,187 @@
+import asyncio
+import codecs
+from typing import AsyncIterator, List, Tuple
+
+import config
+
+DIRECT_PROMPT = "Summarize the following text concisely. Include only key points and important information: {text}"
+
+MAP_PROMPT = (
+    "The text below is one part of a longer document. Summarize it concisely, "
+    "keeping key points, names, numbers, decisions and errors. Only output the summary.\n\n{text}"
+)
+
+REDUCE_PROMPT = (
+    "Below are summaries of consecutive parts of one document. Combine them into one "
+    "concise summary of the whole document. Include only key points and important "
+    "information.\n\n{summaries}"
+)
+
+# Preferred split points, best first
+BOUNDARIES = ("\n\n", "\n", ". ", "? ", "! ", " ")
+
+class ChunkSplitter:
+    """Splits streamed text into chunks of at most max_chars on semantic boundaries.
+
+    Paragraph breaks are preferred, then line breaks, sentence ends and
+    finally spaces. A boundary is only used if it falls in the second half
+    of a chunk, so chunks stay reasonably full.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _split_point(self) -> int:
+        window = self._buffer[:self.max_chars]
+
+        for boundary in BOUNDARIES:
+            index = window.rfind(boundary)
+            if index >= self.max_chars // 2:
+                return index + len(boundary)
+
+        return self.max_chars
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and get the chunks that are now complete"""
+        self._buffer += text
+        chunks = []
+
+        while len(self._buffer) > self.max_chars:
+            point = self._split_point()
+            chunk = self._buffer[:point].strip()
+            self._buffer = self._buffer[point:]
+            if chunk:
+                chunks.append(chunk)
+
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Get whatever text is left"""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        return [chunk] if chunk else []
+
+async def decode_text(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Decode a byte stream incrementally, so multi-byte characters may span chunks"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+class MapReduceSummarizer:
+    """Summarizes documents of any length with bounded parallelism.
+
+    The document is split into chunks as it streams in, each chunk is
+    summarized concurrently (at most `concurrency` calls at a time), and the
+    partial summaries are combined in a final reduce pass. Reading pauses
+    while the pool is full, so memory stays bounded by the concurrency
+    rather than the document size.
+    """
+
+    def __init__(self, gemini_client, chunk_chars: int = None, concurrency: int = None,
+                 model_name: str = None):
+        self.gemini_client = gemini_client
+        self.chunk_chars = chunk_chars or config.SUMMARY_CHUNK_CHARS
+        self.concurrency = concurrency or config.SUMMARY_MAP_CONCURRENCY
+        self.model_name = model_name or config.GEMINI_TEXT_MODEL
+
+    async def _call(self, prompt: str, max_output_tokens: int) -> str:
+        return await self.gemini_client.generate(
+            prompt,
+            model_name=self.model_name,
+            generation_config={
+                "temperature": 0.3,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": max_output_tokens,
+            },
+            cache=True
+        )
+
+    async def summarize(self, pieces: AsyncIterator[str]) -> Tuple[str, int]:
+        """Summarize streamed text. Returns the summary and the number of chunks"""
+        splitter = ChunkSplitter(self.chunk_chars)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: List[asyncio.Task] = []
+        first = None
+
+        async def map_chunk(chunk: str) -> str:
+            try:
+                return await self._call(MAP_PROMPT.format(text=chunk), config.SUMMARY_PART_MAX_TOKENS)
+            finally:
+                semaphore.release()
+
+        async def submit(chunk: str) -> None:
+            # Stop reading while every slot is busy
+            await semaphore.acquire()
+            tasks.append(asyncio.ensure_future(map_chunk(chunk)))
+
+        async def take(chunk: str) -> None:
+            nonlocal first
+            # Hold the first chunk back; a single-chunk text needs no map step
+            if first is None and not tasks:
+                first = chunk
+                return
+
+            if first is not None:
+                await submit(first)
+                first = None
+            await submit(chunk)
+
+        try:
+            async for piece in pieces:
+                for chunk in splitter.feed(piece):
+                    await take(chunk)
+
+            for chunk in splitter.flush():
+                await take(chunk)
+
+            if not tasks:
+                if first is None:
+                    raise ValueError("There is no text to summarize")
+                summary = await self._call(DIRECT_PROMPT.format(text=first), config.SUMMARY_MAX_TOKENS)
+                return summary, 1
+
+            partials = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return await self._reduce(list(partials)), len(partials)
+
+    async def _reduce(self, partials: List[str]) -> str:
+        """Combine partial summaries, in several rounds if they don't fit one request"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def combine(group: List[str], max_output_tokens: int) -> str:
+            summaries = "\n\n".join(f"Part {index}:\n{summary}" for index, summary in enumerate(group, start=1))
+            async with semaphore:
+                return await self._call(REDUCE_PROMPT.format(summaries=summaries), max_output_tokens)
+
+        while sum(len(summary) for summary in partials) > self.chunk_chars:
+            groups: List[List[str]] = [[]]
+            size = 0
+            for summary in partials:
+                if groups[-1] and size + len(summary) > self.chunk_chars:
+                    groups.append([])
+                    size = 0
+                groups[-1].append(summary)
+                size += len(summary)
+
+            if len(groups) == len(partials):
+                # Every summary is already too long to pair up; one final pass will do
+                break
+
+            partials = list(await asyncio.gather(
+                *(combine(group, config.SUMMARY_PART_MAX_TOKENS) for group in groups)
+            ))
+
+        return await combine(partials, config.SUMMARY_MAX_TOKENS)
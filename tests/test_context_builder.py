@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from context_builder import ContextBuilder
+from storage import SQLiteConversationStore
+from utils import ConversationManager
+
+class BlockingGemini:
+    """Gemini stub whose summaries wait until released"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def generate(self, prompt, **kwargs):
+        self.started.set()
+        await self.release.wait()
+        return "old summary"
+
+async def fold_across_reset(tmp_path, reset):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"), keep_messages=100)
+    manager = ConversationManager(store=store, max_history=2)
+    gemini = BlockingGemini()
+    builder = ContextBuilder(manager, gemini)
+
+    user_id = 1
+    for turn in range(2):
+        await manager.add_message(user_id, "user", f"question {turn}")
+        await manager.add_message(user_id, "model", f"answer {turn}")
+
+    builder.maintain(user_id)
+    await gemini.started.wait()
+
+    await reset(manager, user_id)
+    gemini.release.set()
+    await asyncio.gather(*builder._tasks)
+
+    await manager.add_message(user_id, "user", "new question")
+    await manager.add_message(user_id, "model", "new answer")
+
+    try:
+        await manager.get_conversation(user_id)
+        return manager.get_summary(user_id), await store.load_summary(user_id)
+    finally:
+        await manager.close()
+
+@pytest.mark.parametrize("reset", [
+    lambda manager, user_id: manager.reset_conversation(user_id),
+    lambda manager, user_id: manager.reset_all(),
+], ids=["reset", "reset_all"])
+def test_reset_during_fold_discards_the_summary(tmp_path, reset):
+    summary, stored = asyncio.run(fold_across_reset(tmp_path, reset))
+
+    assert summary is None
+    assert stored is None
+
+def test_fold_without_reset_keeps_the_summary(tmp_path):
+    async def no_reset(manager, user_id):
+        pass
+
+    summary, stored = asyncio.run(fold_across_reset(tmp_path, no_reset))
+
+    assert summary == "old summary"
+    assert stored == "old summary"
@@ -0,0 +1,63 @@
+import asyncio
+
+from interactions import InteractionQueue
+
+class FakeCommand:
+    """Just enough of a discord.py Command for invoke_parsed"""
+
+    def __init__(self, name, callback):
+        self.name = name
+        self.cog = None
+        self.callback = callback
+
+    async def call_before_hooks(self, ctx):
+        pass
+
+    async def call_after_hooks(self, ctx):
+        pass
+
+class FakeContext:
+    pass
+
+def test_cancelled_job_does_not_stop_the_worker():
+    ran = []
+
+    async def cancelled(ctx):
+        raise asyncio.CancelledError()
+
+    async def works(ctx):
+        ran.append(ctx)
+
+    async def main():
+        queue = InteractionQueue(workers=1, max_size=10)
+        queue.start()
+        try:
+            assert queue.submit(FakeContext(), FakeCommand("cancelled", cancelled))
+            ctx = FakeContext()
+            assert queue.submit(ctx, FakeCommand("works", works))
+            await asyncio.wait_for(queue._queue.join(), 1)
+
+            assert ran == [ctx]
+            assert not queue._tasks[0].done()
+        finally:
+            await queue.close()
+
+    asyncio.run(main())
+
+def test_close_stops_a_worker_running_a_job():
+    async def main():
+        running = asyncio.Event()
+
+        async def slow(ctx):
+            running.set()
+            await asyncio.sleep(10)
+
+        queue = InteractionQueue(workers=1, max_size=10)
+        queue.start()
+        queue.submit(FakeContext(), FakeCommand("slow", slow))
+        await running.wait()
+        await asyncio.wait_for(queue.close(), 1)
+
+        assert queue._tasks == []
+
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+import config
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_config(**env):
+    """Get the state and conversation backends config.py picks for an environment"""
+    environ = {key: value for key, value in os.environ.items()
+               if key not in ("SHARD_COUNT", "STATE_BACKEND", "CONVERSATION_STORAGE_BACKEND")}
+    environ.update(env)
+    output = subprocess.run(
+        [sys.executable, "-c", "import config; print(config.STATE_BACKEND, config.CONVERSATION_STORAGE_BACKEND)"],
+        cwd=ROOT, env=environ, capture_output=True, text=True, check=True
+    ).stdout
+    return tuple(output.split())
+
+def test_sharding_shares_state_and_conversations():
+    assert load_config(SHARD_COUNT="4") == ("resp", "resp")
+
+def test_unsharded_defaults_are_local():
+    assert load_config() == ("memory", "sqlite")
+
+def test_explicit_conversation_backend_wins():
+    assert load_config(SHARD_COUNT="4", CONVERSATION_STORAGE_BACKEND="sqlite") == ("resp", "sqlite")
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    # main.py logs to bot.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    import main
+    return main
+
+def test_worker_env_exports_both_backends(main_module, monkeypatch):
+    monkeypatch.setattr(config, "SHARD_COUNT", 4)
+    monkeypatch.setattr(config, "SHARD_PROCESSES", 2)
+    monkeypatch.setattr(config, "STATE_BACKEND", "resp")
+    monkeypatch.setattr(config, "CONVERSATION_STORAGE_BACKEND", "resp")
+    monkeypatch.setattr(config, "TRAFFIC_CAPTURE_PATH", None)
+
+    env = main_module.Supervisor()._worker_env(1)
+
+    assert env["SHARD_IDS"] == "2,3"
+    assert env["STATE_BACKEND"] == "resp"
+    assert env["CONVERSATION_STORAGE_BACKEND"] == "resp"
@@ -0,0 +1,145 @@
+import contextvars
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger('gemini-discord-bot.traffic')
+
+CAPTURE_VERSION = 1
+
+# The capture event of the running command, so Gemini calls can be attributed to it
+_current_event: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "traffic_event", default=None
+)
+
+def record_model_call(latency: float, response_chars: int = 0) -> None:
+    """Add one Gemini call to the capture event of the running command, if any"""
+    event = _current_event.get()
+    if event is not None:
+        event["model_calls"] += 1
+        event["model_latency"] = round(event["model_latency"] + latency, 4)
+        event["response_chars"] += response_chars
+
+def describe_argument(value) -> Any:
+    """Reduce an argument to what replay needs: numbers as-is, text as [length, comma count]"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return [len(text), text.count(",")]
+
+class TrafficRecorder:
+    """Writes anonymized command events to a line-delimited JSON file.
+
+    No message text is stored: user and server IDs are replaced by keyed
+    hashes (the key is random per capture), arguments by their length and
+    attachments by their extension and size. Each line is one command with
+    its timing, outcome and Gemini latency, which is what
+    `benchmarks/replay.py` needs to play the traffic back.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._salt = secrets.token_bytes(16)
+        self._started = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Block-buffered: a capture line costs no syscall on the event loop
+        self._file = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._write({"type": "header", "version": CAPTURE_VERSION, "started": round(time.time(), 3)})
+        logger.info(f"Capturing command traffic to {path}")
+
+    def _anonymize(self, value: Optional[int]) -> Optional[str]:
+        if value is None:
+            return None
+        return hmac.new(self._salt, str(value).encode(), hashlib.sha256).hexdigest()[:12]
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    @staticmethod
+    def _arguments(ctx) -> Dict[str, Any]:
+        """Describe the parsed command arguments by parameter name"""
+        params = list(ctx.command.clean_params.values())
+        positional = [param for param in params if param.kind != inspect.Parameter.KEYWORD_ONLY]
+        args = list(getattr(ctx, "args", []))
+        values = dict(zip((param.name for param in positional), args[len(args) - len(positional):]))
+        values.update(getattr(ctx, "kwargs", {}))
+        return {name: describe_argument(value) for name, value in values.items()}
+
+    def start(self, ctx) -> None:
+        """Open the event of a command that is about to run"""
+        event = {
+            "type": "command",
+            "t": round(time.monotonic() - self._started, 3),
+            "command": ctx.command.qualified_name,
+            "user": self._anonymize(ctx.author.id),
+            "guild": self._anonymize(ctx.guild.id if ctx.guild else None),
+            "args": self._arguments(ctx),
+            "attachments": [
+                [os.path.splitext(attachment.filename)[1].lower(), attachment.size]
+                for attachment in ctx.message.attachments
+            ],
+            "model_calls": 0,
+            "model_latency": 0.0,
+            "response_chars": 0,
+            "messages": 0,
+        }
+        ctx.traffic_event = event
+        ctx.traffic_started = time.monotonic()
+        _current_event.set(event)
+
+        send = ctx.send
+
+        async def counted_send(*args, **kwargs):
+            event["messages"] += 1
+            return await send(*args, **kwargs)
+
+        ctx.send = counted_send
+
+    def finish(self, ctx) -> None:
+        """Write the event of a finished command"""
+        event = getattr(ctx, "traffic_event", None)
+        if event is None:
+            return
+
+        event["duration"] = round(time.monotonic() - ctx.traffic_started, 4)
+        event["outcome"] = getattr(ctx, "command_outcome", "ok")
+        _current_event.set(None)
+
+        try:
+            self._write(event)
+        except OSError as e:
+            logger.error(f"Error writing traffic capture: {str(e)}")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the command events of a capture file in order.
+
+    A file appended to by several runs is read as one timeline.
+    """
+    offset = 0.0
+    last = 0.0
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            record = json.loads(line)
+            if record.get("type") == "header":
+                offset = last
+            elif record.get("type") == "command":
+                record["t"] += offset
+                last = record["t"]
+                yield record
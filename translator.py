@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List
+
+import config
+from cache import ResponseCache
+
+logger = logging.getLogger('gemini-discord-bot.translator')
+
+TRANSLATE_PROMPT = "Translate the following text to {language}. Only output the translation without any explanation: {text}"
+
+MULTI_TRANSLATE_PROMPT = (
+    "Translate the text below into each of these languages: {languages}. "
+    "Respond with a JSON object whose keys are exactly {keys} and whose values are "
+    "the translations. Only translate; do not add explanations.\n\nText: {text}"
+)
+
+class Translator:
+    """Translates a text into one or more languages.
+
+    Several missing languages are requested together in one JSON-mode call;
+    if that call fails or returns unusable JSON, each language is requested
+    separately in parallel. Every language is cached under the same key as a
+    single-language translation, so both forms share cache entries.
+    """
+
+    def __init__(self, gemini_client, model_name: str = None):
+        self.gemini_client = gemini_client
+        self.model_name = model_name or config.GEMINI_TEXT_MODEL
+
+    @staticmethod
+    def parse_targets(value: str) -> List[str]:
+        """Split a comma-separated language list, dropping blanks and duplicates"""
+        targets = []
+        seen = set()
+
+        for language in value.split(","):
+            language = language.strip()
+            if language and language.lower() not in seen:
+                seen.add(language.lower())
+                targets.append(language)
+
+        return targets
+
+    @staticmethod
+    def _generation_config(max_output_tokens: int = None) -> Dict[str, Any]:
+        return {
+            "temperature": 0.2,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": max_output_tokens or config.MAX_OUTPUT_TOKENS,
+        }
+
+    def _cache_key(self, text: str, language: str) -> str:
+        return ResponseCache.make_key(
+            self.model_name,
+            TRANSLATE_PROMPT.format(language=language, text=text),
+            self._generation_config()
+        )
+
+    async def translate(self, text: str, languages: List[str]) -> Dict[str, str]:
+        """Get the translation of text into each language, in the given order"""
+        cache = self.gemini_client.cache
+        results: Dict[str, str] = {}
+        missing = []
+
+        for language in languages:
+            cached = await cache.get(self._cache_key(text, language)) if cache is not None else None
+            if cached is not None:
+                results[language] = cached
+            else:
+                missing.append(language)
+
+        if len(missing) > 1:
+            try:
+                results.update(await self._translate_together(text, missing))
+                missing = []
+            except Exception as e:
+                logger.warning(f"Combined translation failed, translating separately: {str(e)}")
+
+        if missing:
+            translations = await asyncio.gather(*(
+                self.gemini_client.generate(
+                    TRANSLATE_PROMPT.format(language=language, text=text),
+                    model_name=self.model_name,
+                    generation_config=self._generation_config(),
+                    cache=True
+                )
+                for language in missing
+            ))
+            results.update(zip(missing, translations))
+
+        return {language: results[language] for language in languages}
+
+    async def _translate_together(self, text: str, languages: List[str]) -> Dict[str, str]:
+        """Translate into several languages with one JSON-mode call"""
+        generation_config = self._generation_config(
+            min(config.MAX_OUTPUT_TOKENS * len(languages), config.TRANSLATE_MAX_OUTPUT_TOKENS)
+        )
+        generation_config["response_mime_type"] = "application/json"
+
+        response_text = await self.gemini_client.generate(
+            MULTI_TRANSLATE_PROMPT.format(
+                languages=", ".join(languages),
+                keys=json.dumps(languages, ensure_ascii=False),
+                text=text
+            ),
+            model_name=self.model_name,
+            generation_config=generation_config
+        )
+
+        data = json.loads(response_text)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+
+        translations = {}
+        for language in languages:
+            translation = data.get(language)
+            if not isinstance(translation, str) or not translation.strip():
+                raise ValueError(f"No translation for {language}")
+            translations[language] = translation.strip()
+
+        cache = self.gemini_client.cache
+        if cache is not None:
+            for language, translation in translations.items():
+                await cache.set(self._cache_key(text, language), translation)
+
+        return translations
@@ -1,73 +1,195 @@
 import discord
-import json
-import os
 import time
 import asyncio
-from typing import Dict, List, Optional, Set
+import heapq
+from collections import OrderedDict, deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Set, Tuple
 import logging
 import config
+from storage import ConversationStore, create_conversation_store
+from resp_store import STORE_ERRORS, RespClient, get_client
+from splitter import split_message
+from resilience import (
+    CircuitOpenError, classify_error, ERROR_AUTH, ERROR_INVALID, ERROR_QUOTA,
+    ERROR_TIMEOUT, ERROR_TRANSIENT, ERROR_UNAVAILABLE
+)
+from metrics import CACHE_LOOKUPS, record_command_error, record_command_rejection
 
 logger = logging.getLogger('gemini-discord-bot.utils')
 
 class CooldownManager:
-    """Manages command cooldowns for users"""
+    """Manages command cooldowns for users.
 
-    def __init__(self):
-        self.cooldowns: Dict[str, Dict[int, float]] = {}
+    Cooldowns are stored per user as command -> monotonic deadline, so a
+    user's whole status is one dict lookup. A min-heap of deadlines expires
+    stale entries, and the number of tracked users is capped at max_users.
+    State is local to this process; see SharedCooldownManager for sharded
+    deployments (the methods are coroutines so the two are interchangeable).
+    """
 
-    def is_on_cooldown(self, command: str, user_id: int, cooldown_time: float) -> bool:
-        """Check if user is on cooldown for a command"""
-        current_time = time.time()
-
-        if command not in self.cooldowns:
-            self.cooldowns[command] = {}
-
-        if user_id not in self.cooldowns[command]:
-            return False
-
-        last_used = self.cooldowns[command][user_id]
-        return (current_time - last_used) < cooldown_time
+    def __init__(self, max_users: int = None):
+        self.max_users = max_users or config.COOLDOWN_MAX_USERS
+        self.cooldowns: Dict[int, Dict[str, float]] = {}
+        self._expiry: List[Tuple[float, int, str]] = []
 
-    def get_remaining_cooldown(self, command: str, user_id: int, cooldown_time: float) -> float:
+    async def get_remaining_cooldown(self, command: str, user_id: int) -> float:
         """Get remaining cooldown time in seconds"""
-        if not self.is_on_cooldown(command, user_id, cooldown_time):
+        deadline = self.cooldowns.get(user_id, {}).get(command)
+        if deadline is None:
             return 0.0
 
-        current_time = time.time()
-        last_used = self.cooldowns[command][user_id]
-        return cooldown_time - (current_time - last_used)
+        return max(0.0, deadline - time.monotonic())
 
-    def set_cooldown(self, command: str, user_id: int):
+    async def is_on_cooldown(self, command: str, user_id: int) -> bool:
+        """Check if user is on cooldown for a command"""
+        return await self.get_remaining_cooldown(command, user_id) > 0
+
+    async def get_user_cooldowns(self, user_id: int) -> Dict[str, float]:
+        """Get remaining seconds for every command the user is cooling down on"""
+        now = time.monotonic()
+        return {
+            command: deadline - now
+            for command, deadline in self.cooldowns.get(user_id, {}).items()
+            if deadline > now
+        }
+
+    async def set_cooldown(self, command: str, user_id: int, cooldown_time: float):
         """Set cooldown for user and command"""
-        current_time = time.time()
+        deadline = time.monotonic() + cooldown_time
 
-        if command not in self.cooldowns:
-            self.cooldowns[command] = {}
+        self.cooldowns.setdefault(user_id, {})[command] = deadline
+        heapq.heappush(self._expiry, (deadline, user_id, command))
 
-        self.cooldowns[command][user_id] = current_time
+        if len(self.cooldowns) > self.max_users:
+            self._expire(force=True)
+        elif len(self._expiry) > 2 * self.max_users:
+            self._compact()
 
-    def clear_cooldown(self, command: str, user_id: int):
+    async def clear_cooldown(self, command: str, user_id: int):
         """Clear cooldown for user and command"""
-        if command in self.cooldowns and user_id in self.cooldowns[command]:
-            del self.cooldowns[command][user_id]
+        commands = self.cooldowns.get(user_id)
+        if commands is not None and command in commands:
+            del commands[command]
+            if not commands:
+                del self.cooldowns[user_id]
+
+    def sweep(self) -> int:
+        """Remove expired cooldowns, returning how many were removed"""
+        return self._expire()
+
+    def _expire(self, force: bool = False) -> int:
+        """Pop expired deadlines; with force, also the earliest live ones until under max_users"""
+        now = time.monotonic()
+        removed = 0
+
+        while self._expiry:
+            deadline, user_id, command = self._expiry[0]
+            if deadline > now and not (force and len(self.cooldowns) > self.max_users):
+                break
+
+            heapq.heappop(self._expiry)
+
+            commands = self.cooldowns.get(user_id)
+            # Skip heap entries superseded by a later set_cooldown
+            if commands is None or commands.get(command) != deadline:
+                continue
+
+            del commands[command]
+            if not commands:
+                del self.cooldowns[user_id]
+            removed += 1
+
+        return removed
+
+    def _compact(self) -> None:
+        """Rebuild the heap without superseded entries"""
+        self._expiry = [
+            (deadline, user_id, command)
+            for user_id, commands in self.cooldowns.items()
+            for command, deadline in commands.items()
+        ]
+        heapq.heapify(self._expiry)
 
 class PermissionManager:
-    """Manages user permissions and roles"""
-
-    @staticmethod
-    def is_admin(member: discord.Member) -> bool:
-        """Check if member has admin permissions"""
-        if member.guild_permissions.administrator:
+    """Manages user permissions and roles.
+
+    The IDs of each guild's admin roles are resolved from ADMIN_ROLE_NAMES
+    once, and each member's verdict is cached, so repeated checks are a
+    dict hit. bot.py drops the cached entries on role, member and guild
+    events. Verdicts are only cached with the members intent, which is
+    what delivers member updates.
+    """
+
+    _admin_roles: Dict[int, FrozenSet[int]] = {}
+    # guild ID -> member ID -> verdict; least recently used guilds first
+    _verdicts: "OrderedDict[int, Dict[int, bool]]" = OrderedDict()
+    _verdict_count = 0
+
+    @classmethod
+    def admin_role_ids(cls, guild: discord.Guild) -> FrozenSet[int]:
+        """Get the IDs of the guild's roles named in ADMIN_ROLE_NAMES"""
+        role_ids = cls._admin_roles.get(guild.id)
+        if role_ids is None:
+            names = set(config.ADMIN_ROLE_NAMES)
+            role_ids = frozenset(role.id for role in guild.roles if role.name in names)
+            cls._admin_roles[guild.id] = role_ids
+        return role_ids
+
+    @classmethod
+    def _check_admin(cls, member: discord.Member) -> bool:
+        if member.id in config.ADMIN_USER_IDS:
             return True
 
-        if member.id in config.ADMIN_USER_IDS:
+        if member.guild_permissions.administrator:
             return True
 
-        for role in member.roles:
-            if role.name in config.ADMIN_ROLE_NAMES:
-                return True
+        return any(member.get_role(role_id) is not None for role_id in cls.admin_role_ids(member.guild))
 
-        return False
+    @classmethod
+    def is_admin(cls, member: discord.Member) -> bool:
+        """Check if member has admin permissions"""
+        guild = getattr(member, "guild", None)
+        if guild is None:
+            # Direct messages: there are no roles to check
+            return member.id in config.ADMIN_USER_IDS
+
+        if not config.ENABLE_PRIVILEGED_INTENTS:
+            return cls._check_admin(member)
+
+        members = cls._verdicts.get(guild.id)
+        if members is not None and member.id in members:
+            cls._verdicts.move_to_end(guild.id)
+            CACHE_LOOKUPS.inc(cache="permission", result="hit")
+            return members[member.id]
+
+        CACHE_LOOKUPS.inc(cache="permission", result="miss")
+        verdict = cls._check_admin(member)
+
+        if members is None:
+            members = cls._verdicts[guild.id] = {}
+        members[member.id] = verdict
+        cls._verdict_count += 1
+
+        while cls._verdict_count > config.PERMISSION_CACHE_MAX_MEMBERS and len(cls._verdicts) > 1:
+            _, evicted = cls._verdicts.popitem(last=False)
+            cls._verdict_count -= len(evicted)
+
+        return verdict
+
+    @classmethod
+    def invalidate_guild(cls, guild_id: int) -> None:
+        """Forget a guild's admin roles and member verdicts (roles or ownership changed)"""
+        cls._admin_roles.pop(guild_id, None)
+        members = cls._verdicts.pop(guild_id, None)
+        if members is not None:
+            cls._verdict_count -= len(members)
+
+    @classmethod
+    def invalidate_member(cls, guild_id: int, member_id: int) -> None:
+        """Forget one member's verdict (their roles changed)"""
+        members = cls._verdicts.get(guild_id)
+        if members is not None and members.pop(member_id, None) is not None:
+            cls._verdict_count -= 1
 
     @staticmethod
     def can_use_command(member: discord.Member, command_name: str) -> bool:
@@ -81,34 +203,239 @@ class PermissionManager:
         return True
 
 class RateLimiter:
-    """Rate limiting for API calls and commands"""
+    """Sliding-window rate limiting for API calls and commands.
 
-    def __init__(self):
-        self.user_requests: Dict[int, List[float]] = {}
+    Each user keeps a deque of at most max_requests timestamps, so checking
+    and recording a request is amortized O(1). Idle users are dropped by
+    sweep().
+    """
 
-    def is_rate_limited(self, user_id: int) -> bool:
-        """Check if user is rate limited"""
-        current_time = time.time()
+    def __init__(self, max_requests: int = None, window: float = 60.0):
+        self.max_requests = max_requests or config.MAX_REQUESTS_PER_MINUTE
+        self.window = window
+        self.user_requests: Dict[int, Deque[float]] = {}
 
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
+    def _get_window(self, user_id: int, now: float) -> Deque[float]:
+        """Get the user's request timestamps with expired ones removed"""
+        requests = self.user_requests.get(user_id)
 
-        # Remove old requests (older than 1 minute)
-        self.user_requests[user_id] = [
-            req_time for req_time in self.user_requests[user_id]
-            if current_time - req_time < 60
-        ]
+        if requests is None:
+            requests = deque(maxlen=self.max_requests)
+            self.user_requests[user_id] = requests
+
+        cutoff = now - self.window
+        while requests and requests[0] <= cutoff:
+            requests.popleft()
+
+        return requests
+
+    async def acquire(self, user_id: int) -> bool:
+        """Check the limit and record the request in one step.
+
+        Returns False (and records nothing) if the user is rate limited.
+        """
+        now = time.monotonic()
+        requests = self._get_window(user_id, now)
 
-        return len(self.user_requests[user_id]) >= config.MAX_REQUESTS_PER_MINUTE
+        if len(requests) >= self.max_requests:
+            return False
+
+        requests.append(now)
+        return True
 
-    def add_request(self, user_id: int):
+    async def is_rate_limited(self, user_id: int) -> bool:
+        """Check if user is rate limited"""
+        return len(self._get_window(user_id, time.monotonic())) >= self.max_requests
+
+    async def add_request(self, user_id: int):
         """Add a request for user"""
-        current_time = time.time()
+        now = time.monotonic()
+        self._get_window(user_id, now).append(now)
+
+    def sweep(self) -> int:
+        """Forget users with no requests in the current window, returning how many"""
+        cutoff = time.monotonic() - self.window
+        idle = [
+            user_id for user_id, requests in self.user_requests.items()
+            if not requests or requests[-1] <= cutoff
+        ]
+
+        for user_id in idle:
+            del self.user_requests[user_id]
+
+        return len(idle)
+
+class SharedCooldownManager:
+    """Cooldowns kept in the shared state store, visible to every shard.
+
+    Each user is one hash of command -> wall-clock deadline (ms) that
+    expires on its own once the longest cooldown has passed, so nothing
+    needs sweeping. If the store is unreachable, commands are not held
+    back by cooldowns.
+    """
+
+    def __init__(self, client: RespClient = None):
+        self.client = client or get_client()
+        self.ttl = max(
+            config.COOLDOWN_GEMINI, config.COOLDOWN_VISION, config.COOLDOWN_TRANSLATE,
+            config.COOLDOWN_SUMMARIZE, config.COOLDOWN_CODE, config.COOLDOWN_IMAGINE,
+            config.COOLDOWN_RESET, config.COOLDOWN_TEMPERATURE
+        )
 
-        if user_id not in self.user_requests:
-            self.user_requests[user_id] = []
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"cooldown:{user_id}"
 
-        self.user_requests[user_id].append(current_time)
+    async def get_remaining_cooldown(self, command: str, user_id: int) -> float:
+        """Get remaining cooldown time in seconds"""
+        try:
+            deadline = await self.client.execute("HGET", self._key(user_id), command)
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, skipping cooldown check: {str(e)}")
+            return 0.0
+
+        if deadline is None:
+            return 0.0
+        return max(0.0, int(deadline) / 1000 - time.time())
+
+    async def is_on_cooldown(self, command: str, user_id: int) -> bool:
+        """Check if user is on cooldown for a command"""
+        return await self.get_remaining_cooldown(command, user_id) > 0
+
+    async def get_user_cooldowns(self, user_id: int) -> Dict[str, float]:
+        """Get remaining seconds for every command the user is cooling down on"""
+        try:
+            fields = await self.client.execute("HGETALL", self._key(user_id))
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, cannot list cooldowns: {str(e)}")
+            return {}
+
+        now = time.time()
+        remaining = {
+            command.decode(): int(deadline) / 1000 - now
+            for command, deadline in zip(fields[::2], fields[1::2])
+        }
+        return {command: seconds for command, seconds in remaining.items() if seconds > 0}
+
+    async def set_cooldown(self, command: str, user_id: int, cooldown_time: float):
+        """Set cooldown for user and command"""
+        key = self._key(user_id)
+        deadline = int((time.time() + cooldown_time) * 1000)
+        try:
+            await self.client.pipeline(
+                ("HSET", key, command, deadline),
+                ("PEXPIRE", key, int(max(cooldown_time, self.ttl) * 1000))
+            )
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, cooldown not set: {str(e)}")
+
+    async def clear_cooldown(self, command: str, user_id: int):
+        """Clear cooldown for user and command"""
+        try:
+            await self.client.execute("HDEL", self._key(user_id), command)
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, cooldown not cleared: {str(e)}")
+
+    def sweep(self) -> int:
+        """Expired cooldowns are dropped by the store itself"""
+        return 0
+
+class SharedRateLimiter:
+    """Sliding-window rate limiting in the shared state store.
+
+    Each user's requests are a sorted set scored by time; one MULTI block
+    trims the window, records the request and counts it, so workers never
+    race each other. A request over the limit is removed again. If the
+    store is unreachable, requests are let through.
+    """
+
+    def __init__(self, max_requests: int = None, window: float = 60.0, client: RespClient = None):
+        self.max_requests = max_requests or config.MAX_REQUESTS_PER_MINUTE
+        self.window = window
+        self.client = client or get_client()
+        self._serial = 0
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"ratelimit:{user_id}"
+
+    def _member(self, now_ms: int) -> str:
+        # Unique per request, even for several in the same millisecond
+        self._serial += 1
+        return f"{now_ms}:{id(self)}:{self._serial}"
+
+    async def acquire(self, user_id: int) -> bool:
+        """Check the limit and record the request in one step.
+
+        Returns False (and records nothing) if the user is rate limited.
+        """
+        key = self._key(user_id)
+        now_ms = int(time.time() * 1000)
+        member = self._member(now_ms)
+
+        try:
+            _, _, count, _ = await self.client.transaction(
+                ("ZREMRANGEBYSCORE", key, "-inf", now_ms - int(self.window * 1000)),
+                ("ZADD", key, now_ms, member),
+                ("ZCARD", key),
+                ("PEXPIRE", key, int(self.window * 1000))
+            )
+            if count <= self.max_requests:
+                return True
+
+            await self.client.execute("ZREM", key, member)
+            return False
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, skipping rate limit: {str(e)}")
+            return True
+
+    async def is_rate_limited(self, user_id: int) -> bool:
+        """Check if user is rate limited"""
+        key = self._key(user_id)
+        now_ms = int(time.time() * 1000)
+        try:
+            _, count = await self.client.transaction(
+                ("ZREMRANGEBYSCORE", key, "-inf", now_ms - int(self.window * 1000)),
+                ("ZCARD", key)
+            )
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, skipping rate limit: {str(e)}")
+            return False
+        return count >= self.max_requests
+
+    async def add_request(self, user_id: int):
+        """Add a request for user"""
+        key = self._key(user_id)
+        now_ms = int(time.time() * 1000)
+        try:
+            await self.client.pipeline(
+                ("ZADD", key, now_ms, self._member(now_ms)),
+                ("PEXPIRE", key, int(self.window * 1000))
+            )
+        except STORE_ERRORS as e:
+            logger.warning(f"State store unavailable, request not recorded: {str(e)}")
+
+    def sweep(self) -> int:
+        """Idle users' windows expire in the store itself"""
+        return 0
+
+def create_cooldown_manager():
+    """Create the cooldown manager selected by STATE_BACKEND"""
+    if config.STATE_BACKEND == "memory":
+        return CooldownManager()
+    if config.STATE_BACKEND == "resp":
+        return SharedCooldownManager()
+
+    raise ValueError(f"Unknown state backend: {config.STATE_BACKEND}")
+
+def create_rate_limiter(max_requests: int = None):
+    """Create the rate limiter selected by STATE_BACKEND"""
+    if config.STATE_BACKEND == "memory":
+        return RateLimiter(max_requests)
+    if config.STATE_BACKEND == "resp":
+        return SharedRateLimiter(max_requests)
+
+    raise ValueError(f"Unknown state backend: {config.STATE_BACKEND}")
 
 class InputValidator:
     """Validates user inputs"""
@@ -149,24 +476,34 @@ class ErrorHandler:
     @staticmethod
     async def handle_api_error(ctx, error: Exception, api_name: str = "API"):
         """Handle API errors with user-friendly messages"""
-        error_msg = str(error).lower()
+        error_class = classify_error(error)
+        record_command_error(ctx, error)
 
-        if "quota" in error_msg or "limit" in error_msg:
+        if error_class == ERROR_QUOTA:
             await ctx.send(f"❌ {api_name} quota exceeded. Please try again later.")
-        elif "invalid" in error_msg or "unauthorized" in error_msg:
+        elif error_class == ERROR_AUTH:
             await ctx.send(f"❌ {api_name} authentication error. Please check configuration.")
-        elif "timeout" in error_msg:
+        elif error_class == ERROR_TIMEOUT:
             await ctx.send(f"❌ {api_name} request timed out. Please try again.")
-        elif "network" in error_msg or "connection" in error_msg:
-            await ctx.send(f"❌ Network error. Please check your connection and try again.")
+        elif error_class == ERROR_UNAVAILABLE:
+            await ctx.send(f"❌ Gemini is temporarily unavailable. Please try again in {error.retry_after:.0f}s.")
+        elif error_class == ERROR_TRANSIENT:
+            await ctx.send(f"❌ Gemini is having trouble right now. Please try again shortly.")
+        elif error_class == ERROR_INVALID:
+            await ctx.send(f"❌ Gemini couldn't answer this request. Try rephrasing it.")
         else:
             await ctx.send(f"❌ An unexpected error occurred. Please try again later.")
 
-        logger.error(f"{api_name} error for user {ctx.author.id}: {str(error)}")
+        if isinstance(error, CircuitOpenError):
+            # Expected while a model is down; the breaker already logged the failures
+            logger.info(f"{api_name} call for user {ctx.author.id} shed: {str(error)}")
+        else:
+            logger.error(f"{api_name} error for user {ctx.author.id} ({error_class}): {str(error)}")
 
     @staticmethod
     async def handle_cooldown_error(ctx, remaining_time: float):
         """Handle cooldown errors"""
+        record_command_rejection(ctx, "cooldown")
         minutes = int(remaining_time // 60)
         seconds = int(remaining_time % 60)
 
@@ -180,77 +517,219 @@ class ErrorHandler:
     @staticmethod
     async def handle_permission_error(ctx, command_name: str):
         """Handle permission errors"""
+        record_command_rejection(ctx, "permission")
         await ctx.send(f"❌ You don't have permission to use the `{command_name}` command.")
 
     @staticmethod
     async def handle_rate_limit_error(ctx):
         """Handle rate limit errors"""
+        record_command_rejection(ctx, "rate_limit")
         await ctx.send(f"❌ You're sending commands too quickly. Please slow down and try again in a minute.")
 
 class ConversationManager:
-    """Manages conversation history for each user"""
+    """Manages conversation history for each user.
 
-    def __init__(self, storage_path: str = "conversations", max_history: int = 10):
-        self.storage_path = storage_path
-        self.max_history = max_history
-        self.conversations: Dict[int, List[Dict[str, str]]] = {}
-
-        os.makedirs(self.storage_path, exist_ok=True)
-        self._load_conversations()
-
-    def _get_user_file_path(self, user_id: int) -> str:
-        """Get file path for user ID"""
-        return os.path.join(self.storage_path, f"{user_id}.json")
-
-    def _load_conversations(self) -> None:
-        """Load all saved conversations"""
-        try:
-            for filename in os.listdir(self.storage_path):
-                if filename.endswith(".json"):
-                    user_id = int(filename.split(".")[0])
-                    file_path = os.path.join(self.storage_path, filename)
-
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            self.conversations[user_id] = json.load(f)
-                    except Exception as e:
-                        logger.error(f"Error loading conversation for user {user_id}: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error loading conversations: {str(e)}")
-
-    def _save_conversation(self, user_id: int) -> None:
-        """Save user conversation"""
-        try:
-            file_path = self._get_user_file_path(user_id)
+    Histories are loaded lazily from the storage backend and every new
+    message is appended to it. Resident histories share a global memory
+    budget; when it is exceeded the least recently used users are evicted
+    and transparently reloaded from storage on their next message. Older
+    turns can be folded into a per-user rolling summary.
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.conversations[user_id], f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving conversation for user {user_id}: {str(e)}")
+    With a shared store other processes write the same histories, so a
+    resident copy is only reused while its version matches the store's.
+    """
 
-    def get_conversation(self, user_id: int) -> List[Dict[str, str]]:
-        """Get user conversation history"""
-        if user_id not in self.conversations:
-            self.conversations[user_id] = []
-
-        return self.conversations[user_id]
+    def __init__(self, store: ConversationStore = None, max_history: int = 10,
+                 max_resident_messages: int = None, max_resident_bytes: int = None):
+        self.store = store or create_conversation_store()
+        self.max_history = max_history
+        self.max_resident_messages = max_resident_messages or config.CONVERSATION_MEMORY_BUDGET_MESSAGES
+        self.max_resident_bytes = max_resident_bytes or config.CONVERSATION_MEMORY_BUDGET_BYTES
+
+        # Least recently used first
+        self.conversations: "OrderedDict[int, List[Dict[str, str]]]" = OrderedDict()
+        self.summaries: Dict[int, str] = {}
+        self._sizes: Dict[int, int] = {}
+        self._versions: Dict[int, Optional[int]] = {}
+        # Bumped by resets, so a fold that started before one is discarded
+        self._resets: Dict[int, int] = {}
+        self._reset_all_count = 0
+        self.resident_messages = 0
+        self.resident_bytes = 0
+        self.evictions = 0
 
-    def add_message(self, user_id: int, role: str, content: str) -> None:
+    @staticmethod
+    def _message_size(message: Dict[str, str]) -> int:
+        return sum(len(str(part).encode('utf-8')) for part in message["parts"])
+
+    async def get_conversation(self, user_id: int) -> List[Dict[str, str]]:
+        """Get user conversation history (read-only; use add_message to change it)"""
+        if user_id in self.conversations:
+            if not self.store.shared:
+                self.conversations.move_to_end(user_id)
+                return self.conversations[user_id]
+
+            version = await self.store.version(user_id)
+            resident = self._versions.get(user_id)
+            if user_id in self.conversations and resident is not None and version == resident:
+                self.conversations.move_to_end(user_id)
+                return self.conversations[user_id]
+            # Another worker changed the history
+            self._unload(user_id)
+
+        # Read the version first: a write in between only makes the copy look stale
+        version = await self.store.version(user_id)
+        messages = await self.store.load(user_id, self.max_history * 2)
+        summary = await self.store.load_summary(user_id)
+
+        # Another task may have loaded the user while we waited
+        if user_id in self.conversations:
+            return self.conversations[user_id]
+
+        self.conversations[user_id] = messages
+        self._versions[user_id] = version
+        if summary:
+            self.summaries[user_id] = summary
+        self._sizes[user_id] = sum(self._message_size(message) for message in messages)
+        self.resident_messages += len(messages)
+        self.resident_bytes += self._sizes[user_id]
+        self._evict()
+
+        return messages
+
+    async def add_message(self, user_id: int, role: str, content: str) -> None:
         """Add message to conversation"""
-        if user_id not in self.conversations:
-            self.conversations[user_id] = []
-
-        self.conversations[user_id].append({"role": role, "parts": [content]})
-
-        if len(self.conversations[user_id]) > self.max_history * 2:
-            self.conversations[user_id] = self.conversations[user_id][-self.max_history * 2:]
-
-        self._save_conversation(user_id)
-
-    def reset_conversation(self, user_id: int) -> None:
+        conversation = await self.get_conversation(user_id)
+        message = {"role": role, "parts": [content]}
+        conversation.append(message)
+
+        size = self._message_size(message)
+        self._sizes[user_id] += size
+        self.resident_messages += 1
+        self.resident_bytes += size
+
+        if len(conversation) > self.max_history * 2:
+            self._drop_oldest(user_id, len(conversation) - self.max_history * 2)
+
+        version = await self.store.append(user_id, role, content)
+        if self.store.shared and user_id in self.conversations:
+            expected = self._versions.get(user_id)
+            if version is not None and expected is not None and version == expected + 1:
+                self._versions[user_id] = version
+            else:
+                self._unload(user_id)
+        self._evict()
+
+    def get_summary(self, user_id: int) -> Optional[str]:
+        """Get the rolling summary of the user's older turns (call after get_conversation)"""
+        return self.summaries.get(user_id)
+
+    def reset_count(self, user_id: int) -> Tuple[int, int]:
+        """Get a token that changes whenever the user's history is reset"""
+        return self._reset_all_count, self._resets.get(user_id, 0)
+
+    async def fold_messages(self, user_id: int, folded: List[Dict[str, str]], summary: str,
+                            reset_count: Tuple[int, int] = None) -> None:
+        """Replace the given oldest messages with a new rolling summary.
+
+        reset_count is reset_count() from before the summary was made; if the
+        history has been reset since, the summary is stale and is dropped.
+        """
+        if reset_count is not None and reset_count != self.reset_count(user_id):
+            return
+
+        conversation = self.conversations.get(user_id)
+
+        if conversation is None:
+            removed = len(folded)
+        else:
+            # Some of the folded messages may already have been trimmed from the front
+            def same(a, b):
+                return a["role"] == b["role"] and a["parts"] == b["parts"]
+
+            removed = 0
+            for start in range(len(folded)):
+                tail = folded[start:]
+                if len(tail) <= len(conversation) and all(
+                    same(a, b) for a, b in zip(tail, conversation)
+                ):
+                    removed = len(tail)
+                    break
+
+            self._drop_oldest(user_id, removed)
+            self.summaries[user_id] = summary
+
+        await self.store.save_summary(user_id, summary, removed)
+        if self.store.shared:
+            self._unload(user_id)
+
+    def _drop_oldest(self, user_id: int, count: int) -> None:
+        """Remove the user's oldest resident messages"""
+        conversation = self.conversations[user_id]
+        dropped = conversation[:count]
+        del conversation[:count]
+
+        dropped_size = sum(self._message_size(message) for message in dropped)
+        self._sizes[user_id] -= dropped_size
+        self.resident_messages -= len(dropped)
+        self.resident_bytes -= dropped_size
+
+    async def reset_conversation(self, user_id: int) -> None:
         """Reset user conversation history"""
+        self._resets[user_id] = self._resets.get(user_id, 0) + 1
+        self._unload(user_id)
         self.conversations[user_id] = []
-        self._save_conversation(user_id)
+        self._sizes[user_id] = 0
+        self.summaries.pop(user_id, None)
+        await self.store.reset(user_id)
+        if self.store.shared:
+            self._unload(user_id)
+
+    async def reset_all(self) -> None:
+        """Reset every conversation history"""
+        self._reset_all_count += 1
+        self._resets.clear()
+        self.conversations.clear()
+        self.summaries.clear()
+        self._sizes.clear()
+        self._versions.clear()
+        self.resident_messages = 0
+        self.resident_bytes = 0
+        await self.store.reset_all()
+
+    def _unload(self, user_id: int) -> None:
+        """Drop a user's history from memory"""
+        messages = self.conversations.pop(user_id, None)
+        self.summaries.pop(user_id, None)
+        self._versions.pop(user_id, None)
+        if messages is None:
+            return
+
+        self.resident_messages -= len(messages)
+        self.resident_bytes -= self._sizes.pop(user_id, 0)
+
+    def _evict(self) -> None:
+        """Evict least recently used users until the memory budget is met"""
+        while len(self.conversations) > 1 and (
+            self.resident_messages > self.max_resident_messages
+            or self.resident_bytes > self.max_resident_bytes
+        ):
+            user_id = next(iter(self.conversations))
+            self._unload(user_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Get resident memory usage and eviction counts"""
+        return {
+            "resident_users": len(self.conversations),
+            "resident_messages": self.resident_messages,
+            "resident_bytes": self.resident_bytes,
+            "evictions": self.evictions,
+        }
+
+    async def close(self) -> None:
+        """Flush pending writes and close the storage backend"""
+        await self.store.close()
 
 class EmbedBuilder:
     """Helper class for creating Discord embeds"""
@@ -307,12 +786,12 @@ class EmbedBuilder:
         return embed
 
 def split_long_message(message: str, max_length: int = 2000) -> List[str]:
-    """Split long messages to fit Discord message length limit"""
+    """Split long messages to fit Discord message length limit.
+
+    Cuts at paragraph, line, sentence or word boundaries and keeps code
+    blocks intact across messages (see splitter.py).
+    """
     if len(message) <= max_length:
         return [message]
 
-    chunks = []
-    for i in range(0, len(message), max_length):
-        chunks.append(message[i:i+max_length])
-
-    return chunks
+    return split_message(message, max_length)